@@ -1,11 +1,53 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
+import gzip
 import os
 import shutil
+import subprocess
+import tempfile
+
+from app.utils.helpers import (
+    BACKUP_CHECKSUM_ALGORITHM,
+    CHUNK_SIZE,
+    GzipStreamDecoder,
+    HashingWriter,
+    is_manifest,
+    verify_archive,
+    verify_manifest,
+)
+
+# Priorité CPU/IO des processus de sauvegarde (chaîne vide pour désactiver)
+BACKUP_NICE_LEVEL = os.environ.get("BACKUP_NICE_LEVEL", "10")
+BACKUP_IONICE_CLASS = os.environ.get("BACKUP_IONICE_CLASS", "3")  # 3 = idle
+
+def low_priority_command(cmd):
+    """Préfixe une commande avec nice/ionice lorsque ces outils sont disponibles"""
+    prefix = []
+    if BACKUP_NICE_LEVEL and shutil.which('nice'):
+        prefix += ['nice', '-n', BACKUP_NICE_LEVEL]
+    if BACKUP_IONICE_CLASS and shutil.which('ionice'):
+        prefix += ['ionice', '-c', BACKUP_IONICE_CLASS]
+    return prefix + list(cmd)
+
+def user_result(outcome):
+    """(succès, erreur) d'un create_user/delete_user: booléen (MySQL) ou dictionnaire de statut"""
+    if isinstance(outcome, dict):
+        success = outcome.get('status') == 'success'
+        return success, None if success else outcome.get('message')
+    return bool(outcome), None if outcome else "Échec de l'opération"
 
 class DatabaseAdapter:
     """Interface commune pour tous les adaptateurs de bases de données."""
     
+    # Stockage des archives (voir backups/storage.py); fichiers locaux si None
+    storage = None
+    
+    # Les sauvegardes passent-elles par le flux de l'adaptateur (et donc par le stockage)
+    supports_storage = True
+    
+    # Les archives non fragmentées sont-elles des flux gzip (décompression testée à la vérification)
+    gzip_archives = True
+    
     def connect(self):
         """Établit la connexion à la base de données."""
         raise NotImplementedError
@@ -18,14 +60,59 @@ class DatabaseAdapter:
         """Récupère la liste des utilisateurs de la base de données."""
         raise NotImplementedError
     
+    def get_inventory(self):
+        """
+        Utilisateurs de la base et leurs privilèges, en une requête.
+        Lève une exception en cas d'erreur (une liste vide est un inventaire valide).
+
+        Returns:
+            list: dictionnaires (username, host, grants)
+        """
+        raise NotImplementedError
+    
     def create_user(self, username, password, roles=None):
         """Crée un nouvel utilisateur dans la base de données."""
         raise NotImplementedError
     
+    def create_users(self, users):
+        """
+        Crée plusieurs utilisateurs dans la même session.
+
+        Args:
+            users: liste de dictionnaires (username, password, roles)
+
+        Returns:
+            list: Un résultat par utilisateur, dans l'ordre (username, succès, erreur)
+        """
+        results = []
+        for user in users:
+            try:
+                outcome = self.create_user(user["username"], user["password"], roles=user.get("roles"))
+            except Exception as e:
+                outcome = {'status': 'error', 'message': str(e)}
+            results.append((user["username"], *user_result(outcome)))
+        return results
+    
     def delete_user(self, username):
         """Supprime un utilisateur de la base de données."""
         raise NotImplementedError
-    
+
+    def delete_users(self, usernames):
+        """
+        Supprime plusieurs utilisateurs dans la même session.
+
+        Returns:
+            list: Un résultat par utilisateur, dans l'ordre (username, succès, erreur)
+        """
+        results = []
+        for username in usernames:
+            try:
+                outcome = self.delete_user(username)
+            except Exception as e:
+                outcome = {'status': 'error', 'message': str(e)}
+            results.append((username, *user_result(outcome)))
+        return results
+
     def get_performance_metrics(self):
         """Récupère les métriques de performance de la base de données."""
         raise NotImplementedError
@@ -48,20 +135,129 @@ class DatabaseAdapter:
         pass
     
     @abstractmethod
-    def restore(self, backup_file, target_db=None):
+    def restore(self, backup_file, point_in_time=None, workers=1, progress=None):
         """Restaure une base de données à partir d'une sauvegarde"""
         pass
     
-    @abstractmethod
-    def validate_backup(self, backup_file):
-        """Valide l'intégrité d'une sauvegarde"""
-        pass
+    def open_backup_writer(self, location):
+        """Ouvre une archive en écriture sur le stockage des sauvegardes"""
+        if self.storage is not None:
+            return self.storage.open_write(location)
+        os.makedirs(os.path.dirname(location) or ".", exist_ok=True)
+        return open(location, 'wb')
     
-    def cleanup_old_backups(self, retention_days=30):
-        """Supprime les sauvegardes plus anciennes que retention_days"""
-        cutoff_time = datetime.now().timestamp() - (retention_days * 86400)
-        
-        for filename in os.listdir(self.backup_dir):
-            file_path = os.path.join(self.backup_dir, filename)
-            if os.path.isfile(file_path) and os.path.getmtime(file_path) < cutoff_time:
-                os.remove(file_path)
\ No newline at end of file
+    def open_backup_reader(self, location):
+        """Ouvre une archive en lecture depuis le stockage des sauvegardes"""
+        if self.storage is not None:
+            return self.storage.open_read(location)
+        return open(location, 'rb')
+    
+    def backup_exists(self, location):
+        if self.storage is not None:
+            return self.storage.exists(location)
+        return os.path.exists(location)
+    
+    def validate_backup(self, backup_file, expected_checksum=None,
+                        checksum_algorithm=BACKUP_CHECKSUM_ALGORITHM, max_bytes_per_sec=None):
+        """Valide l'intégrité d'une sauvegarde (empreinte et décompression)"""
+        if is_manifest(backup_file):
+            return verify_manifest(
+                backup_file,
+                expected_checksum=expected_checksum,
+                algorithm=checksum_algorithm,
+                max_bytes_per_sec=max_bytes_per_sec,
+                opener=self.open_backup_reader
+            )
+        return verify_archive(
+            backup_file,
+            expected_checksum=expected_checksum,
+            algorithm=checksum_algorithm,
+            max_bytes_per_sec=max_bytes_per_sec,
+            decompress=self.gzip_archives,
+            opener=self.open_backup_reader
+        )
+
+    def stream_command_to_file(self, cmd, destination_path, compress=True,
+                               checksum_algorithm=BACKUP_CHECKSUM_ALGORITHM, throttle=None):
+        """
+        Exécute une commande de dump et écrit sa sortie dans un fichier,
+        en calculant l'empreinte de l'archive pendant l'écriture.
+
+        Args:
+            cmd: Commande à exécuter (sa sortie standard est le flux de sauvegarde)
+            destination_path: Emplacement de l'archive sur le stockage des sauvegardes
+            compress: Compresser le flux en gzip avant écriture
+            checksum_algorithm: Algorithme de l'empreinte
+            throttle: Limiteur de débit appelé pour chaque bloc lu (optionnel)
+
+        Returns:
+            dict: Taille et empreinte du fichier écrit
+        """
+        # stderr vers un fichier temporaire pour éviter un blocage du pipe
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(low_priority_command(cmd), stdout=subprocess.PIPE, stderr=stderr_file)
+            try:
+                # Un échec dans ce bloc annule l'envoi vers un stockage distant
+                with self.open_backup_writer(destination_path) as raw_file:
+                    writer = HashingWriter(raw_file, checksum_algorithm)
+                    output = gzip.GzipFile(fileobj=writer, mode='wb') if compress else writer
+                    for chunk in iter(lambda: process.stdout.read(CHUNK_SIZE), b''):
+                        # Ralentir la lecture ralentit aussi le dump côté serveur
+                        if throttle is not None:
+                            throttle.consume(len(chunk))
+                        output.write(chunk)
+                    if compress:
+                        output.close()
+
+                    returncode = process.wait()
+                    if returncode != 0:
+                        stderr_file.seek(0)
+                        raise subprocess.CalledProcessError(returncode, cmd[0], stderr=stderr_file.read())
+            finally:
+                process.stdout.close()
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+
+        return {
+            'size': writer.bytes_written,
+            'checksum': writer.hexdigest(),
+            'checksum_algorithm': checksum_algorithm
+        }
+    
+    def stream_file_to_command(self, source_path, cmd, decompress=True, progress=None):
+        """
+        Envoie une archive sur l'entrée standard d'une commande de restauration,
+        décompressée à la volée sans fichier intermédiaire.
+
+        Args:
+            source_path: Emplacement de l'archive sur le stockage des sauvegardes
+            cmd: Commande lisant le flux sur son entrée standard
+            decompress: Décompresser le flux gzip avant envoi
+            progress: Fonction appelée avec le nombre d'octets d'archive consommés
+        """
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr_file)
+            decoder = GzipStreamDecoder() if decompress else None
+            try:
+                with self.open_backup_reader(source_path) as source:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                        process.stdin.write(decoder.decode(chunk) if decoder else chunk)
+                        if progress is not None:
+                            progress(len(chunk))
+            except BrokenPipeError:
+                # La commande s'est arrêtée: son code retour est examiné ci-dessous
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+                returncode = process.wait()
+
+            if returncode != 0:
+                stderr_file.seek(0)
+                raise subprocess.CalledProcessError(returncode, cmd[0], stderr=stderr_file.read())
+
+            if decoder is not None and not decoder.eof:
+                raise OSError(f"Archive tronquée: {source_path}")
@@ -0,0 +1,208 @@
+"""
+Instructions DDL de gestion des utilisateurs des bases gérées.
+
+Les noms de comptes sont validés puis quotés par le pilote, jamais
+interpolés tels quels, et les instructions d'un lot partent en un seul
+aller-retour: requête multi-instructions pour MySQL, bloc PL/SQL anonyme
+pour Oracle. CREATE USER, GRANT et DROP USER mettent à jour les tables de
+privilèges en mémoire: aucun FLUSH PRIVILEGES n'est nécessaire.
+
+Un utilisateur dont le CREATE USER a réussi mais dont un GRANT échoue est
+supprimé (instructions d'annulation): sans cela, la nouvelle tentative
+échouerait indéfiniment sur un compte existant.
+"""
+import os
+import re
+from typing import Dict, List, Sequence, Tuple
+
+# Utilisateurs traités par aller-retour (taille des requêtes et nombre de variables liées)
+DDL_BATCH_SIZE = int(os.getenv("DDL_BATCH_SIZE", "50"))
+
+# Noms de comptes MySQL acceptés (32 caractères au plus)
+MYSQL_USERNAME_PATTERN = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.\-]{0,31}$")
+
+# Identifiants Oracle non quotés: lettre initiale, 128 caractères au plus
+ORACLE_IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9_$#]{0,127}$")
+
+# Privilèges accordés selon les rôles de la plateforme
+MYSQL_ROLE_GRANTS = {
+    'admin': "GRANT ALL PRIVILEGES ON *.* TO {account} WITH GRANT OPTION",
+    'read_only': "GRANT SELECT ON *.* TO {account}",
+    'backup_operator': "GRANT SELECT, LOCK TABLES, SHOW VIEW ON *.* TO {account}",
+}
+ORACLE_ROLE_GRANTS = {
+    'admin': "DBA",
+    'read_only': "CREATE SESSION, SELECT ANY TABLE",
+    'backup_operator': "CREATE SESSION, SELECT ANY TABLE, SELECT ANY DICTIONARY",
+}
+
+# (clé, instructions) d'un utilisateur; les instructions d'une clé réussissent ou échouent ensemble
+Group = Tuple[int, List[str]]
+
+# clé -> instructions annulant le groupe lorsqu'il échoue après sa première instruction
+Undo = Dict[int, List[str]]
+
+def validate_identifier(name, pattern=MYSQL_USERNAME_PATTERN) -> str:
+    """Lève ValueError si le nom ne peut pas désigner un compte"""
+    if not isinstance(name, str) or not pattern.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return name
+
+def _chunks(groups: Sequence, size: int):
+    for start in range(0, len(groups), max(1, size)):
+        yield groups[start:start + max(1, size)]
+
+# MySQL
+
+def mysql_account(connection, username) -> str:
+    """Compte 'nom'@'%' quoté par le pilote (pymysql: Connection.escape)"""
+    return f"{connection.escape(validate_identifier(username))}@'%'"
+
+def mysql_create_user_statements(connection, username, password, roles=None) -> List[str]:
+    account = mysql_account(connection, username)
+    statements = [f"CREATE USER {account} IDENTIFIED BY {connection.escape(str(password))}"]
+    for role in roles or []:
+        if role in MYSQL_ROLE_GRANTS:
+            statements.append(MYSQL_ROLE_GRANTS[role].format(account=account))
+    return statements
+
+def mysql_drop_user_statements(connection, username, if_exists=False) -> List[str]:
+    return [f"DROP USER {'IF EXISTS ' if if_exists else ''}{mysql_account(connection, username)}"]
+
+def _undo_mysql_group(connection, statements: List[str]) -> None:
+    # Au mieux: l'erreur d'origine reste celle renvoyée à l'appelant
+    try:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    except Exception:
+        pass
+
+def execute_mysql_batch(connection, groups: List[Group], batch_size: int = DDL_BATCH_SIZE,
+                        undo: Undo = None) -> Dict[int, Tuple[bool, str]]:
+    """
+    Exécute les instructions de plusieurs utilisateurs en une requête par lot.
+
+    La connexion doit accepter les requêtes multi-instructions
+    (CLIENT.MULTI_STATEMENTS). MySQL s'arrête à la première instruction en
+    erreur: les résultats déjà lus situent l'utilisateur en échec, et les
+    utilisateurs suivants sont renvoyés dans une nouvelle requête. Si
+    l'utilisateur en échec avait passé sa première instruction, ses
+    instructions d'annulation (`undo`) sont exécutées.
+
+    Returns:
+        dict: clé -> (succès, erreur)
+    """
+    results = {}
+    for chunk in _chunks(groups, batch_size):
+        remaining = list(chunk)
+        while remaining:
+            statements = [statement for _, group in remaining for statement in group]
+            done, error = 0, None
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute(";\n".join(statements))
+                    done = 1
+                    while cursor.nextset():
+                        done += 1
+                except Exception as e:
+                    error = e
+            if error is None:
+                results.update((key, (True, None)) for key, _ in remaining)
+                break
+            # Utilisateur contenant l'instruction en erreur
+            boundary = 0
+            for index, (key, group) in enumerate(remaining):
+                boundary += len(group)
+                if done < boundary:
+                    results.update((previous, (True, None)) for previous, _ in remaining[:index])
+                    results[key] = (False, str(error))
+                    if undo and key in undo and done > boundary - len(group):
+                        _undo_mysql_group(connection, undo[key])
+                    remaining = remaining[index + 1:]
+                    break
+            else:
+                # Erreur après la dernière instruction (lecture des résultats)
+                results.update((key, (False, str(error))) for key, _ in remaining)
+                break
+    return results
+
+# Oracle (pas de variables liées dans le DDL: EXECUTE IMMEDIATE dans un bloc PL/SQL)
+
+def _oracle_name(key: int) -> str:
+    return f"DBMS_ASSERT.ENQUOTE_NAME(:u{key})"
+
+def oracle_create_user_statements(key: int, username, password, roles=None) -> Tuple[List[str], Dict]:
+    """
+    Expressions PL/SQL des instructions d'un utilisateur et leurs variables liées.
+    ENQUOTE_NAME met le nom en majuscules, comme un identifiant non quoté.
+    """
+    validate_identifier(username, ORACLE_IDENTIFIER_PATTERN)
+    name = _oracle_name(key)
+    statements = [
+        f"'CREATE USER ' || {name} || ' IDENTIFIED BY ' || DBMS_ASSERT.ENQUOTE_NAME(:p{key}, FALSE)",
+        f"'GRANT CONNECT, RESOURCE TO ' || {name}",
+    ]
+    for role in roles or []:
+        if role in ORACLE_ROLE_GRANTS:
+            statements.append(f"'GRANT {ORACLE_ROLE_GRANTS[role]} TO ' || {name}")
+    return statements, {f"u{key}": username, f"p{key}": str(password)}
+
+def oracle_drop_user_statements(key: int, username) -> Tuple[List[str], Dict]:
+    validate_identifier(username, ORACLE_IDENTIFIER_PATTERN)
+    return [f"'DROP USER ' || {_oracle_name(key)} || ' CASCADE'"], {f"u{key}": username}
+
+def oracle_block(groups: List[Group], undo: Undo = None) -> str:
+    """
+    Bloc anonyme: chaque utilisateur dans son sous-bloc, son erreur dans :e<clé>.
+    Avec des instructions d'annulation, le sous-bloc les exécute en cas
+    d'erreur si sa première instruction avait réussi.
+    """
+    lines = ["BEGIN"]
+    for key, statements in groups:
+        rollback = (undo or {}).get(key)
+        if rollback:
+            lines.append("  DECLARE")
+            lines.append("    started BOOLEAN := FALSE;")
+        lines.append("  BEGIN")
+        for index, statement in enumerate(statements):
+            lines.append(f"    EXECUTE IMMEDIATE {statement};")
+            if rollback and index == 0:
+                lines.append("    started := TRUE;")
+        lines.append(f"  EXCEPTION WHEN OTHERS THEN :e{key} := SQLERRM;")
+        if rollback:
+            lines.append("    IF started THEN")
+            lines.append("      BEGIN")
+            lines.extend(f"        EXECUTE IMMEDIATE {statement};" for statement in rollback)
+            lines.append("      EXCEPTION WHEN OTHERS THEN NULL;")
+            lines.append("      END;")
+            lines.append("    END IF;")
+        lines.append("  END;")
+    lines.append("END;")
+    return "\n".join(lines)
+
+def execute_oracle_batch(connection, groups: List[Group], binds: Dict,
+                         batch_size: int = DDL_BATCH_SIZE, undo: Undo = None) -> Dict[int, Tuple[bool, str]]:
+    """
+    Exécute les instructions de plusieurs utilisateurs en un bloc PL/SQL par lot.
+    Une erreur sur un utilisateur n'interrompt pas les suivants; un
+    utilisateur créé dont un GRANT échoue est annulé (`undo`).
+
+    Returns:
+        dict: clé -> (succès, erreur)
+    """
+    results = {}
+    for chunk in _chunks(groups, batch_size):
+        with connection.cursor() as cursor:
+            errors = {key: cursor.var(str) for key, _ in chunk}
+            variables = {name: value for name, value in binds.items() if int(name[1:]) in errors}
+            variables.update((f"e{key}", var) for key, var in errors.items())
+            try:
+                cursor.execute(oracle_block(chunk, undo), variables)
+            except Exception as e:
+                results.update((key, (False, str(e))) for key, _ in chunk)
+                continue
+        for key, var in errors.items():
+            error = var.getvalue()
+            results[key] = (error is None, error)
+    return results
@@ -2,11 +2,15 @@ import pymongo
 import os
 import subprocess
 from datetime import datetime
+from app.utils.health import CONNECT_TIMEOUT_SECONDS
 from .base import DatabaseAdapter
 
 class MongoDBAdapter(DatabaseAdapter):
     """Adaptateur pour MongoDB."""
     
+    # mongodump --archive --gzip produit une archive mongodump, pas un flux gzip
+    gzip_archives = False
+    
     def __init__(self, host, port, user, password, database):
         self.uri = f"mongodb://{user}:{password}@{host}:{port}/{database}"
         self.client = None
@@ -14,11 +18,16 @@ class MongoDBAdapter(DatabaseAdapter):
 
     def connect(self):
         try:
-            self.client = pymongo.MongoClient(self.uri)
+            timeout_ms = int(CONNECT_TIMEOUT_SECONDS * 1000)
+            self.client = pymongo.MongoClient(self.uri, connectTimeoutMS=timeout_ms,
+                                              serverSelectionTimeoutMS=timeout_ms)
+            # Le client se connecte à la première commande: ping pour vérifier la connexion
+            self.client.admin.command("ping")
             self.db = self.client.get_default_database()
             return True
         except pymongo.errors.PyMongoError as e:
             print(f"Erreur de connexion MongoDB: {e}")
+            self.disconnect()
             return False
 
     def disconnect(self):
@@ -26,16 +35,48 @@ class MongoDBAdapter(DatabaseAdapter):
             self.client.close()
             self.client = None
 
-    def create_user(self, username, password):
+    def get_users(self):
+        """Récupère la liste des utilisateurs de la base MongoDB."""
+        try:
+            return [user["username"] for user in self.get_inventory()]
+        except pymongo.errors.PyMongoError as e:
+            print(f"Erreur lors de la récupération des utilisateurs: {e}")
+            return []
+
+    def get_inventory(self):
+        """Utilisateurs de la base MongoDB et leurs rôles."""
+        if self.db is None:
+            self.connect()
+        users = self.db.command("usersInfo").get("users", [])
+        return [
+            {"username": user["user"], "host": None,
+             "grants": sorted(f"{role['role']}@{role['db']}" for role in user.get("roles", []))}
+            for user in users
+        ]
+
+    # Rôles MongoDB accordés selon les rôles de la plateforme (readWrite par défaut)
+    ROLE_MAPPING = {
+        'admin': "dbOwner",
+        'read_only': "read",
+        'backup_operator': "read",
+    }
+
+    def create_user(self, username, password, roles=None):
         """Crée un utilisateur MongoDB."""
+        if self.db is None:
+            self.connect()
+        mongo_roles = sorted({self.ROLE_MAPPING[role] for role in roles or [] if role in self.ROLE_MAPPING}) or ["readWrite"]
         try:
-            self.db.command("createUser", username, pwd=password, roles=[{"role": "readWrite", "db": self.db.name}])
+            self.db.command("createUser", username, pwd=password,
+                            roles=[{"role": role, "db": self.db.name} for role in mongo_roles])
             return {'status': 'success', 'message': f'Utilisateur {username} créé avec succès'}
         except pymongo.errors.PyMongoError as e:
             return {'status': 'error', 'message': str(e)}
 
     def delete_user(self, username):
         """Supprime un utilisateur MongoDB."""
+        if self.db is None:
+            self.connect()
         try:
             self.db.command("dropUser", username)
             return {'status': 'success', 'message': f'Utilisateur {username} supprimé avec succès'}
@@ -60,68 +101,87 @@ class MongoDBAdapter(DatabaseAdapter):
         except pymongo.errors.PyMongoError as e:
             return {'status': 'error', 'message': str(e)}
 
-def insert(self, collection_name, data):
-    try:
-        result = self.db[collection_name].insert_one(data)
-        return {"status": "success", "inserted_id": result.inserted_id}
-    except pymongo.errors.PyMongoError as e:
-        return {"status": "error", "message": str(e)}
-
-def find(self, collection_name, query):
-    try:
-        data = list(self.db[collection_name].find(query))
-        return {"status": "success", "data": data}
-    except pymongo.errors.PyMongoError as e:
-        return {"status": "error", "message": str(e)}
-
-def delete(self, collection_name, query):
-    try:
-        result = self.db[collection_name].delete_one(query)
-        return {"status": "success", "deleted_count": result.deleted_count}
-    except pymongo.errors.PyMongoError as e:
-        return {"status": "error", "message": str(e)}
-
-
-def backup(self, destination_path, backup_type="full"):
-    """Sauvegarde la base MongoDB à chaud avec mongodump."""
-    try:
-        # Créer le répertoire de destination
-        os.makedirs(os.path.dirname(destination_path), exist_ok=True)
-        
-        # Construire la commande mongodump
-        db_name = self.uri.split("/")[-1]
-        
-        # Extraire les composants de l'URI
-        parts = self.uri.split("@")
-        auth = parts[0].replace("mongodb://", "")
-        host_part = parts[1].split("/")[0]
-        
-        cmd = [
-            'mongodump',
-            f'--uri={self.uri}',
-            f'--out={destination_path}',
-            '--oplog'  # Option clé pour la sauvegarde à chaud
-        ]
-        
-        # Exécuter mongodump
-        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        
-        # Compresser le répertoire de sortie
-        compressed_path = f"{destination_path}.tar.gz"
-        subprocess.run(['tar', '-czf', compressed_path, destination_path], check=True)
-        
-        # Nettoyer le répertoire original
-        subprocess.run(['rm', '-rf', destination_path], check=True)
-        
-        return {
-            'status': 'success',
-            'path': compressed_path,
-            'database': db_name,
-            'size': os.path.getsize(compressed_path),
-            'timestamp': datetime.now().isoformat()
-        }
-    except subprocess.SubprocessError as e:
-        return {
-            'status': 'error',
-            'message': str(e)
-        }
\ No newline at end of file
+    def insert(self, collection_name, data):
+        try:
+            result = self.db[collection_name].insert_one(data)
+            return {"status": "success", "inserted_id": result.inserted_id}
+        except pymongo.errors.PyMongoError as e:
+            return {"status": "error", "message": str(e)}
+
+    def find(self, collection_name, query):
+        try:
+            data = list(self.db[collection_name].find(query))
+            return {"status": "success", "data": data}
+        except pymongo.errors.PyMongoError as e:
+            return {"status": "error", "message": str(e)}
+
+    def delete(self, collection_name, query):
+        try:
+            result = self.db[collection_name].delete_one(query)
+            return {"status": "success", "deleted_count": result.deleted_count}
+        except pymongo.errors.PyMongoError as e:
+            return {"status": "error", "message": str(e)}
+
+    def backup(self, destination_path, backup_type="full", throttle=None):
+        """Sauvegarde la base MongoDB à chaud avec mongodump."""
+        try:
+            db_name = self.uri.split("/")[-1]
+
+            # mongodump écrit une archive gzip sur sa sortie standard,
+            # hachée pendant l'écriture sans répertoire intermédiaire
+            cmd = [
+                'mongodump',
+                f'--uri={self.uri}',
+                '--archive',
+                '--gzip',
+                '--oplog'  # Option clé pour la sauvegarde à chaud
+            ]
+
+            archive_path = f"{destination_path}.archive.gz"
+            stream_info = self.stream_command_to_file(cmd, archive_path, compress=False, throttle=throttle)
+
+            return {
+                'status': 'success',
+                'path': archive_path,
+                'database': db_name,
+                'size': stream_info['size'],
+                'checksum': stream_info['checksum'],
+                'checksum_algorithm': stream_info['checksum_algorithm'],
+                'timestamp': datetime.now().isoformat()
+            }
+        except (subprocess.SubprocessError, OSError) as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+
+    def restore(self, backup_path, point_in_time=None, workers=1, progress=None):
+        """Restaure la base MongoDB en envoyant l'archive à mongorestore par son entrée standard."""
+        try:
+            if not self.backup_exists(backup_path):
+                return {'status': 'error', 'message': f"Le fichier de sauvegarde {backup_path} n'existe pas"}
+
+            cmd = [
+                'mongorestore',
+                f'--uri={self.uri}',
+                '--archive',
+                '--gzip',
+                '--drop',
+                '--oplogReplay',
+                f'--numParallelCollections={max(1, workers)}'
+            ]
+
+            # mongorestore décompresse lui-même l'archive
+            self.stream_file_to_command(backup_path, cmd, decompress=False, progress=progress)
+
+            return {
+                'status': 'success',
+                'database': self.uri.split("/")[-1],
+                'restored_from': backup_path,
+                'point_in_time': None
+            }
+        except (subprocess.SubprocessError, OSError) as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
@@ -1,8 +1,24 @@
 import pymysql
+from pymysql.constants import CLIENT
 import subprocess
 import os
+import gzip
+import json
+import logging
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 from datetime import datetime
-from .base import DatabaseAdapter
+from app.utils.health import CONNECT_TIMEOUT_SECONDS
+from app.utils.helpers import MANIFEST_FILENAME, HashingWriter, is_manifest, manifest_parts
+from . import ddl
+from .base import DatabaseAdapter, low_priority_command
+
+logger = logging.getLogger(__name__)
+
+# Début de la section de données d'une table dans la sortie de mysqldump
+TABLE_DATA_MARKER = b"-- Dumping data for table `"
 
 class MySQLAdapter(DatabaseAdapter):
     """Adaptateur pour les bases de données MySQL."""
@@ -14,7 +30,10 @@ class MySQLAdapter(DatabaseAdapter):
             'port': port,
             'user': user,
             'password': password,
-            'database': database
+            'database': database,
+            # Lots d'instructions DDL en une requête (voir ddl.py)
+            'client_flag': CLIENT.MULTI_STATEMENTS,
+            'connect_timeout': CONNECT_TIMEOUT_SECONDS
         }
         self.connection = None
     
@@ -52,49 +71,72 @@ class MySQLAdapter(DatabaseAdapter):
             print(f"Erreur lors de la récupération des utilisateurs: {e}")
             return []
 
+    def get_inventory(self):
+        """Utilisateurs MySQL et leurs privilèges globaux."""
+        if not self.connection:
+            self.connect()
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT u.User, u.Host, GROUP_CONCAT(DISTINCT p.PRIVILEGE_TYPE ORDER BY p.PRIVILEGE_TYPE) "
+                "FROM mysql.user u LEFT JOIN information_schema.USER_PRIVILEGES p "
+                "ON p.GRANTEE = CONCAT('''', u.User, '''@''', u.Host, '''') "
+                "GROUP BY u.User, u.Host"
+            )
+            return [
+                {"username": user, "host": host, "grants": grants.split(",") if grants else []}
+                for user, host, grants in cursor.fetchall()
+            ]
+
     def create_user(self, username, password, roles=None):
         """Crée un nouvel utilisateur MySQL avec les rôles spécifiés."""
+        _, success, error = self.create_users([{"username": username, "password": password, "roles": roles}])[0]
+        if not success:
+            logger.error(f"Erreur lors de la création de l'utilisateur {username}: {error}")
+        return success
+    
+    def create_users(self, users):
+        """Crée plusieurs utilisateurs MySQL, leurs instructions étant envoyées par lots."""
         if not self.connection:
             self.connect()
-        
-        try:
-            with self.connection.cursor() as cursor:
-                # Création de l'utilisateur
-                cursor.execute(f"CREATE USER '{username}'@'%' IDENTIFIED BY '{password}'")
-                
-                # Attribution des privilèges selon les rôles
-                if roles:
-                    for role in roles:
-                        if role == 'admin':
-                            cursor.execute(f"GRANT ALL PRIVILEGES ON *.* TO '{username}'@'%' WITH GRANT OPTION")
-                        elif role == 'read_only':
-                            cursor.execute(f"GRANT SELECT ON *.* TO '{username}'@'%'")
-                        elif role == 'backup_operator':
-                            cursor.execute(f"GRANT SELECT, LOCK TABLES, SHOW VIEW ON *.* TO '{username}'@'%'")
-                
-
-            # valide les changements
-                cursor.execute("FLUSH PRIVILEGES")
-                self.connection.commit()
-                return True
-        except pymysql.Error as e:
-            print(f"Erreur lors de la création de l'utilisateur: {e}")
-            return False
+        return self._execute_user_ddl(
+            users, lambda user: ddl.mysql_create_user_statements(
+                self.connection, user["username"], user["password"], user.get("roles")),
+            # Compte créé mais GRANT en échec: supprimé pour que la nouvelle tentative aboutisse
+            undo=lambda user: ddl.mysql_drop_user_statements(self.connection, user["username"], if_exists=True)
+        )
     
     def delete_user(self, username):
         """Supprime un utilisateur MySQL."""
+        _, success, error = self.delete_users([username])[0]
+        if not success:
+            logger.error(f"Erreur lors de la suppression de l'utilisateur {username}: {error}")
+        return success
+    
+    def delete_users(self, usernames):
+        """Supprime plusieurs utilisateurs MySQL en une requête par lot."""
         if not self.connection:
             self.connect()
-        
-        try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(f"DROP USER '{username}'@'%'")
-                cursor.execute("FLUSH PRIVILEGES")
-                self.connection.commit()
-                return True
-        except pymysql.Error as e:
-            print(f"Erreur lors de la suppression de l'utilisateur: {e}")
-            return False
+        return self._execute_user_ddl(
+            [{"username": username} for username in usernames],
+            lambda user: ddl.mysql_drop_user_statements(self.connection, user["username"])
+        )
+    
+    def _execute_user_ddl(self, users, statements, undo=None):
+        """(username, succès, erreur) par utilisateur; un nom invalide n'est jamais envoyé"""
+        # Les noms sont quotés par la connexion: sans elle, aucune instruction n'est construite
+        if self.connection is None:
+            return [(user["username"], False, "Connexion MySQL indisponible") for user in users]
+        outcomes, groups, rollbacks = {}, [], {}
+        for key, user in enumerate(users):
+            try:
+                groups.append((key, statements(user)))
+                if undo is not None:
+                    rollbacks[key] = undo(user)
+            except ValueError as e:
+                outcomes[key] = (False, str(e))
+        if groups:
+            outcomes.update(ddl.execute_mysql_batch(self.connection, groups, undo=rollbacks))
+        return [(user["username"], *outcomes[key]) for key, user in enumerate(users)]
     
     def get_performance_metrics(self):
         """Récupère les métriques de performance MySQL."""
@@ -133,172 +175,321 @@ class MySQLAdapter(DatabaseAdapter):
             print(f"Erreur lors de la récupération des métriques: {e}")
             return metrics
     
-    def backup(self, destination_path, backup_type="full"):
+    def backup(self, destination_path, backup_type="full", throttle=None, sharded=False):
         """
         Exécute une sauvegarde à chaud de la base de données MySQL.
         
         Args:
-            destination_path: Chemin où enregistrer la sauvegarde
+            destination_path: Emplacement de la sauvegarde sur le stockage
             backup_type: Type de sauvegarde ('full', 'incremental', 'differential')
+            throttle: Limiteur de débit du flux dump -> fichier (optionnel)
+            sharded: Découper la sauvegarde par table (restauration parallèle)
         
         Returns:
             dict: Résultat de l'opération de sauvegarde
         """
         try:
-        # Création du répertoire de destination si nécessaire
-            os.makedirs(os.path.dirname(destination_path), exist_ok=True)
-        
-        # Construction de la commande mysqldump avec options pour sauvegarde à chaud
+            if sharded:
+                return self._backup_sharded(destination_path, throttle=throttle)
+
+            # Construction de la commande mysqldump avec options pour sauvegarde à chaud
             cmd = [
-            'mysqldump',
-            f'--host={self.config["host"]}',
-            f'--port={self.config["port"]}',
-            f'--user={self.config["user"]}',
-            f'--password={self.config["password"]}',
-            '--add-drop-database',
-            '--single-transaction',  # Garantit la cohérence des données pour InnoDB sans verrouiller les tables
-            '--flush-logs',          # Vide les logs binaires pour permettre une restauration point-in-time
-            '--master-data=2',       # Inclut la position du binlog sous forme de commentaire
-            '--triggers',            # Inclut les triggers
-            '--routines',            # Inclut les procédures stockées et fonctions
-            '--events',              # Inclut les événements programmés
-            '--skip-lock-tables',    # Évite de verrouiller les tables (utilisé avec single-transaction)
-            '--databases', self.config['database']
-        ]
-        
-        # Si c'est une sauvegarde incrémentielle, utilisez les binlogs
+                'mysqldump',
+                f'--host={self.config["host"]}',
+                f'--port={self.config["port"]}',
+                f'--user={self.config["user"]}',
+                f'--password={self.config["password"]}',
+                '--add-drop-database',
+                '--single-transaction',  # Garantit la cohérence des données pour InnoDB sans verrouiller les tables
+                '--flush-logs',          # Vide les logs binaires pour permettre une restauration point-in-time
+                '--master-data=2',       # Inclut la position du binlog sous forme de commentaire
+                '--triggers',            # Inclut les triggers
+                '--routines',            # Inclut les procédures stockées et fonctions
+                '--events',              # Inclut les événements programmés
+                '--skip-lock-tables',    # Évite de verrouiller les tables (utilisé avec single-transaction)
+                '--databases', self.config['database']
+            ]
+
+            # Si c'est une sauvegarde incrémentielle, utilisez les binlogs
             if backup_type == "incremental":
-            # Enregistrez la position actuelle du binlog pour une utilisation ultérieure
+                # Enregistrez la position actuelle du binlog pour une utilisation ultérieure
                 binlog_info = self._get_binlog_position()
                 metadata_path = f"{destination_path}.metadata"
-            with open(metadata_path, 'w') as meta_file:
-                meta_file.write(f"BINLOG_FILE={binlog_info['file']}\n")
-                meta_file.write(f"BINLOG_POS={binlog_info['position']}\n")
-                meta_file.write(f"BACKUP_TYPE={backup_type}\n")
-        
-        # Exécution de la commande et redirection de la sortie vers le fichier
-            with open(destination_path, 'w') as f:
-                process = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, check=True)
-        
-        # Compresser le fichier pour économiser de l'espace
+                with self.open_backup_writer(metadata_path) as meta_file:
+                    meta_file.write(f"BINLOG_FILE={binlog_info['file']}\n".encode())
+                    meta_file.write(f"BINLOG_POS={binlog_info['position']}\n".encode())
+                    meta_file.write(f"BACKUP_TYPE={backup_type}\n".encode())
+
+            # Exécution de la commande: la sortie est compressée et hachée à la volée
             compressed_path = f"{destination_path}.gz"
-            subprocess.run(['gzip', '-f', destination_path], check=True)
-        
+            stream_info = self.stream_command_to_file(cmd, compressed_path, throttle=throttle)
+
             return {
+                'status': 'success',
+                'path': compressed_path,
+                'database': self.config['database'],
+                'type': backup_type,
+                'size': stream_info['size'],
+                'checksum': stream_info['checksum'],
+                'checksum_algorithm': stream_info['checksum_algorithm'],
+                'timestamp': datetime.now().isoformat()
+            }
+        except (subprocess.SubprocessError, OSError, pymysql.Error) as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+
+    def _get_binlog_position(self):
+        """Récupère la position actuelle du binlog pour les sauvegardes incrémentielles."""
+        if not self.connection:
+            self.connect()
+
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute("SHOW MASTER STATUS")
+                result = cursor.fetchone()
+                if result:
+                    return {
+                        'file': result[0],
+                        'position': result[1]
+                    }
+                return None
+        except pymysql.Error as e:
+            print(f"Erreur lors de la récupération de la position du binlog: {e}")
+            return None
+
+    def _backup_sharded(self, destination_path, throttle=None):
+        """
+        Sauvegarde découpée par table: un fichier pour le schéma puis un
+        fichier par table, décrits par un manifeste pour la restauration parallèle.
+
+        Les données de toutes les tables viennent d'un seul mysqldump
+        --single-transaction, donc d'un même instantané: les clés étrangères
+        et invariants entre tables sont respectés à la restauration.
+        """
+        database = self.config['database']
+
+        # Schéma, vues, routines et triggers sans les données
+        schema_cmd = self._client_args('mysqldump') + [
+            '--add-drop-database',
+            '--no-data',
+            '--triggers',
+            '--routines',
+            '--events',
+            '--databases', database
+        ]
+        schema_info = self.stream_command_to_file(
+            schema_cmd, os.path.join(destination_path, "schema.sql.gz"), throttle=throttle
+        )
+
+        # Données de toutes les tables dans une transaction, découpées par table à la volée
+        data_cmd = self._client_args('mysqldump') + [
+            '--no-create-info',
+            '--single-transaction',
+            '--skip-lock-tables',
+            '--skip-triggers',
+            '--comments',  # Les commentaires délimitent les tables
+            database
+        ]
+        tables = self._stream_table_data(
+            data_cmd, destination_path, schema_info['checksum_algorithm'], throttle=throttle
+        )
+        manifest = {
+            'database': database,
+            'checksum_algorithm': schema_info['checksum_algorithm'],
+            'schema': {'file': "schema.sql.gz", 'size': schema_info['size'], 'checksum': schema_info['checksum']},
+            'tables': tables
+        }
+
+        manifest_path = os.path.join(destination_path, MANIFEST_FILENAME)
+        with self.open_backup_writer(manifest_path) as raw_file:
+            writer = HashingWriter(raw_file, manifest['checksum_algorithm'])
+            writer.write(json.dumps(manifest, indent=2).encode())
+
+        return {
             'status': 'success',
-            'path': compressed_path,
-            'database': self.config['database'],
-            'type': backup_type,
-            'size': os.path.getsize(compressed_path),
+            'path': manifest_path,
+            'database': database,
+            'type': 'full',
+            'size': writer.bytes_written + sum(part['size'] for part in manifest_parts(manifest)),
+            'checksum': writer.hexdigest(),
+            'checksum_algorithm': manifest['checksum_algorithm'],
             'timestamp': datetime.now().isoformat()
         }
-        except (subprocess.SubprocessError, OSError) as e:
-            return {
-            'status': 'error',
-            'message': str(e)
-        }
 
-def _get_binlog_position(self):
-    """Récupère la position actuelle du binlog pour les sauvegardes incrémentielles."""
-    if not self.connection:
-        self.connect()
-    
-    try:
-        with self.connection.cursor() as cursor:
-            cursor.execute("SHOW MASTER STATUS")
-            result = cursor.fetchone()
-            if result:
-                return {
-                    'file': result[0],
-                    'position': result[1]
-                }
-            return None
-    except pymysql.Error as e:
-        print(f"Erreur lors de la récupération de la position du binlog: {e}")
-        return None
+    def _stream_table_data(self, cmd, destination_path, checksum_algorithm, throttle=None):
+        """
+        Exécute un dump des données et écrit chaque table dans sa propre
+        archive gzip, précédée de l'en-tête de session du dump (jeu de
+        caractères, fuseau horaire, modes SQL) pour être restaurable seule.
 
-def restore(self, backup_path, point_in_time=None):
-    """
-    Restaure une base de données MySQL à partir d'une sauvegarde.
-    
-    Args:
-        backup_path: Chemin du fichier de sauvegarde
-        point_in_time: Pour les restaurations point-in-time (datetime)
-    
-    Returns:
-        dict: Résultat de l'opération de restauration
-    """
-    try:
-        # Vérification que le fichier existe
-        if not os.path.exists(backup_path):
-            if os.path.exists(f"{backup_path}.gz"):
-                # Décompresser le fichier
-                subprocess.run(['gunzip', '-f', f"{backup_path}.gz"], check=True)
-            else:
-                return {'status': 'error', 'message': f"Le fichier de sauvegarde {backup_path} n'existe pas"}
-        
-        # Construction de la commande mysql
-        cmd = [
-            'mysql',
+        Returns:
+            list: Entrées du manifeste (name, file, size, checksum), dans l'ordre du dump
+        """
+        tables, header = [], []
+        current = None  # (stack, writer, output) de la table en cours
+
+        def finish():
+            stack, writer, output = current
+            output.close()
+            stack.close()
+            tables[-1].update(size=writer.bytes_written, checksum=writer.hexdigest())
+
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(low_priority_command(cmd), stdout=subprocess.PIPE, stderr=stderr_file)
+            try:
+                for line in process.stdout:
+                    if throttle is not None:
+                        throttle.consume(len(line))
+                    if line.startswith(TABLE_DATA_MARKER):
+                        if current is not None:
+                            finish()
+                        name = line[len(TABLE_DATA_MARKER):].rstrip(b"\r\n")[:-1].replace(b"``", b"`")
+                        tables.append({'name': name.decode('utf-8'), 'file': f"table_{len(tables):05d}.sql.gz"})
+                        stack = ExitStack()
+                        raw_file = stack.enter_context(
+                            self.open_backup_writer(os.path.join(destination_path, tables[-1]['file']))
+                        )
+                        writer = HashingWriter(raw_file, checksum_algorithm)
+                        output = gzip.GzipFile(fileobj=writer, mode='wb')
+                        output.writelines(header)
+                        current = (stack, writer, output)
+                    if current is None:
+                        header.append(line)
+                    else:
+                        current[2].write(line)
+
+                returncode = process.wait()
+                if returncode != 0:
+                    stderr_file.seek(0)
+                    raise subprocess.CalledProcessError(returncode, cmd[0], stderr=stderr_file.read())
+                if current is not None:
+                    finish()
+                    current = None
+            except BaseException:
+                # Un échec annule l'envoi de l'archive en cours vers un stockage distant
+                if current is not None:
+                    current[0].__exit__(*sys.exc_info())
+                raise
+            finally:
+                process.stdout.close()
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+        return tables
+
+    def _client_args(self, program):
+        """Arguments de connexion communs aux clients MySQL en ligne de commande"""
+        return [
+            program,
             f'--host={self.config["host"]}',
             f'--port={self.config["port"]}',
             f'--user={self.config["user"]}',
             f'--password={self.config["password"]}'
         ]
+
+    def restore(self, backup_path, point_in_time=None, workers=1, progress=None):
+        """
+        Restaure une base de données MySQL à partir d'une sauvegarde.
         
-        # Exécution de la commande avec le contenu du fichier en entrée
-        with open(backup_path, 'r') as f:
-            process = subprocess.run(cmd, stdin=f, stderr=subprocess.PIPE, check=True)
+        L'archive est décompressée en flux vers le client mysql, sans
+        fichier intermédiaire; une sauvegarde découpée par table est
+        restaurée en parallèle après son schéma.
         
-        # Si une restauration point-in-time est demandée
-        if point_in_time and os.path.exists(f"{backup_path}.metadata"):
-            with open(f"{backup_path}.metadata", 'r') as meta_file:
-                metadata = {}
-                for line in meta_file:
-                    key, value = line.strip().split('=', 1)
-                    metadata[key] = value
-            
-            # Restauration à partir des binlogs jusqu'au point-in-time spécifié
-            if 'BINLOG_FILE' in metadata and 'BINLOG_POS' in metadata:
-                self._apply_binlogs(metadata['BINLOG_FILE'], 
-                                   metadata['BINLOG_POS'],
-                                   point_in_time)
+        Args:
+            backup_path: Emplacement de l'archive ou du manifeste de sauvegarde
+            point_in_time: Pour les restaurations point-in-time (datetime)
+            workers: Nombre de tables restaurées en parallèle
+            progress: Fonction appelée avec le nombre d'octets d'archive consommés
         
-        return {
-            'status': 'success',
-            'database': self.config['database'],
-            'restored_from': backup_path,
-            'point_in_time': point_in_time.isoformat() if point_in_time else None
-        }
-    except (subprocess.SubprocessError, OSError) as e:
-        return {
-            'status': 'error',
-            'message': str(e)
-        }
+        Returns:
+            dict: Résultat de l'opération de restauration
+        """
+        try:
+            # Vérification que l'archive existe sur le stockage
+            if not self.backup_exists(backup_path):
+                return {'status': 'error', 'message': f"Le fichier de sauvegarde {backup_path} n'existe pas"}
+            
+            if is_manifest(backup_path):
+                self._restore_sharded(backup_path, workers, progress)
+            else:
+                self.stream_file_to_command(
+                    backup_path,
+                    self._client_args('mysql'),
+                    decompress=backup_path.endswith('.gz'),
+                    progress=progress
+                )
+            
+            # Si une restauration point-in-time est demandée
+            metadata_path = f"{backup_path[:-3] if backup_path.endswith('.gz') else backup_path}.metadata"
+            if point_in_time and self.backup_exists(metadata_path):
+                with self.open_backup_reader(metadata_path) as meta_file:
+                    metadata = {}
+                    for line in meta_file.read().decode().splitlines():
+                        key, value = line.strip().split('=', 1)
+                        metadata[key] = value
+                
+                # Restauration à partir des binlogs jusqu'au point-in-time spécifié
+                if 'BINLOG_FILE' in metadata and 'BINLOG_POS' in metadata:
+                    self._apply_binlogs(metadata['BINLOG_FILE'], 
+                                       metadata['BINLOG_POS'],
+                                       point_in_time)
+            
+            return {
+                'status': 'success',
+                'database': self.config['database'],
+                'restored_from': backup_path,
+                'point_in_time': point_in_time.isoformat() if point_in_time else None
+            }
+        except (subprocess.SubprocessError, OSError) as e:
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
 
-def _apply_binlogs(self, binlog_file, binlog_pos, point_in_time):
-    """Applique les binlogs pour une restauration point-in-time."""
-    # Convertir le datetime en format mysql
-    time_str = point_in_time.strftime('%Y-%m-%d %H:%M:%S')
-    
-    cmd = [
-        'mysqlbinlog',
-        f'--host={self.config["host"]}',
-        f'--user={self.config["user"]}',
-        f'--password={self.config["password"]}',
-        f'--start-position={binlog_pos}',
-        f'--stop-datetime="{time_str}"',
-        binlog_file
-    ]
-    
-    # Rediriger la sortie vers mysql
-    mysqlbinlog_process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-    mysql_cmd = [
-        'mysql',
-        f'--host={self.config["host"]}',
-        f'--user={self.config["user"]}',
-        f'--password={self.config["password"]}',
-        self.config['database']
-    ]
-    subprocess.run(mysql_cmd, stdin=mysqlbinlog_process.stdout, check=True)
-    mysqlbinlog_process.stdout.close()
\ No newline at end of file
+    def _restore_sharded(self, manifest_path, workers, progress):
+        """Restaure le schéma puis les tables d'une sauvegarde découpée en parallèle"""
+        with self.open_backup_reader(manifest_path) as f:
+            manifest = json.load(f)
+        base_dir = os.path.dirname(manifest_path)
+
+        # Le schéma (DROP/CREATE DATABASE compris) doit précéder les données
+        self.stream_file_to_command(
+            os.path.join(base_dir, manifest['schema']['file']),
+            self._client_args('mysql'),
+            progress=progress
+        )
+
+        # Chaque table dans sa propre session; les tables venant d'un même instantané,
+        # le contrôle des clés étrangères est suspendu le temps du chargement parallèle
+        table_cmd = self._client_args('mysql') + [
+            '--init-command=SET SESSION foreign_key_checks=0, unique_checks=0',
+            manifest['database']
+        ]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [
+                pool.submit(self.stream_file_to_command, os.path.join(base_dir, table['file']),
+                            table_cmd, True, progress)
+                for table in manifest['tables']
+            ]
+            for future in as_completed(futures):
+                future.result()
+
+    def _apply_binlogs(self, binlog_file, binlog_pos, point_in_time):
+        """Applique les binlogs pour une restauration point-in-time."""
+        # Convertir le datetime en format mysql
+        time_str = point_in_time.strftime('%Y-%m-%d %H:%M:%S')
+        
+        cmd = self._client_args('mysqlbinlog') + [
+            '--read-from-remote-server',
+            f'--start-position={binlog_pos}',
+            f'--stop-datetime={time_str}',
+            binlog_file
+        ]
+        
+        # Rediriger la sortie vers mysql
+        mysqlbinlog_process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        mysql_cmd = self._client_args('mysql') + [self.config['database']]
+        subprocess.run(mysql_cmd, stdin=mysqlbinlog_process.stdout, check=True)
+        mysqlbinlog_process.stdout.close()
@@ -1,13 +1,34 @@
 import cx_Oracle
+import math
 import subprocess
 import os
 from datetime import datetime
-from .base import DatabaseAdapter
+from app.utils.health import CONNECT_TIMEOUT_SECONDS
+from . import ddl
+from .base import DatabaseAdapter, low_priority_command
+
+def oracle_dsn(host, port, service_name, timeout=CONNECT_TIMEOUT_SECONDS):
+    """
+    Descripteur de connexion borné dans le temps: établissement TCP
+    (TRANSPORT_CONNECT_TIMEOUT) et connexion complète (CONNECT_TIMEOUT),
+    en secondes entières, sans nouvelle tentative du client
+    """
+    seconds = max(1, math.ceil(timeout))
+    return (
+        f"(DESCRIPTION=(CONNECT_TIMEOUT={seconds})(TRANSPORT_CONNECT_TIMEOUT={seconds})(RETRY_COUNT=0)"
+        f"(ADDRESS=(PROTOCOL=TCP)(HOST={host})(PORT={int(port)}))"
+        f"(CONNECT_DATA=(SERVICE_NAME={service_name})))"
+    )
 
 class OracleAdapter(DatabaseAdapter):
     """Adaptateur pour les bases de données Oracle."""
+    
+    # RMAN écrit lui-même ses fichiers: les sauvegardes restent sur disque local
+    supports_storage = False
+    
     def __init__(self, host, port, user, password, service_name):
-        dsn = cx_Oracle.makedsn(host, port, service_name=service_name)
+        dsn = oracle_dsn(host, port, service_name)
+        self.service_name = service_name
         self.config = {
             'user': user,
             'password': password,
@@ -43,26 +64,72 @@ class OracleAdapter(DatabaseAdapter):
             return []
 
    
-    def create_user(self, username, password):
+    def get_inventory(self):
+        """Utilisateurs Oracle (hors comptes du système) et leurs rôles."""
+        if not self.connection:
+            self.connect()
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT u.username, LISTAGG(r.granted_role, ',') WITHIN GROUP (ORDER BY r.granted_role) "
+                "FROM dba_users u LEFT JOIN dba_role_privs r ON r.grantee = u.username "
+                "WHERE u.oracle_maintained = 'N' GROUP BY u.username"
+            )
+            return [
+                {"username": username, "host": None, "grants": grants.split(",") if grants else []}
+                for username, grants in cursor.fetchall()
+            ]
+
+    def create_user(self, username, password, roles=None):
         """Crée un nouvel utilisateur Oracle."""
-        try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(f"CREATE USER {username} IDENTIFIED BY {password}")
-                cursor.execute(f"GRANT CONNECT, RESOURCE TO {username}")
-                self.connection.commit()
-                return {'status': 'success', 'message': f'Utilisateur {username} créé avec succès'}
-        except cx_Oracle.DatabaseError as e:
-            return {'status': 'error', 'message': str(e)}
+        _, success, error = self.create_users([{"username": username, "password": password, "roles": roles}])[0]
+        if success:
+            return {'status': 'success', 'message': f'Utilisateur {username} créé avec succès'}
+        return {'status': 'error', 'message': error}
+
+    def create_users(self, users):
+        """Crée plusieurs utilisateurs Oracle en un bloc PL/SQL par lot."""
+        return self._execute_user_ddl(
+            users, lambda key, user: ddl.oracle_create_user_statements(
+                key, user["username"], user["password"], user.get("roles")),
+            # Compte créé mais GRANT en échec: supprimé pour que la nouvelle tentative aboutisse
+            undo=lambda key, user: ddl.oracle_drop_user_statements(key, user["username"])[0]
+        )
 
     def delete_user(self, username):
         """Supprime un utilisateur Oracle."""
-        try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(f"DROP USER {username} CASCADE")
-                self.connection.commit()
-                return {'status': 'success', 'message': f'Utilisateur {username} supprimé avec succès'}
-        except cx_Oracle.DatabaseError as e:
-            return {'status': 'error', 'message': str(e)}
+        _, success, error = self.delete_users([username])[0]
+        if success:
+            return {'status': 'success', 'message': f'Utilisateur {username} supprimé avec succès'}
+        return {'status': 'error', 'message': error}
+
+    def delete_users(self, usernames):
+        """Supprime plusieurs utilisateurs Oracle en un bloc PL/SQL par lot."""
+        return self._execute_user_ddl(
+            [{"username": username} for username in usernames],
+            lambda key, user: ddl.oracle_drop_user_statements(key, user["username"])
+        )
+
+    def _execute_user_ddl(self, users, statements, undo=None):
+        """(username, succès, erreur) par utilisateur; un nom invalide n'est jamais envoyé"""
+        if not self.connection:
+            self.connect()
+        outcomes, groups, binds, rollbacks = {}, [], {}, {}
+        for key, user in enumerate(users):
+            try:
+                group, variables = statements(key, user)
+            except ValueError as e:
+                outcomes[key] = (False, str(e))
+                continue
+            groups.append((key, group))
+            binds.update(variables)
+            if undo is not None:
+                rollbacks[key] = undo(key, user)
+        if groups:
+            if self.connection is None:
+                outcomes.update((key, (False, "Connexion Oracle indisponible")) for key, _ in groups)
+            else:
+                outcomes.update(ddl.execute_oracle_batch(self.connection, groups, binds, undo=rollbacks))
+        return [(user["username"], *outcomes[key]) for key, user in enumerate(users)]
 
     def get_metrics(self):
         """Récupère les métriques de la base de données."""
@@ -87,23 +154,31 @@ class OracleAdapter(DatabaseAdapter):
             return {'status': 'error', 'message': str(e)}
         
 
-    def backup(self, destination_path, backup_type="full"):
+    def backup(self, destination_path, backup_type="full", throttle=None):
         """Sauvegarde la base de données Oracle à chaud avec RMAN."""
         try:
             # Créer le répertoire de destination
             os.makedirs(os.path.dirname(destination_path), exist_ok=True)
         
+        # RMAN écrit lui-même les fichiers: la limite de débit passe par le canal
+            channel_rate = ""
+            if throttle is not None and throttle.max_bytes_per_sec:
+                channel_rate = f" RATE {max(1, int(throttle.max_bytes_per_sec // 1024))}K"
+        
         # Créer un script RMAN temporaire
             rman_script = f"""
             CONFIGURE BACKUP OPTIMIZATION ON;
             CONFIGURE CONTROLFILE AUTOBACKUP ON;
         
-            BACKUP AS COMPRESSED BACKUPSET
-                DATABASE
-                TAG 'FULL_DB_BACKUP'
-                FORMAT '{destination_path}_%U';
+            RUN {{
+                ALLOCATE CHANNEL backup_disk DEVICE TYPE DISK{channel_rate};
+                BACKUP AS COMPRESSED BACKUPSET
+                    DATABASE
+                    TAG 'FULL_DB_BACKUP'
+                    FORMAT '{destination_path}_%U';
           
-            BACKUP ARCHIVELOG ALL DELETE INPUT;
+                BACKUP ARCHIVELOG ALL DELETE INPUT;
+            }}
         """
         
             script_path = f"{destination_path}.rman"
@@ -117,7 +192,7 @@ class OracleAdapter(DatabaseAdapter):
             f'cmdfile={script_path}'
             ]
         
-            process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+            process = subprocess.run(low_priority_command(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
         
         # Nettoyer le script temporaire
             os.remove(script_path)
@@ -125,7 +200,7 @@ class OracleAdapter(DatabaseAdapter):
             return {
             'status': 'success',
             'path': f"{destination_path}_*",  # RMAN crée plusieurs fichiers avec suffixes
-            'database': self.config["dsn"].split("/")[-1],
+            'database': self.service_name,
             'timestamp': datetime.now().isoformat()
         }
         except subprocess.SubprocessError as e:
@@ -1,11 +1,124 @@
+import os
+import threading
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from app.config import DATABASE_URL
 
+# Connexions que la plateforme peut ouvrir au total sur la base centrale
+# (à garder sous le max_connections de MySQL), réparties entre les workers
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Part du budget d'un worker réservée au moteur async (authentification des routes),
+# le reste allant au moteur synchrone: les deux pools ensemble tiennent dans le budget
+DB_ASYNC_POOL_SHARE = float(os.getenv("DB_ASYNC_POOL_SHARE", "0.25"))
+_per_worker = max(2, DB_MAX_CONNECTIONS // max(1, WEB_CONCURRENCY))
+_async_budget = min(_per_worker - 1, max(1, round(_per_worker * DB_ASYNC_POOL_SHARE)))
+_sync_budget = _per_worker - _async_budget
+
+# Moitié du budget de chaque moteur en connexions permanentes, l'autre en débordement
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(max(1, _sync_budget // 2))))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(_sync_budget - max(1, _sync_budget // 2))))
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", str(max(1, _async_budget // 2))))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", str(_async_budget - max(1, _async_budget // 2))))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Recyclage avant le wait_timeout de MySQL (8 h par défaut, souvent réduit en production)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Nombre de requêtes compilées gardées en cache par le moteur
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+
+# Pilote asynchrone utilisé par le moteur async (mysql+asyncmy)
+DB_ASYNC_DRIVER = os.getenv("DB_ASYNC_DRIVER", "asyncmy")
+
+class PoolStats:
+    """Compteurs d'attente à l'obtention d'une connexion du pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3)
+            }
+
+class TimedQueuePool(QueuePool):
+    """QueuePool mesurant le temps d'attente de chaque obtention de connexion"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+def build_engine(url=DATABASE_URL, **overrides):
+    """Moteur de la base centrale avec un pool dimensionné et mesuré"""
+    options = dict(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        query_cache_size=DB_QUERY_CACHE_SIZE,
+    )
+    options.update(overrides)
+    return create_engine(url, **options)
+
+def pool_status(bind=None) -> dict:
+    """État du pool: dimensionnement, connexions en cours et temps d'attente"""
+    pool = (bind or engine).pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "max_overflow": getattr(pool, "_max_overflow", None),
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "idle": pool.checkedin() if hasattr(pool, "checkedin") else None,
+        "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+    }
+    if isinstance(pool, TimedQueuePool):
+        status.update(pool.stats.snapshot())
+    return status
+
 # Création du moteur SQLAlchemy
-engine = create_engine(DATABASE_URL)
+engine = build_engine()
 
 # Session locale
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -19,4 +132,44 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Moteur asynchrone, créé à la première utilisation; son pilote (asyncmy) est
+# requis: get_current_user, et donc toute route authentifiée, en dépend
+_async_engine = None
+_async_session = None
+_async_lock = threading.Lock()
+
+def async_database_url(url=DATABASE_URL, driver=DB_ASYNC_DRIVER) -> str:
+    return make_url(url).set(drivername=f"mysql+{driver}").render_as_string(hide_password=False)
+
+def get_async_engine():
+    global _async_engine, _async_session
+    with _async_lock:
+        if _async_engine is None:
+            from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+            _async_engine = create_async_engine(
+                async_database_url(),
+                pool_size=DB_ASYNC_POOL_SIZE,
+                max_overflow=DB_ASYNC_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=DB_POOL_PRE_PING,
+                query_cache_size=DB_QUERY_CACHE_SIZE,
+            )
+            _async_session = async_sessionmaker(_async_engine, class_=AsyncSession,
+                                                autoflush=False, expire_on_commit=False)
+        return _async_engine
+
+# Fonction de dépendance pour les routes async: les accès à la base ne bloquent pas la boucle
+async def get_async_db():
+    get_async_engine()
+    async with _async_session() as db:
+        yield db
+
+async def dispose_async_engine():
+    global _async_engine, _async_session
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_session = None
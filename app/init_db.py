@@ -1,9 +1,10 @@
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal
+from app.migrate import upgrade
 from app.modules.users.models import Role, User
 from app.modules.users.service import get_password_hash
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    upgrade()
     
     db = SessionLocal()
     
@@ -1,14 +1,27 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from app.modules.monitoring.scheduler import start_scheduler
+from app.modules.backups.scheduler import (
+    BACKUP_SCHEDULER_LEASE,
+    init_scheduler as init_backup_scheduler,
+    shutdown_scheduler as shutdown_backup_scheduler,
+)
+from app.modules.coordination.service import elector
+from app.utils.security import shutdown_executor as shutdown_password_executor
+from app.modules.users.provisioning import pool as provisioning_pool
+from app.modules.users.inventory import start_inventory_scheduler
+import anyio.to_thread
+import asyncio
 import logging
+import os
 from .modules.users.router import router as users_router
 from app.modules.monitoring.router import router as monitoring_router
 from app.modules.backups.router import router as backups_router
-from app.database import engine, Base
+from app.utils.health import registry as health_registry
+from app.database import DB_MAX_OVERFLOW, DB_POOL_SIZE, dispose_async_engine, pool_status
 
-# Création des tables dans la base de données
-Base.metadata.create_all(bind=engine)
+# Le schéma est créé et mis à jour par `python -m app.migrate`, lancé au déploiement
 
 app = FastAPI(
     title="DB Management Platform",
@@ -31,6 +44,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Collecte des métriques dans le processus de l'API
+MONITORING_SCHEDULER_ENABLED = os.getenv("MONITORING_SCHEDULER_ENABLED", "true").lower() == "true"
+
+# Inventaire périodique des utilisateurs des bases gérées
+INVENTORY_SCHEDULER_ENABLED = os.getenv("INVENTORY_SCHEDULER_ENABLED", "true").lower() == "true"
+
+# Threads exécutant les routes synchrones: autant que de connexions du pool,
+# pour qu'une requête en attente de thread n'attende pas ensuite une connexion
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+# Délai entre l'ouverture du serveur et le démarrage des planificateurs
+STARTUP_WARMUP_DELAY_SECONDS = float(os.getenv("STARTUP_WARMUP_DELAY_SECONDS", "1"))
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -40,20 +66,61 @@ app.include_router(users_router, prefix="/api/users", tags=["Users"])
 app.include_router(monitoring_router, prefix="/api/monitoring", tags=["Monitoring"])
 app.include_router(backups_router, prefix="/api/backups", tags=["Backups"])
 
+def start_background_services():
+    """Démarre les planificateurs (accès à la base centrale, exécuté hors de la boucle)"""
+    # Collecte dans l'API désactivable quand le collecteur dédié (run_collector.py) est déployé
+    if MONITORING_SCHEDULER_ENABLED:
+        app.state.scheduler = start_scheduler()
+    if INVENTORY_SCHEDULER_ENABLED:
+        app.state.inventory_scheduler = start_inventory_scheduler()
+    # Plannings de sauvegarde: une seule instance élue les exécute,
+    # une autre reprend la main à l'expiration de son bail
+    elector.register(BACKUP_SCHEDULER_LEASE, on_elected=init_backup_scheduler, on_demoted=shutdown_backup_scheduler)
+    elector.start()
+
+async def warm_up():
+    await asyncio.sleep(STARTUP_WARMUP_DELAY_SECONDS)
+    try:
+        await run_in_threadpool(start_background_services)
+    except Exception as e:
+        logger.error(f"Background services failed to start: {str(e)}")
+
 # Start metrics collection scheduler
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     logger.info("Starting application...")
-    scheduler = start_scheduler()
-    app.state.scheduler = scheduler
+    # Le limiteur AnyIO est propre à la boucle d'événements: réglé depuis celle-ci
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+    # Les planificateurs démarrent en tâche de fond: le serveur accepte les
+    # connexions sans attendre la base centrale
+    app.state.warm_up = asyncio.create_task(warm_up())
 
 # Shutdown event to stop scheduler
 @app.on_event("shutdown")
-def shutdown_event():
+async def shutdown_event():
     logger.info("Shutting down application...")
+    warm_up_task = getattr(app.state, "warm_up", None)
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
     if hasattr(app.state, "scheduler"):
         app.state.scheduler.shutdown()
+    if hasattr(app.state, "inventory_scheduler"):
+        app.state.inventory_scheduler.shutdown()
+    elector.stop()
+    shutdown_password_executor()
+    provisioning_pool.clear()
+    await dispose_async_engine()
 
 @app.get("/")
 async def root():
     return {"message": "Bienvenue sur la plateforme de gestion des bases de données"}
+
+# État du pool de connexions à la base centrale (dimensionnement et attente)
+@app.get("/api/database/pool")
+def database_pool_status():
+    return pool_status()
+
+# Disjoncteurs des bases gérées vus par cette instance (cibles hors service et prochaine sonde)
+@app.get("/api/database/health")
+def managed_databases_health():
+    return health_registry.snapshot()
@@ -0,0 +1,176 @@
+"""
+Migrations du schéma de la base centrale.
+
+Le schéma n'est plus créé à l'import de l'application: chaque migration
+est appliquée une fois, dans l'ordre, par une commande lancée au
+déploiement avant les workers de l'API, et sa version est enregistrée
+dans la table `schema_migrations`.
+
+Usage:
+    python -m app.migrate              # applique les migrations en attente
+    python -m app.migrate current      # version appliquée
+    python -m app.migrate history      # migrations connues et leur état
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, MetaData, String, Table, inspect, select, text
+
+logger = logging.getLogger(__name__)
+
+# Table de suivi, hors de Base.metadata pour ne pas dépendre des modèles
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String(20), primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+def _load_models():
+    """Importe tous les modèles pour que Base.metadata les connaisse"""
+    from app.database import Base
+    import app.modules.users.models  # noqa: F401
+    import app.modules.monitoring.models  # noqa: F401
+    import app.modules.backups.models  # noqa: F401
+    import app.modules.coordination.models  # noqa: F401
+    return Base
+
+def _initial_schema(connection):
+    # Schéma de référence: crée les tables absentes, les bases existantes sont reprises telles quelles
+    _load_models().metadata.create_all(bind=connection, checkfirst=True)
+
+def _user_inventory(connection):
+    from app.modules.users.models import UserInventorySnapshot
+    _load_models()
+    UserInventorySnapshot.__table__.create(bind=connection, checkfirst=True)
+
+def _add_columns(connection, table, names):
+    """
+    Ajoute à une table existante les colonnes absentes, avec le type du
+    modèle; les lignes existantes reçoivent la valeur par défaut du modèle
+    """
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    quote = connection.dialect.identifier_preparer.quote
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(name)} {column_type}"))
+        if column.default is not None and column.default.is_scalar:
+            connection.execute(table.update().values({name: column.default.arg}))
+
+def _add_indexes(connection, table):
+    existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(bind=connection)
+
+def _backup_columns(connection):
+    # Colonnes ajoutées aux tables de sauvegarde: les bases créées avant ces
+    # évolutions ne sont pas modifiées par create_all (migration 0001)
+    from app.modules.backups.models import Backup, BackupSchedule, BackupStatus
+    _load_models()
+    backups = Backup.__table__
+    _add_columns(connection, backups, ["storage_backend", "checksum", "checksum_algorithm", "verified_at", "sharded"])
+    _add_columns(connection, BackupSchedule.__table__, [
+        "max_bandwidth_bytes", "max_iops", "adaptive_throttling", "sharded",
+        "gfs_daily", "gfs_weekly", "gfs_monthly", "last_run",
+    ])
+    _add_indexes(connection, backups)
+
+    dialect = connection.dialect.name
+    tables = set(inspect(connection).get_table_names())
+    # Archives de plus de 2 Go; SQLite stocke déjà les entiers sur 64 bits
+    file_size = BigInteger().compile(dialect=connection.dialect)
+    if dialect == "mysql":
+        connection.execute(text(f"ALTER TABLE backups MODIFY file_size {file_size} NULL"))
+    elif dialect == "postgresql":
+        connection.execute(text(f"ALTER TABLE backups ALTER COLUMN file_size TYPE {file_size}"))
+
+    # Statut CORRUPTED (vérification d'intégrité); SQLite n'a pas de type énuméré
+    if dialect == "mysql":
+        status = backups.c.status.type.compile(dialect=connection.dialect)
+        for table in ["backups", "restore_jobs"]:
+            if table in tables:
+                connection.execute(text(f"ALTER TABLE {table} MODIFY status {status} NULL"))
+    elif dialect == "postgresql":
+        connection.execute(text(f"ALTER TYPE backupstatus ADD VALUE IF NOT EXISTS '{BackupStatus.CORRUPTED.name}'"))
+
+def _member_roles(connection):
+    # Seuls les membres de rôle collector se partagent les cibles de collecte
+    from app.modules.coordination.models import SchedulerMember
+    _load_models()
+    _add_columns(connection, SchedulerMember.__table__, ["role"])
+    _add_indexes(connection, SchedulerMember.__table__)
+
+# (version, description, fonction appliquée dans une transaction), dans l'ordre
+MIGRATIONS = [
+    ("0001", "Schéma initial", _initial_schema),
+    ("0002", "Inventaire des utilisateurs des bases gérées", _user_inventory),
+    ("0003", "Colonnes et index des sauvegardes (intégrité, débit, rétention GFS)", _backup_columns),
+    ("0004", "Rôle des membres de la coordination des planificateurs", _member_roles),
+]
+
+def applied_versions(connection):
+    schema_migrations.create(bind=connection, checkfirst=True)
+    return {row.version for row in connection.execute(select(schema_migrations.c.version))}
+
+def upgrade(engine=None) -> list:
+    """
+    Applique les migrations en attente
+
+    Returns:
+        list: Versions appliquées
+    """
+    if engine is None:
+        from app.database import engine
+    applied = []
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+    for version, description, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        logger.info(f"Migration {version}: {description}")
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+    return applied
+
+def current(engine=None):
+    """Dernière version appliquée, None si aucune"""
+    if engine is None:
+        from app.database import engine
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+    versions = [version for version, _, _ in MIGRATIONS if version in done]
+    return versions[-1] if versions else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrations du schéma de la base centrale")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "current", "history"], default="upgrade")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "upgrade":
+        applied = upgrade()
+        print(f"{len(applied)} migration(s) appliquée(s)" + (f": {', '.join(applied)}" if applied else ""))
+    elif args.command == "current":
+        print(current() or "aucune")
+    else:
+        from app.database import engine
+        with engine.begin() as connection:
+            done = applied_versions(connection)
+        for version, description, _ in MIGRATIONS:
+            print(f"{version} {'appliquée ' if version in done else 'en attente'} {description}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
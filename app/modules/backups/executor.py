@@ -0,0 +1,99 @@
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.modules.monitoring.models import Metric
+from app.utils.helpers import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Débit de référence quand le mode adaptatif est actif sans limite explicite
+BACKUP_DEFAULT_MAX_BYTES_PER_SEC = int(os.environ.get("BACKUP_DEFAULT_MAX_BYTES_PER_SEC", str(50 * 1024 * 1024)))
+
+# Seuils de charge de la base cible au-delà desquels la sauvegarde ralentit
+BACKUP_ADAPTIVE_MAX_CONNECTIONS = int(os.environ.get("BACKUP_ADAPTIVE_MAX_CONNECTIONS", "100"))
+BACKUP_ADAPTIVE_MAX_LATENCY = float(os.environ.get("BACKUP_ADAPTIVE_MAX_LATENCY", "1.0"))  # secondes
+BACKUP_ADAPTIVE_CHECK_INTERVAL = int(os.environ.get("BACKUP_ADAPTIVE_CHECK_INTERVAL", "30"))  # secondes
+BACKUP_ADAPTIVE_MIN_FACTOR = float(os.environ.get("BACKUP_ADAPTIVE_MIN_FACTOR", "0.1"))
+
+# Au-delà de cet âge, une métrique n'est plus représentative de la charge actuelle
+METRIC_MAX_AGE = timedelta(minutes=int(os.environ.get("BACKUP_ADAPTIVE_METRIC_MAX_AGE_MINUTES", "15")))
+
+class AdaptiveThrottle(RateLimiter):
+    """
+    Limiteur de débit qui consulte périodiquement la charge de la base cible
+    et divise le débit par deux tant qu'elle est au-dessus des seuils.
+    """
+
+    def __init__(self, load_probe, max_bytes_per_sec=None, max_ops_per_sec=None,
+                 check_interval=BACKUP_ADAPTIVE_CHECK_INTERVAL, min_factor=BACKUP_ADAPTIVE_MIN_FACTOR):
+        super().__init__(max_bytes_per_sec=max_bytes_per_sec or BACKUP_DEFAULT_MAX_BYTES_PER_SEC,
+                         max_ops_per_sec=max_ops_per_sec)
+        self.load_probe = load_probe
+        self.check_interval = check_interval
+        self.min_factor = min_factor
+        self._last_check = 0.0
+
+    def consume(self, nbytes, ops=1):
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._adjust()
+        super().consume(nbytes, ops)
+
+    def _adjust(self):
+        try:
+            overloaded = self.load_probe()
+        except Exception as e:
+            logger.warning(f"Sonde de charge indisponible, débit inchangé: {str(e)}")
+            return
+
+        previous = self.factor
+        if overloaded:
+            self.factor = max(self.min_factor, self.factor / 2)
+        else:
+            self.factor = min(1.0, self.factor * 2)
+
+        if self.factor != previous:
+            logger.info(f"Débit de sauvegarde ajusté: facteur {previous:.2f} -> {self.factor:.2f}")
+
+def make_load_probe(database_id):
+    """Construit une sonde qui lit la dernière métrique collectée pour la base cible"""
+    def probe():
+        db = SessionLocal()
+        try:
+            latest = db.query(Metric.connections_count, Metric.query_latency).filter(
+                Metric.database_id == database_id,
+                Metric.timestamp >= datetime.utcnow() - METRIC_MAX_AGE
+            ).order_by(Metric.timestamp.desc()).first()
+        finally:
+            db.close()
+
+        if latest is None:
+            return False
+        connections, latency = latest
+        return bool(
+            (connections is not None and connections >= BACKUP_ADAPTIVE_MAX_CONNECTIONS) or
+            (latency is not None and latency >= BACKUP_ADAPTIVE_MAX_LATENCY)
+        )
+    return probe
+
+def build_throttle(backup):
+    """Construit le limiteur de débit d'une sauvegarde à partir de son planning"""
+    schedule = backup.schedule
+    if schedule is None:
+        return None
+
+    if schedule.adaptive_throttling:
+        return AdaptiveThrottle(
+            make_load_probe(backup.database_id),
+            max_bytes_per_sec=schedule.max_bandwidth_bytes,
+            max_ops_per_sec=schedule.max_iops
+        )
+
+    if schedule.max_bandwidth_bytes or schedule.max_iops:
+        return RateLimiter(max_bytes_per_sec=schedule.max_bandwidth_bytes,
+                           max_ops_per_sec=schedule.max_iops)
+    return None
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Enum
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, ForeignKey, Boolean, Text, Enum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -9,6 +9,7 @@ class BackupStatus(enum.Enum):
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
+    CORRUPTED = "corrupted"
 
 class BackupType(enum.Enum):
     FULL = "full"
@@ -25,6 +26,14 @@ class BackupSchedule(Base):
     frequency = Column(String(50), nullable=False)  # cron expression
     retention_days = Column(Integer, default=30)
     is_active = Column(Boolean, default=True)
+    max_bandwidth_bytes = Column(Integer, nullable=True)  # octets/s, None = illimité
+    max_iops = Column(Integer, nullable=True)  # écritures/s, None = illimité
+    adaptive_throttling = Column(Boolean, default=False)  # ralentit si la base cible est chargée
+    sharded = Column(Boolean, default=False)  # un fichier par table (MySQL)
+    gfs_daily = Column(Integer, nullable=True)  # rotation GFS: sauvegardes quotidiennes conservées
+    gfs_weekly = Column(Integer, nullable=True)  # hebdomadaires
+    gfs_monthly = Column(Integer, nullable=True)  # mensuelles
+    last_run = Column(DateTime, nullable=True)  # dernière exécution planifiée
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -37,16 +46,47 @@ class Backup(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     schedule_id = Column(Integer, ForeignKey("backup_schedules.id"), nullable=True)
-    database_id = Column(Integer, ForeignKey("database_connections.id"), nullable=False)
+    database_id = Column(Integer, ForeignKey("database_connections.id"), nullable=False, index=True)
     backup_type = Column(Enum(BackupType), default=BackupType.FULL)
     file_path = Column(String(255), nullable=True)
-    file_size = Column(Integer, nullable=True)  # taille en bytes
+    file_size = Column(BigInteger, nullable=True)  # taille en bytes
+    storage_backend = Column(String(255), nullable=True)  # URL du stockage (local BACKUP_DIR si vide)
     status = Column(Enum(BackupStatus), default=BackupStatus.PENDING)
     started_at = Column(DateTime, default=func.now())
-    completed_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True, index=True)
     error_message = Column(Text, nullable=True)
     retention_days = Column(Integer, default=30)
+    checksum = Column(String(128), nullable=True)  # empreinte calculée pendant l'écriture
+    checksum_algorithm = Column(String(20), nullable=True)
+    verified_at = Column(DateTime, nullable=True)  # dernière vérification d'intégrité
+    sharded = Column(Boolean, default=False)  # file_path pointe alors vers le manifeste
     
     # Relations
     schedule = relationship("BackupSchedule", back_populates="backups")
-    database = relationship("DatabaseConnection", back_populates="backups")
\ No newline at end of file
+    database = relationship("DatabaseConnection", back_populates="backups")
+
+class RestoreJob(Base):
+    __tablename__ = "restore_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    backup_id = Column(Integer, ForeignKey("backups.id", ondelete="SET NULL"), nullable=True)
+    target_database_id = Column(Integer, ForeignKey("database_connections.id"), nullable=False)
+    status = Column(Enum(BackupStatus), default=BackupStatus.PENDING)
+    point_in_time = Column(DateTime, nullable=True)
+    workers = Column(Integer, default=1)
+    bytes_total = Column(BigInteger, nullable=True)  # taille de l'archive en bytes
+    bytes_restored = Column(BigInteger, default=0)
+    throughput_bytes_per_sec = Column(Float, nullable=True)
+    started_at = Column(DateTime, default=func.now())
+    completed_at = Column(DateTime, nullable=True)
+    error_message = Column(Text, nullable=True)
+    
+    # Relations
+    backup = relationship("Backup")
+    
+    @property
+    def progress(self):
+        """Avancement en pourcentage des octets d'archive consommés"""
+        if not self.bytes_total:
+            return None
+        return min(100.0, 100.0 * (self.bytes_restored or 0) / self.bytes_total)
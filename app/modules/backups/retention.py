@@ -0,0 +1,49 @@
+def gfs_buckets(completed_at):
+    """Clés jour / semaine ISO / mois d'une sauvegarde pour la rotation GFS"""
+    iso_year, iso_week, _ = completed_at.isocalendar()
+    return (
+        completed_at.date(),
+        (iso_year, iso_week),
+        (completed_at.year, completed_at.month)
+    )
+
+def select_gfs_keep(backups, daily=0, weekly=0, monthly=0):
+    """
+    Sélectionne les sauvegardes conservées par une politique GFS
+    (grand-père / père / fils).
+
+    La sauvegarde la plus récente de chacun des `daily` derniers jours,
+    des `weekly` dernières semaines et des `monthly` derniers mois est
+    conservée. La sauvegarde la plus récente est toujours conservée.
+
+    Args:
+        backups: Liste de tuples (id, completed_at)
+        daily: Nombre de sauvegardes quotidiennes à conserver (fils)
+        weekly: Nombre de sauvegardes hebdomadaires à conserver (pères)
+        monthly: Nombre de sauvegardes mensuelles à conserver (grands-pères)
+
+    Returns:
+        set: Identifiants des sauvegardes à conserver
+    """
+    ordered = sorted(
+        (backup for backup in backups if backup[1] is not None),
+        key=lambda backup: backup[1],
+        reverse=True
+    )
+    if not ordered:
+        return set()
+
+    keep = {ordered[0][0]}
+    limits = (daily or 0, weekly or 0, monthly or 0)
+    seen = (set(), set(), set())
+
+    # Parcours du plus récent au plus ancien: la première sauvegarde
+    # rencontrée dans un jour/semaine/mois est la plus récente de celui-ci
+    for backup_id, completed_at in ordered:
+        for level, bucket in enumerate(gfs_buckets(completed_at)):
+            if bucket in seen[level] or len(seen[level]) >= limits[level]:
+                continue
+            seen[level].add(bucket)
+            keep.add(backup_id)
+
+    return keep
@@ -5,8 +5,8 @@ from datetime import datetime
 
 from app.database import get_db
 from app.modules.backups import schemas, service
-from app.modules.backups.models import BackupType, BackupStatus, Backup
-from app.modules.backups.scheduler import BackupSchedule
+from app.modules.backups.models import BackupType, BackupStatus, Backup, RestoreJob
+from app.modules.backups.scheduler import BackupSchedule, OffsetCronTrigger, sync_schedule
 from app.modules.monitoring.models import DatabaseConnection
 
 router = APIRouter(
@@ -15,40 +15,31 @@ router = APIRouter(
 )
 
 @router.post("/backups", response_model=schemas.BackupResponse)
-async def create_backup(
+def create_backup(
     backup: schemas.BackupCreate,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Lance une sauvegarde en arriere plan"""
-    db_backup = service.create_backup(db, backup)
-    if not db_backup:
-        raise HTTPException(status_code=404, detail="Database not found")
-    
     #Verifie si la base existe
     database = db.query(DatabaseConnection).filter(DatabaseConnection.id == backup.database_id).first()
     if not database:
         raise HTTPException(status_code=404, detail="Database not found")
     
- 
-# Créer l'entrée de sauvegarde
-    db_backup = Backup(
-        database_id=backup.database_id,
-        backup_type=backup.backup_type,
-        status="running",
-        started_at=datetime.now(),
-        retention_days=backup.retention_days or 30
-    )
-    db.add(db_backup)
-    db.commit()
-    db.refresh(db_backup)
+    _backup_type(backup.backup_type)
+    
+    if backup.sharded and database.db_type.lower() != "mysql":
+        raise HTTPException(status_code=400, detail="Sharded backups are only supported for MySQL")
+    
+    # Créer l'entrée de sauvegarde
+    db_backup = service.create_backup(db, backup)
     
     # Lancer la sauvegarde en arrière-plan
     background_tasks.add_task(service.execute_backup, db_backup.id)
     
     return db_backup
 @router.get("/backups", response_model=List[schemas.BackupResponse])
-async def get_backups(
+def get_backups(
     database_id: Optional[int] = None,
     status: Optional[str] = None,
     limit: int = 100,
@@ -67,48 +58,169 @@ async def get_backups(
     return backups
 
 @router.post("/backups/{backup_id}/restore", response_model=schemas.RestoreResponse)
-async def restore_backup(
+def restore_backup(
     backup_id: int,
     restore_data: schemas.RestoreCreate,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Restaure une base de données à partir d'une sauvegarde"""
-    try:
-        background_tasks.add_task(
-            service.restore_backup, 
-            db, 
-            backup_id, 
-            restore_data.target_database_id
-        )
-        return {
-            "message": "Restauration lancée en arrière-plan",
-            "status": "RUNNING"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    backup = db.query(Backup).filter(Backup.id == backup_id).first()
+    if not backup:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    
+    if restore_data.target_database_id:
+        target = db.query(DatabaseConnection).filter(DatabaseConnection.id == restore_data.target_database_id).first()
+        if not target:
+            raise HTTPException(status_code=404, detail="Target database not found")
+    
+    job = service.create_restore_job(
+        db,
+        backup,
+        target_database_id=restore_data.target_database_id,
+        point_in_time=restore_data.point_in_time,
+        workers=restore_data.workers
+    )
+    
+    # La tâche ouvre sa propre session: celle de la requête est fermée après la réponse
+    background_tasks.add_task(service.restore_backup, job.id)
+    return {
+        "message": "Restauration lancée en arrière-plan",
+        "status": "RUNNING",
+        "restore_job_id": job.id
+    }
+
+@router.get("/restores", response_model=List[schemas.RestoreJobResponse])
+def get_restore_jobs(
+    backup_id: Optional[int] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Récupère la liste des restaurations"""
+    query = db.query(RestoreJob)
+    
+    if backup_id:
+        query = query.filter(RestoreJob.backup_id == backup_id)
+    
+    return query.order_by(RestoreJob.started_at.desc()).limit(limit).all()
+
+@router.get("/restores/{job_id}", response_model=schemas.RestoreJobResponse)
+def get_restore_job(
+    job_id: int,
+    db: Session = Depends(get_db)
+):
+    """Récupère l'avancement et le débit d'une restauration"""
+    job = db.query(RestoreJob).filter(RestoreJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Restore job not found")
+    return job
+
+@router.post("/backups/{backup_id}/verify", response_model=schemas.BackupVerifyResponse)
+def verify_backup(
+    backup_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Vérifie l'intégrité d'une sauvegarde en arrière-plan"""
+    backup = db.query(Backup).filter(Backup.id == backup_id).first()
+    if not backup:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    if not backup.checksum:
+        raise HTTPException(status_code=400, detail="No checksum recorded for this backup")
+
+    background_tasks.add_task(service.verify_backup, backup_id)
+    return {
+        "message": "Vérification lancée en arrière-plan",
+        "status": "RUNNING"
+    }
 
 @router.post("/schedules", response_model=schemas.BackupScheduleResponse)
-async def create_backup_schedule(
+def create_backup_schedule(
     schedule: schemas.BackupScheduleCreate,
     db: Session = Depends(get_db)
 ):
     """Crée un planning de sauvegarde automatique"""
+    _validate_frequency(schedule.frequency)
     db_schedule = BackupSchedule(
         database_id=schedule.database_id,
         name=schedule.name,
-        backup_type=schedule.backup_type,
+        backup_type=_backup_type(schedule.backup_type),
         frequency=schedule.frequency,
         retention_days=schedule.retention_days,
-        is_active=schedule.is_active
+        is_active=schedule.is_active,
+        max_bandwidth_bytes=schedule.max_bandwidth_bytes,
+        max_iops=schedule.max_iops,
+        adaptive_throttling=schedule.adaptive_throttling,
+        sharded=schedule.sharded,
+        gfs_daily=schedule.gfs_daily,
+        gfs_weekly=schedule.gfs_weekly,
+        gfs_monthly=schedule.gfs_monthly
     )
     db.add(db_schedule)
     db.commit()
     db.refresh(db_schedule)
+    
+    # Enregistrer la tâche sans attendre la prochaine réconciliation
+    sync_schedule(db_schedule.id)
+    return db_schedule
+
+@router.put("/schedules/{schedule_id}", response_model=schemas.BackupScheduleResponse)
+def update_backup_schedule(
+    schedule_id: int,
+    schedule: schemas.BackupScheduleUpdate,
+    db: Session = Depends(get_db)
+):
+    """Modifie un planning de sauvegarde et sa tâche planifiée"""
+    db_schedule = db.query(BackupSchedule).filter(BackupSchedule.id == schedule_id).first()
+    if not db_schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    
+    schedule_data = schedule.dict(exclude_unset=True)
+    if "frequency" in schedule_data:
+        _validate_frequency(schedule_data["frequency"])
+    if "backup_type" in schedule_data:
+        schedule_data["backup_type"] = _backup_type(schedule_data["backup_type"])
+    for key, value in schedule_data.items():
+        setattr(db_schedule, key, value)
+    db.commit()
+    db.refresh(db_schedule)
+    
+    sync_schedule(db_schedule.id)
     return db_schedule
 
+@router.delete("/schedules/{schedule_id}")
+def delete_backup_schedule(
+    schedule_id: int,
+    db: Session = Depends(get_db)
+):
+    """Supprime un planning de sauvegarde (les sauvegardes produites sont conservées)"""
+    db_schedule = db.query(BackupSchedule).filter(BackupSchedule.id == schedule_id).first()
+    if not db_schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    
+    db.query(Backup).filter(Backup.schedule_id == schedule_id).update(
+        {Backup.schedule_id: None}, synchronize_session=False
+    )
+    db.delete(db_schedule)
+    db.commit()
+    
+    sync_schedule(schedule_id)
+    return {"message": "Planning supprimé"}
+
+def _validate_frequency(frequency):
+    try:
+        OffsetCronTrigger.from_crontab(frequency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cron expression: {str(e)}")
+
+def _backup_type(value):
+    try:
+        return BackupType(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid backup type: {value}")
+
 @router.get("/schedules", response_model=List[schemas.BackupScheduleResponse])
-async def get_backup_schedules(
+def get_backup_schedules(
     database_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
@@ -1,16 +1,93 @@
 # scheduler.py
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.orm import Session
 import logging
-from datetime import datetime
+import os
+import zlib
+from datetime import datetime, timedelta
 
-from app.database import SessionLocal
-from app.modules.backups.models import BackupSchedule, BackupType, BackupStatus
-from app.modules.backups.service import create_backup, execute_backup
+from app.database import SessionLocal, engine
+from app.modules.backups import schemas
+from app.modules.backups.models import Backup, BackupSchedule, BackupType, BackupStatus
+from app.modules.backups.service import create_backup, execute_backup, sweep_expired_backups, verify_backups_job
+from app.modules.coordination.service import elector
+
+BACKUP_RETENTION_SWEEP_MINUTES = int(os.environ.get("BACKUP_RETENTION_SWEEP_MINUTES", "30"))
+
+# Rechargement périodique des plannings (modifications faites par un autre processus)
+BACKUP_SCHEDULE_RECONCILE_SECONDS = int(os.environ.get("BACKUP_SCHEDULE_RECONCILE_SECONDS", "60"))
+
+# Étalement maximal des plannings partageant le même créneau cron
+BACKUP_SCHEDULE_SPREAD_SECONDS = int(os.environ.get("BACKUP_SCHEDULE_SPREAD_SECONDS", "900"))
+
+# Au-delà de ce retard (redémarrage, arrêt prolongé), une exécution manquée est abandonnée
+BACKUP_MISFIRE_GRACE_SECONDS = int(os.environ.get("BACKUP_MISFIRE_GRACE_SECONDS", "3600"))
+
+# Une sauvegarde restée « en cours » plus longtemps est considérée abandonnée (instance arrêtée)
+BACKUP_RUNNING_STALE_HOURS = int(os.environ.get("BACKUP_RUNNING_STALE_HOURS", "12"))
+
+JOB_PREFIX = "backup_schedule_"
+
+# Bail de l'instance qui exécute le planificateur de sauvegardes
+BACKUP_SCHEDULER_LEASE = "backup-scheduler"
 
 logger = logging.getLogger(__name__)
 
+_scheduler = None
+
+class OffsetCronTrigger(CronTrigger):
+    """
+    Déclencheur cron décalé d'un nombre fixe de secondes, pour que des
+    plannings partageant la même expression ne démarrent pas tous ensemble.
+    """
+
+    offset = 0
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        offset = timedelta(seconds=self.offset)
+        if previous_fire_time is not None:
+            previous_fire_time = previous_fire_time - offset
+        next_fire_time = super().get_next_fire_time(previous_fire_time, now - offset)
+        return next_fire_time + offset if next_fire_time else None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["offset"] = self.offset
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self.offset = state.pop("offset", 0)
+        super().__setstate__(state)
+
+    def __str__(self):
+        return f"{super().__str__()}+{self.offset}s"
+
+def schedule_offset(schedule_id, trigger):
+    """
+    Décalage déterministe d'un planning: dérivé de son identifiant et
+    borné à la moitié de la période cron pour ne pas chevaucher l'exécution suivante.
+    """
+    if BACKUP_SCHEDULE_SPREAD_SECONDS <= 0:
+        return 0
+    now = datetime.now(trigger.timezone)
+    first = CronTrigger.get_next_fire_time(trigger, None, now)
+    second = CronTrigger.get_next_fire_time(trigger, first, first + timedelta(seconds=1)) if first else None
+    spread = BACKUP_SCHEDULE_SPREAD_SECONDS
+    if first and second:
+        spread = min(spread, int((second - first).total_seconds() // 2))
+    return zlib.crc32(f"{JOB_PREFIX}{schedule_id}".encode()) % max(1, spread)
+
+def build_trigger(schedule):
+    """Construit le déclencheur décalé d'un planning à partir de son expression cron"""
+    trigger = OffsetCronTrigger.from_crontab(schedule.frequency)
+    trigger.offset = schedule_offset(schedule.id, trigger)
+    return trigger
+
 def run_scheduled_backup(schedule_id):
     """Exécute une sauvegarde planifiée"""
     db = SessionLocal()
@@ -20,52 +97,171 @@ def run_scheduled_backup(schedule_id):
         if not schedule or not schedule.is_active:
             logger.warning(f"Planning de sauvegarde inactive ou non trouvée: {schedule_id}")
             return
-        
-        # Exécuter la sauvegarde
+
+        # Bail perdu depuis le déclenchement: le nouveau responsable exécute le planning
+        if not elector.is_leader(BACKUP_SCHEDULER_LEASE):
+            logger.info(f"Sauvegarde planifiée ignorée (bail {BACKUP_SCHEDULER_LEASE} perdu): {schedule.name}")
+            return
+
+        # Exécution précédente encore en cours, par exemple sur l'ancien responsable
+        running = db.query(Backup.id).filter(
+            Backup.schedule_id == schedule.id,
+            Backup.status == BackupStatus.RUNNING,
+            Backup.started_at >= datetime.now() - timedelta(hours=BACKUP_RUNNING_STALE_HOURS)
+        ).first()
+        if running is not None:
+            logger.warning(f"Sauvegarde planifiée ignorée, sauvegarde {running.id} toujours en cours: {schedule.name}")
+            return
+
+        # Créer l'entrée de sauvegarde avec les paramètres du planning
         logger.info(f"Démarrage de la sauvegarde planifiée: {schedule.name}")
-        backup = create_backup(db, schedule.database_id, schedule.backup_type)
-        
+        backup = create_backup(db, schemas.BackupCreate(
+            database_id=schedule.database_id,
+            backup_type=schedule.backup_type.value if isinstance(schedule.backup_type, BackupType) else schedule.backup_type,
+            retention_days=schedule.retention_days,
+            sharded=bool(schedule.sharded)
+        ), schedule_id=schedule.id)
+
         # Mettre à jour le planning avec la dernière sauvegarde
         schedule.last_run = datetime.now()
         db.commit()
-        
+
+        execute_backup(backup.id)
+
+        db.refresh(backup)
         logger.info(f"Sauvegarde planifiée terminée: {schedule.name}, statut: {backup.status}")
     except Exception as e:
         logger.error(f"Erreur lors de l'exécution de la sauvegarde planifiée: {str(e)}")
     finally:
         db.close()
 
-def init_scheduler():
-    """Initialise le planificateur de sauvegardes"""
-    scheduler = BackgroundScheduler()
+def _add_schedule_job(scheduler, schedule):
+    scheduler.add_job(
+        run_scheduled_backup,
+        trigger=build_trigger(schedule),
+        args=[schedule.id],
+        id=f"{JOB_PREFIX}{schedule.id}",
+        name=schedule.name,
+        jobstore="backups",
+        replace_existing=True
+    )
+
+def sync_schedule(schedule_id):
+    """
+    Met à jour la tâche d'un planning après sa création, modification ou suppression.
+    Sans effet si le planificateur n'est pas démarré dans ce processus.
+    """
+    if _scheduler is None:
+        return
+
+    db = SessionLocal()
+    try:
+        schedule = db.query(BackupSchedule).filter(BackupSchedule.id == schedule_id).first()
+        job_id = f"{JOB_PREFIX}{schedule_id}"
+        if schedule is None or not schedule.is_active:
+            if _scheduler.get_job(job_id, jobstore="backups"):
+                _scheduler.remove_job(job_id, jobstore="backups")
+                logger.info(f"Planning de sauvegarde retiré: {schedule_id}")
+            return
+
+        _add_schedule_job(_scheduler, schedule)
+        logger.info(f"Planning de sauvegarde configuré: {schedule.name} ({schedule.frequency})")
+    finally:
+        db.close()
+
+def reconcile_schedules():
+    """
+    Aligne les tâches du planificateur sur les plannings actifs en base:
+    ajout des nouveaux, remplacement de ceux dont l'expression a changé,
+    retrait des plannings supprimés ou désactivés.
+    """
+    if _scheduler is None:
+        return
+
     db = SessionLocal()
-    
     try:
-        # Récupérer tous les plannings de sauvegarde actifs
         schedules = db.query(BackupSchedule).filter(BackupSchedule.is_active == True).all()
-        
-        for schedule in schedules:
-            # Créer un déclencheur cron à partir de l'expression de fréquence
-            try:
-                trigger = CronTrigger.from_crontab(schedule.frequency)
-                
-                # Ajouter la tâche au planificateur
-                scheduler.add_job(
-                    run_scheduled_backup,
-                    trigger=trigger,
-                    args=[schedule.id],
-                    id=f"backup_schedule_{schedule.id}",
-                    replace_existing=True
-                )
-                
-                logger.info(f"Planning de sauvegarde configuré: {schedule.name} ({schedule.frequency})")
-            except Exception as e:
-                logger.error(f"Erreur lors de la configuration du planning {schedule.name}: {str(e)}")
     finally:
         db.close()
-    
-    # Démarrer le planificateur
+
+    jobs = {job.id: job for job in _scheduler.get_jobs(jobstore="backups")}
+    active_ids = set()
+    for schedule in schedules:
+        job_id = f"{JOB_PREFIX}{schedule.id}"
+        active_ids.add(job_id)
+        try:
+            trigger = build_trigger(schedule)
+            job = jobs.get(job_id)
+            # Une tâche inchangée garde sa prochaine exécution
+            if job is not None and str(job.trigger) == str(trigger) and job.name == schedule.name:
+                continue
+            _add_schedule_job(_scheduler, schedule)
+            logger.info(f"Planning de sauvegarde configuré: {schedule.name} ({schedule.frequency})")
+        except Exception as e:
+            logger.error(f"Erreur lors de la configuration du planning {schedule.name}: {str(e)}")
+
+    for job_id in set(jobs) - active_ids:
+        _scheduler.remove_job(job_id, jobstore="backups")
+        logger.info(f"Planning de sauvegarde retiré: {job_id}")
+
+def init_scheduler():
+    """Initialise le planificateur de sauvegardes"""
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+
+    # Tâches des plannings persistées: les exécutions manquées pendant un arrêt
+    # sont regroupées en une seule au redémarrage
+    scheduler = BackgroundScheduler(
+        jobstores={
+            "default": MemoryJobStore(),
+            "backups": SQLAlchemyJobStore(engine=engine, tablename="backup_scheduler_jobs")
+        },
+        job_defaults={
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": BACKUP_MISFIRE_GRACE_SECONDS
+        }
+    )
+
+    # Vérification d'intégrité des sauvegardes à débit limité
+    scheduler.add_job(
+        verify_backups_job,
+        IntervalTrigger(hours=1),
+        id="verify_backups_job",
+        replace_existing=True,
+        max_instances=1
+    )
+
+    # Suppression en masse des sauvegardes expirées
+    scheduler.add_job(
+        sweep_expired_backups,
+        IntervalTrigger(minutes=BACKUP_RETENTION_SWEEP_MINUTES),
+        id="sweep_expired_backups",
+        replace_existing=True,
+        max_instances=1
+    )
+
+    # Prise en compte des plannings modifiés hors de ce processus
+    scheduler.add_job(
+        reconcile_schedules,
+        IntervalTrigger(seconds=BACKUP_SCHEDULE_RECONCILE_SECONDS),
+        id="reconcile_backup_schedules",
+        replace_existing=True,
+        max_instances=1
+    )
+
+    # Démarrer le planificateur puis charger les plannings actifs
     scheduler.start()
+    _scheduler = scheduler
+    reconcile_schedules()
     logger.info("Planificateur de sauvegardes démarré")
-    
-    return scheduler
\ No newline at end of file
+
+    return scheduler
+
+def shutdown_scheduler():
+    """Arrête le planificateur de sauvegardes"""
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
@@ -8,7 +8,8 @@ class BackupBase(BaseModel):
     backup_type: str = "full"
 
 class BackupCreate(BackupBase):
-    pass
+    retention_days: Optional[int] = 30
+    sharded: bool = False  # MySQL uniquement: un fichier par table
 
 class BackupResponse(BaseModel):
     id: int
@@ -16,25 +17,52 @@ class BackupResponse(BaseModel):
     backup_type: str
     file_path: Optional[str] = None
     file_size: Optional[int] = None
+    storage_backend: Optional[str] = None
     status: str
     started_at: datetime
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    checksum: Optional[str] = None
+    checksum_algorithm: Optional[str] = None
+    verified_at: Optional[datetime] = None
+    sharded: bool = False
     
     class Config:
         orm_mode = True
 
+class BackupVerifyResponse(BaseModel):
+    message: str
+    status: str
+
 class RestoreBase(BaseModel):
     backup_id: int
     target_database_id: Optional[int] = None
     point_in_time: Optional[datetime] = None
 
 class RestoreCreate(RestoreBase):
-    pass
+    workers: Optional[int] = None  # restauration parallèle des sauvegardes découpées
 
 class RestoreResponse(BaseModel):
     message: str
     status: str
+    restore_job_id: Optional[int] = None
+
+class RestoreJobResponse(BaseModel):
+    id: int
+    backup_id: Optional[int] = None  # None une fois la sauvegarde supprimée par la rétention
+    target_database_id: int
+    status: str
+    workers: int
+    bytes_total: Optional[int] = None
+    bytes_restored: int = 0
+    progress: Optional[float] = None
+    throughput_bytes_per_sec: Optional[float] = None
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+    
+    class Config:
+        orm_mode = True
 
 class BackupScheduleResponse(BaseModel):
     id: int
@@ -44,6 +72,14 @@ class BackupScheduleResponse(BaseModel):
     frequency: str
     retention_days: int
     is_active: bool
+    max_bandwidth_bytes: Optional[int] = None
+    max_iops: Optional[int] = None
+    adaptive_throttling: bool = False
+    sharded: bool = False
+    gfs_daily: Optional[int] = None
+    gfs_weekly: Optional[int] = None
+    gfs_monthly: Optional[int] = None
+    last_run: Optional[datetime] = None
     
     class Config:
         orm_mode = True
@@ -55,3 +91,24 @@ class BackupScheduleCreate(BaseModel):
     frequency: str  # cron expression
     retention_days: int = 30
     is_active: bool = True
+    max_bandwidth_bytes: Optional[int] = None  # octets/s
+    max_iops: Optional[int] = None
+    adaptive_throttling: bool = False
+    sharded: bool = False
+    gfs_daily: Optional[int] = None
+    gfs_weekly: Optional[int] = None
+    gfs_monthly: Optional[int] = None
+
+class BackupScheduleUpdate(BaseModel):
+    name: Optional[str] = None
+    backup_type: Optional[str] = None
+    frequency: Optional[str] = None  # cron expression
+    retention_days: Optional[int] = None
+    is_active: Optional[bool] = None
+    max_bandwidth_bytes: Optional[int] = None
+    max_iops: Optional[int] = None
+    adaptive_throttling: Optional[bool] = None
+    sharded: Optional[bool] = None
+    gfs_daily: Optional[int] = None
+    gfs_weekly: Optional[int] = None
+    gfs_monthly: Optional[int] = None
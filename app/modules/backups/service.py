@@ -1,25 +1,53 @@
 
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait
+import glob
 import os
+import threading
+import time
+from sqlalchemy import and_, delete, or_, select
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.modules.monitoring.models import DatabaseConnection
-from app.modules.backups.models import Backup
+from app.modules.backups.models import Backup, BackupSchedule, BackupStatus, BackupType, RestoreJob
+from app.modules.backups.executor import build_throttle
+from app.modules.backups.retention import select_gfs_keep
+from app.modules.backups.storage import BACKUP_ROOT, get_storage, storage_for_backup
+from app.utils.health import check_reachable
+from app.utils.helpers import is_manifest, manifest_parts, verify_archive, verify_manifest
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-BACKUP_ROOT = os.environ.get("BACKUP_DIR", "./backups")
+# Vérification d'intégrité en arrière-plan
+BACKUP_VERIFY_INTERVAL_DAYS = int(os.environ.get("BACKUP_VERIFY_INTERVAL_DAYS", "7"))
+BACKUP_VERIFY_MAX_BYTES_PER_SEC = int(os.environ.get("BACKUP_VERIFY_MAX_BYTES_PER_SEC", str(20 * 1024 * 1024)))
+BACKUP_VERIFY_BATCH_SIZE = int(os.environ.get("BACKUP_VERIFY_BATCH_SIZE", "10"))
 
-def create_backup(db, backup_data):
+# Types de bases dont l'archive n'est pas un flux gzip (mongodump --archive --gzip: format mongodump)
+NON_GZIP_ARCHIVE_TYPES = {"mongodb"}
+
+# Rétention: statuts concernés, taille des lots et suppression parallèle des fichiers
+RETENTION_STATUSES = [BackupStatus.COMPLETED, BackupStatus.CORRUPTED]
+RETENTION_BATCH_SIZE = int(os.environ.get("BACKUP_RETENTION_BATCH_SIZE", "500"))
+RETENTION_DELETE_WORKERS = int(os.environ.get("BACKUP_RETENTION_DELETE_WORKERS", "8"))
+
+# Restauration: parallélisme par défaut et fréquence de mise à jour de l'avancement
+RESTORE_WORKERS = int(os.environ.get("RESTORE_WORKERS", "4"))
+RESTORE_PROGRESS_INTERVAL = float(os.environ.get("RESTORE_PROGRESS_INTERVAL", "2"))
+
+def create_backup(db, backup_data, schedule_id=None):
     """Crée une entrée de sauvegarde et lance l'exécution"""
     # Créer l'entrée de sauvegarde
     db_backup = Backup(
+        schedule_id=schedule_id,
         database_id=backup_data.database_id,
-        backup_type=backup_data.backup_type,
-        status="running",
+        backup_type=BackupType(backup_data.backup_type),
+        status=BackupStatus.RUNNING,
         started_at=datetime.now(),
-        retention_days=backup_data.retention_days or 30
+        retention_days=backup_data.retention_days or 30,
+        sharded=backup_data.sharded
     )
     db.add(db_backup)
     db.commit()
@@ -38,6 +66,9 @@ def get_adapter_for_database(db_id):
         if not database:
             raise ValueError(f"Base de données non trouvée: {db_id}")
         
+        # Les outils de sauvegarde se connectent seuls: échec immédiat si la base est injoignable
+        check_reachable(database.host, database.port)
+        
         if database.db_type.lower() == "mysql":
             from app.adapters.mysql_adapter import MySQLAdapter
             return MySQLAdapter(
@@ -84,67 +115,310 @@ def execute_backup(backup_id):
         # Obtenir les informations de la base
         database = db.query(DatabaseConnection).filter(DatabaseConnection.id == backup.database_id).first()
         
-        # Créer le répertoire spécifique au type de base
-        db_type_dir = os.path.join(BACKUP_ROOT, database.db_type.lower())
-        os.makedirs(db_type_dir, exist_ok=True)
+        # Stockage configuré, ou disque local si l'outil de sauvegarde écrit lui-même ses fichiers
+        storage = get_storage() if adapter.supports_storage else get_storage(BACKUP_ROOT)
+        adapter.storage = storage
         
-        # Générer le nom de fichier
+        # Générer l'emplacement: un répertoire par type de base
+        # (les adaptateurs reçoivent le type sous forme de chaîne: full, incremental, differential)
+        backup_type = backup.backup_type.value
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = os.path.join(
-            db_type_dir, 
-            f"{database.name}_{timestamp}_{backup.backup_type}"
+        backup_path = storage.location(
+            f"{database.db_type.lower()}/{database.name}_{timestamp}_{backup_type}"
         )
         
+        # Limites de débit et mode adaptatif définis par le planning
+        throttle = build_throttle(backup)
+        
         logger.info(f"Démarrage de la sauvegarde {backup_id} pour {database.name}")
-        result = adapter.backup(backup_path, backup.backup_type)
+        options = {'throttle': throttle}
+        if backup.sharded:
+            options['sharded'] = True
+        result = adapter.backup(backup_path, backup_type, **options)
         
         # Mettre à jour l'entrée de sauvegarde
         backup.file_path = result.get('path')
+        backup.storage_backend = storage.url
         backup.file_size = result.get('size', 0)
-        backup.status = "completed" if result.get('status') == 'success' else "failed"
+        backup.checksum = result.get('checksum')
+        backup.checksum_algorithm = result.get('checksum_algorithm')
+        backup.status = BackupStatus.COMPLETED if result.get('status') == 'success' else BackupStatus.FAILED
         backup.error_message = result.get('message')
         backup.completed_at = datetime.now()
         
         db.commit()
         
-        # Nettoyer les anciennes sauvegardes
-        cleanup_old_backups(backup.database_id, backup.retention_days)
-        
         logger.info(f"Sauvegarde {backup_id} terminée avec statut: {backup.status}")
     except Exception as e:
         logger.error(f"Erreur pendant la sauvegarde {backup_id}: {str(e)}")
         if backup:
-            backup.status = "failed"
+            backup.status = BackupStatus.FAILED
             backup.error_message = str(e)
             backup.completed_at = datetime.now()
             db.commit()
     finally:
         db.close()
 
-def cleanup_old_backups(database_id, retention_days=30):
-    """Supprime les sauvegardes plus anciennes que retention_days"""
+def sweep_expired_backups():
+    """
+    Tâche planifiée de rétention: supprime en masse les sauvegardes expirées
+    (durée de rétention ou rotation GFS du planning), puis leurs fichiers en parallèle.
+    Les sauvegardes conservées ne sont jamais lues sur le disque.
+    """
     db = SessionLocal()
     try:
-        cutoff_date = datetime.now() - timedelta(days=retention_days)
-        
-        # Trouver les sauvegardes expirées
-        old_backups = db.query(Backup).filter(
-            Backup.database_id == database_id,
-            Backup.status == "completed",
-            Backup.completed_at < cutoff_date
-        ).all()
+        expired_files = []
         
-        for backup in old_backups:
-            try:
-                # Supprimer le fichier
-                if backup.file_path and os.path.exists(backup.file_path):
-                    os.remove(backup.file_path)
-                
-                # Supprimer l'entrée de la base
-                db.delete(backup)
-            except Exception as e:
-                logger.error(f"Erreur lors du nettoyage de la sauvegarde {backup.id}: {str(e)}")
+        # Rétention simple: une requête par durée de rétention distincte
+        retention_values = [row[0] for row in db.query(Backup.retention_days).filter(
+            Backup.status.in_(RETENTION_STATUSES),
+            _without_gfs_policy()
+        ).distinct()]
+        for retention_days in retention_values:
+            cutoff_date = datetime.now() - timedelta(days=retention_days or 30)
+            expired_files += _bulk_delete_backups(db, and_(
+                Backup.status.in_(RETENTION_STATUSES),
+                Backup.retention_days == retention_days,
+                Backup.completed_at < cutoff_date,
+                _without_gfs_policy()
+            ))
         
+        # Rotation GFS: seuls les couples (id, date) du planning sont chargés
+        for schedule in db.query(BackupSchedule).filter(
+            (BackupSchedule.gfs_daily > 0) | (BackupSchedule.gfs_weekly > 0) | (BackupSchedule.gfs_monthly > 0)
+        ).all():
+            candidates = db.query(Backup.id, Backup.completed_at).filter(
+                Backup.schedule_id == schedule.id,
+                Backup.status.in_(RETENTION_STATUSES)
+            ).all()
+            keep = select_gfs_keep(candidates, schedule.gfs_daily, schedule.gfs_weekly, schedule.gfs_monthly)
+            expired_ids = [backup_id for backup_id, _ in candidates if backup_id not in keep]
+            for start in range(0, len(expired_ids), RETENTION_BATCH_SIZE):
+                expired_files += _bulk_delete_backups(
+                    db, Backup.id.in_(expired_ids[start:start + RETENTION_BATCH_SIZE])
+                )
+    finally:
+        db.close()
+    
+    # Fichiers supprimés après validation des suppressions en base
+    with ThreadPoolExecutor(max_workers=RETENTION_DELETE_WORKERS) as pool:
+        for backup_id, error in pool.map(_remove_backup_files, expired_files):
+            if error:
+                logger.error(f"Erreur lors du nettoyage de la sauvegarde {backup_id}: {error}")
+    
+    if expired_files:
+        logger.info(f"Rétention: {len(expired_files)} sauvegardes expirées supprimées")
+    return len(expired_files)
+
+def _without_gfs_policy():
+    """Sauvegardes hors planning ou dont le planning n'a pas de rotation GFS"""
+    gfs_schedules = select(BackupSchedule.id).where(
+        (BackupSchedule.gfs_daily > 0) | (BackupSchedule.gfs_weekly > 0) | (BackupSchedule.gfs_monthly > 0)
+    )
+    return or_(Backup.schedule_id.is_(None), Backup.schedule_id.not_in(gfs_schedules))
+
+def _bulk_delete_backups(db, condition):
+    """
+    Supprime en une requête les sauvegardes correspondant à la condition
+    et retourne leurs (id, file_path, storage_backend), via DELETE ... RETURNING si le
+    dialecte le permet, sinon via SELECT ... FOR UPDATE puis DELETE.
+    """
+    if db.get_bind().dialect.delete_returning:
+        rows = db.execute(
+            delete(Backup).where(condition).returning(Backup.id, Backup.file_path, Backup.storage_backend)
+        ).all()
+    else:
+        rows = db.execute(
+            select(Backup.id, Backup.file_path, Backup.storage_backend).where(condition).with_for_update()
+        ).all()
+        if rows:
+            db.execute(
+                delete(Backup).where(Backup.id.in_([row.id for row in rows])),
+                execution_options={"synchronize_session": False}
+            )
+    db.commit()
+    return [(row.id, row.file_path, row.storage_backend) for row in rows]
+
+def _remove_backup_files(expired):
+    """Supprime les fichiers d'une sauvegarde (archive, métadonnées ou répertoire découpé)"""
+    backup_id, file_path, storage_backend = expired
+    if not file_path:
+        return backup_id, None
+    try:
+        storage = get_storage(storage_backend or BACKUP_ROOT)
+        if is_manifest(file_path):
+            storage.delete_prefix(os.path.dirname(file_path))
+        elif file_path.endswith("*"):
+            # RMAN produit plusieurs fichiers suffixés (chemin en "_*"), toujours en local
+            for path in glob.glob(file_path):
+                os.remove(path)
+        else:
+            storage.delete(file_path)
+            base_path = file_path[:-3] if file_path.endswith(".gz") else file_path
+            if storage.exists(f"{base_path}.metadata"):
+                storage.delete(f"{base_path}.metadata")
+        return backup_id, None
+    except Exception as e:
+        return backup_id, str(e)
+
+def gzip_archive(backup):
+    """Vrai si l'archive est un flux gzip (voir DatabaseAdapter.gzip_archives)"""
+    return backup.database is None or backup.database.db_type.lower() not in NON_GZIP_ARCHIVE_TYPES
+
+def verify_backup(backup_id, max_bytes_per_sec=BACKUP_VERIFY_MAX_BYTES_PER_SEC):
+    """Relit une sauvegarde, vérifie son empreinte et teste sa décompression"""
+    db = SessionLocal()
+    try:
+        backup = db.query(Backup).filter(Backup.id == backup_id).first()
+        if not backup:
+            logger.error(f"Sauvegarde non trouvée: {backup_id}")
+            return None
+
+        if not backup.checksum or not backup.file_path:
+            return {'valid': False, 'checksum': None, 'message': "Aucune empreinte enregistrée pour cette sauvegarde"}
+
+        options = {}
+        if not is_manifest(backup.file_path):
+            options['decompress'] = gzip_archive(backup)
+        verify = verify_manifest if is_manifest(backup.file_path) else verify_archive
+        result = verify(
+            backup.file_path,
+            expected_checksum=backup.checksum,
+            algorithm=backup.checksum_algorithm or "sha256",
+            max_bytes_per_sec=max_bytes_per_sec,
+            opener=storage_for_backup(backup).open_read,
+            **options
+        )
+
+        backup.verified_at = datetime.now()
+        if not result['valid']:
+            logger.error(f"Sauvegarde {backup_id} corrompue: {result['message']}")
+            backup.status = BackupStatus.CORRUPTED
+            backup.error_message = result['message']
         db.commit()
+
+        return result
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def verify_backups_job():
+    """Tâche planifiée: vérifie les sauvegardes jamais ou anciennement vérifiées"""
+    db = SessionLocal()
+    try:
+        cutoff_date = datetime.now() - timedelta(days=BACKUP_VERIFY_INTERVAL_DAYS)
+        backup_ids = [row.id for row in db.query(Backup.id).filter(
+            Backup.status == BackupStatus.COMPLETED,
+            Backup.checksum.isnot(None),
+            (Backup.verified_at.is_(None)) | (Backup.verified_at < cutoff_date)
+        ).order_by(Backup.verified_at).limit(BACKUP_VERIFY_BATCH_SIZE)]
+    finally:
+        db.close()
+
+    # Une sauvegarde à la fois pour garder un débit de lecture borné
+    for backup_id in backup_ids:
+        try:
+            verify_backup(backup_id)
+        except Exception as e:
+            logger.error(f"Erreur lors de la vérification de la sauvegarde {backup_id}: {str(e)}")
+
+def create_restore_job(db, backup, target_database_id=None, point_in_time=None, workers=None):
+    """Crée l'entrée de suivi d'une restauration"""
+    job = RestoreJob(
+        backup_id=backup.id,
+        target_database_id=target_database_id or backup.database_id,
+        status=BackupStatus.PENDING,
+        point_in_time=point_in_time,
+        workers=workers or (RESTORE_WORKERS if backup.sharded else 1),
+        bytes_total=_backup_total_size(backup),
+        bytes_restored=0
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def _backup_total_size(backup):
+    """Taille totale des archives à relire pour restaurer une sauvegarde"""
+    if is_manifest(backup.file_path):
+        storage = storage_for_backup(backup)
+        if storage.exists(backup.file_path):
+            with storage.open_read(backup.file_path) as f:
+                return sum(part['size'] for part in manifest_parts(json.load(f)))
+    return backup.file_size
+
+class RestoreProgress:
+    """Compteur d'octets partagé entre les workers de restauration"""
+
+    def __init__(self):
+        self.bytes_restored = 0
+        self._lock = threading.Lock()
+
+    def add(self, nbytes):
+        with self._lock:
+            self.bytes_restored += nbytes
+
+def restore_backup(job_id):
+    """Exécute une restauration en suivant son avancement et son débit"""
+    db = SessionLocal()
+    job = None
+    try:
+        job = db.query(RestoreJob).filter(RestoreJob.id == job_id).first()
+        if not job:
+            logger.error(f"Restauration non trouvée: {job_id}")
+            return
+
+        backup = job.backup
+        if not backup or not backup.file_path:
+            raise ValueError(f"Sauvegarde {job.backup_id} sans fichier à restaurer")
+
+        adapter = get_adapter_for_database(job.target_database_id)
+        # Lecture depuis le stockage de la sauvegarde (par plages pour un stockage objet)
+        adapter.storage = storage_for_backup(backup)
+        progress = RestoreProgress()
+
+        job.status = BackupStatus.RUNNING
+        job.started_at = datetime.now()
+        db.commit()
+        started = time.monotonic()
+
+        logger.info(f"Démarrage de la restauration {job_id} depuis la sauvegarde {backup.id}")
+
+        # La restauration tourne dans un thread; la session reste dans celui-ci
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(
+                adapter.restore,
+                backup.file_path,
+                point_in_time=job.point_in_time,
+                workers=job.workers,
+                progress=progress.add
+            )
+            while not future.done():
+                wait([future], timeout=RESTORE_PROGRESS_INTERVAL)
+                _update_restore_progress(job, progress, started)
+                db.commit()
+            result = future.result()
+
+        _update_restore_progress(job, progress, started)
+        job.completed_at = datetime.now()
+        if result and result.get('status') == 'success':
+            job.status = BackupStatus.COMPLETED
+        else:
+            job.status = BackupStatus.FAILED
+            job.error_message = (result or {}).get('message', "Restauration non supportée pour ce type de base")
+        db.commit()
+
+        logger.info(f"Restauration {job_id} terminée avec statut: {job.status}")
+    except Exception as e:
+        logger.error(f"Erreur pendant la restauration {job_id}: {str(e)}")
+        if job:
+            job.status = BackupStatus.FAILED
+            job.error_message = str(e)
+            job.completed_at = datetime.now()
+            db.commit()
+    finally:
+        db.close()
+
+def _update_restore_progress(job, progress, started):
+    elapsed = time.monotonic() - started
+    job.bytes_restored = progress.bytes_restored
+    job.throughput_bytes_per_sec = progress.bytes_restored / elapsed if elapsed > 0 else None
@@ -0,0 +1,407 @@
+import os
+import posixpath
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from functools import lru_cache
+from urllib.parse import parse_qs, urlsplit
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKUP_ROOT = os.environ.get("BACKUP_DIR", "./backups")
+
+# Destination des nouvelles sauvegardes: chemin local, s3://bucket/prefixe ou sftp://user@hote/chemin
+BACKUP_STORAGE_URL = os.environ.get("BACKUP_STORAGE_URL", BACKUP_ROOT)
+
+# Envoi multipart S3: taille des parts (5 Mo minimum) et parts envoyées en parallèle
+BACKUP_S3_PART_SIZE = int(os.environ.get("BACKUP_S3_PART_SIZE", str(64 * 1024 * 1024)))
+BACKUP_S3_CONCURRENCY = int(os.environ.get("BACKUP_S3_CONCURRENCY", "4"))
+BACKUP_S3_ENDPOINT_URL = os.environ.get("BACKUP_S3_ENDPOINT_URL")  # MinIO ou autre service compatible
+
+# Lecture par plages pour les restaurations
+BACKUP_READ_RANGE_SIZE = int(os.environ.get("BACKUP_READ_RANGE_SIZE", str(16 * 1024 * 1024)))
+
+# Authentification SFTP (l'hôte doit être présent dans known_hosts)
+BACKUP_SFTP_PASSWORD = os.environ.get("BACKUP_SFTP_PASSWORD")
+BACKUP_SFTP_KEY_FILE = os.environ.get("BACKUP_SFTP_KEY_FILE")
+
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+class LocalStorage:
+    """Stockage des sauvegardes sur le système de fichiers de la plateforme"""
+
+    def __init__(self, root=BACKUP_ROOT):
+        self.root = root
+        self.url = root
+
+    def location(self, key):
+        return os.path.join(self.root, key)
+
+    def open_write(self, location):
+        os.makedirs(os.path.dirname(location) or ".", exist_ok=True)
+        return open(location, 'wb')
+
+    def open_read(self, location):
+        return open(location, 'rb')
+
+    def exists(self, location):
+        return os.path.exists(location)
+
+    def size(self, location):
+        return os.path.getsize(location)
+
+    def delete(self, location):
+        if os.path.exists(location):
+            os.remove(location)
+
+    def delete_prefix(self, prefix):
+        shutil.rmtree(prefix, ignore_errors=True)
+
+class S3MultipartWriter:
+    """
+    Fichier en écriture qui envoie le flux vers S3 par parts, en parallèle.
+    Au plus `max_concurrency` parts sont en mémoire; l'envoi est annulé
+    si le bloc `with` se termine sur une exception.
+    """
+
+    def __init__(self, client, bucket, key, part_size=BACKUP_S3_PART_SIZE, max_concurrency=BACKUP_S3_CONCURRENCY):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._futures = []
+        self._slots = threading.Semaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.closed = False
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit_part(part)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _submit_part(self, data):
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        part_number = len(self._futures) + 1
+        # Bloque le flux de dump tant que trop de parts sont en cours d'envoi
+        self._slots.acquire()
+        self._futures.append(self._pool.submit(self._upload_part, part_number, data))
+
+    def _upload_part(self, part_number, data):
+        try:
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                PartNumber=part_number, Body=data
+            )
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+        finally:
+            self._slots.release()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._upload_id is None:
+                # Petite archive: un seul envoi suffit
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+                return
+            if self._buffer:
+                self._submit_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            parts = [future.result() for future in self._futures]
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def abort(self):
+        self.closed = True
+        if self._upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            except Exception as e:
+                logger.error(f"Impossible d'annuler l'envoi multipart de {self.key}: {str(e)}")
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+class RangeReader:
+    """
+    Fichier en lecture qui récupère un objet distant par plages d'octets,
+    les plages suivantes étant téléchargées en avance et en parallèle.
+    """
+
+    def __init__(self, fetch_range, size, range_size=BACKUP_READ_RANGE_SIZE, prefetch=BACKUP_S3_CONCURRENCY):
+        self.fetch_range = fetch_range
+        self.size = size
+        self.range_size = range_size
+        self.prefetch = max(1, prefetch)
+        self._next_offset = 0
+        self._pending = deque()
+        self._buffer = b''
+        self._position = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.prefetch)
+
+    def _schedule(self):
+        while len(self._pending) < self.prefetch and self._next_offset < self.size:
+            end = min(self._next_offset + self.range_size, self.size) - 1
+            self._pending.append(self._pool.submit(self.fetch_range, self._next_offset, end))
+            self._next_offset = end + 1
+
+    def read(self, size=-1):
+        output = []
+        while size != 0:
+            if self._position >= len(self._buffer):
+                self._schedule()
+                if not self._pending:
+                    break
+                self._buffer = self._pending.popleft().result()
+                self._position = 0
+                continue
+            end = len(self._buffer) if size < 0 else min(len(self._buffer), self._position + size)
+            output.append(self._buffer[self._position:end])
+            if size > 0:
+                size -= end - self._position
+            self._position = end
+        return b''.join(output)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class S3Storage:
+    """Stockage objet compatible S3 (AWS, MinIO, ...)"""
+
+    def __init__(self, bucket, prefix="", endpoint_url=BACKUP_S3_ENDPOINT_URL, region_name=None, client=None,
+                 part_size=BACKUP_S3_PART_SIZE, max_concurrency=BACKUP_S3_CONCURRENCY,
+                 range_size=BACKUP_READ_RANGE_SIZE):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.range_size = range_size
+        self.url = f"s3://{bucket}/{self.prefix}" if self.prefix else f"s3://{bucket}"
+        if client is None:
+            # Dépendance optionnelle, requise uniquement pour ce stockage
+            import boto3
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region_name)
+        self.client = client
+
+    def location(self, key):
+        return posixpath.join(self.prefix, key) if self.prefix else key
+
+    def open_write(self, location):
+        return S3MultipartWriter(self.client, self.bucket, location,
+                                 part_size=self.part_size, max_concurrency=self.max_concurrency)
+
+    def open_read(self, location):
+        def fetch_range(start, end):
+            response = self.client.get_object(Bucket=self.bucket, Key=location, Range=f"bytes={start}-{end}")
+            return response['Body'].read()
+        return RangeReader(fetch_range, self.size(location),
+                           range_size=self.range_size, prefetch=self.max_concurrency)
+
+    def exists(self, location):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=location)
+            return True
+        except self.client.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def size(self, location):
+        return self.client.head_object(Bucket=self.bucket, Key=location)['ContentLength']
+
+    def delete(self, location):
+        self.client.delete_object(Bucket=self.bucket, Key=location)
+
+    def delete_prefix(self, prefix):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix.rstrip("/") + "/"):
+            objects = [{'Key': item['Key']} for item in page.get('Contents', [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={'Objects': objects, 'Quiet': True})
+
+class _SFTPFile:
+    """Fichier distant qui ferme aussi sa session SFTP"""
+
+    def __init__(self, sftp, remote_file):
+        self._sftp = sftp
+        self._file = remote_file
+
+    def write(self, data):
+        self._file.write(data)
+        return len(data)
+
+    def read(self, size=-1):
+        return self._file.read(size if size >= 0 else None)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            self._sftp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class SFTPStorage:
+    """Stockage sur un serveur SFTP; une session par fichier sur une connexion SSH partagée"""
+
+    def __init__(self, host, port=22, username=None, root="/"):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.root = root or "/"
+        user_part = f"{username}@" if username else ""
+        self.url = f"sftp://{user_part}{host}:{port}{self.root}"
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _session(self):
+        # Dépendance optionnelle, requise uniquement pour ce stockage
+        import paramiko
+        with self._lock:
+            transport = self._client.get_transport() if self._client else None
+            if transport is None or not transport.is_active():
+                self._client = paramiko.SSHClient()
+                self._client.load_system_host_keys()
+                self._client.connect(
+                    self.host, port=self.port, username=self.username,
+                    password=BACKUP_SFTP_PASSWORD, key_filename=BACKUP_SFTP_KEY_FILE
+                )
+            return self._client.open_sftp()
+
+    def location(self, key):
+        return posixpath.join(self.root, key)
+
+    def open_write(self, location):
+        sftp = self._session()
+        self._makedirs(sftp, posixpath.dirname(location))
+        remote_file = sftp.open(location, 'wb')
+        # Écritures pipelinées: pas d'attente d'acquittement à chaque bloc
+        remote_file.set_pipelined(True)
+        return _SFTPFile(sftp, remote_file)
+
+    def open_read(self, location):
+        sftp = self._session()
+        remote_file = sftp.open(location, 'rb')
+        # Lectures anticipées en parallèle sur tout le fichier
+        remote_file.prefetch()
+        return _SFTPFile(sftp, remote_file)
+
+    def exists(self, location):
+        sftp = self._session()
+        try:
+            sftp.stat(location)
+            return True
+        except FileNotFoundError:
+            return False
+        finally:
+            sftp.close()
+
+    def size(self, location):
+        sftp = self._session()
+        try:
+            return sftp.stat(location).st_size
+        finally:
+            sftp.close()
+
+    def delete(self, location):
+        sftp = self._session()
+        try:
+            sftp.remove(location)
+        except FileNotFoundError:
+            pass
+        finally:
+            sftp.close()
+
+    def delete_prefix(self, prefix):
+        sftp = self._session()
+        try:
+            for name in sftp.listdir(prefix):
+                sftp.remove(posixpath.join(prefix, name))
+            sftp.rmdir(prefix)
+        except FileNotFoundError:
+            pass
+        finally:
+            sftp.close()
+
+    @staticmethod
+    def _makedirs(sftp, path):
+        current = "/" if path.startswith("/") else ""
+        for part in filter(None, path.split("/")):
+            current = posixpath.join(current, part)
+            try:
+                sftp.stat(current)
+            except FileNotFoundError:
+                sftp.mkdir(current)
+
+@lru_cache(maxsize=None)
+def get_storage(url=None):
+    """
+    Retourne le stockage correspondant à une URL (BACKUP_STORAGE_URL par défaut).
+
+    Exemples: ./backups, file:///srv/backups, s3://bucket/prefixe?endpoint_url=http://minio:9000,
+    sftp://backup@nas:22/srv/backups
+    """
+    url = url or BACKUP_STORAGE_URL
+    parts = urlsplit(url)
+    options = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+
+    if parts.scheme in ("", "file"):
+        storage = LocalStorage(parts.path if parts.scheme else url)
+    elif parts.scheme == "s3":
+        storage = S3Storage(
+            parts.netloc,
+            prefix=parts.path,
+            endpoint_url=options.get("endpoint_url", BACKUP_S3_ENDPOINT_URL),
+            region_name=options.get("region")
+        )
+    elif parts.scheme == "sftp":
+        storage = SFTPStorage(parts.hostname, port=parts.port or 22, username=parts.username, root=parts.path)
+    else:
+        raise ValueError(f"Stockage de sauvegarde non supporté: {url}")
+
+    # URL complète (options comprises) enregistrée avec chaque sauvegarde
+    storage.url = url
+    return storage
+
+def storage_for_backup(backup):
+    """Stockage d'une sauvegarde existante (local pour les sauvegardes antérieures au champ)"""
+    return get_storage(backup.storage_backend or BACKUP_ROOT)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String(100), primary_key=True)  # tâche ou groupe de tâches protégé
+    owner = Column(String(255), nullable=False)  # instance détentrice
+    expires_at = Column(DateTime, nullable=False)
+    acquired_at = Column(DateTime, default=func.now())
+
+class SchedulerMember(Base):
+    __tablename__ = "scheduler_members"
+    
+    instance_id = Column(String(255), primary_key=True)
+    hostname = Column(String(255), nullable=True)
+    started_at = Column(DateTime, default=func.now())
+    last_seen = Column(DateTime, nullable=False, index=True)
+    role = Column(String(20), nullable=True, index=True)  # collector: reçoit une part des cibles de collecte
@@ -0,0 +1,288 @@
+import bisect
+import functools
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import DateTime, Integer, literal, or_
+from sqlalchemy.exc import CompileError, IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from app.database import SessionLocal
+from app.modules.coordination.models import SchedulerLease, SchedulerMember
+
+logger = logging.getLogger(__name__)
+
+# Identifiant de cette instance (un par processus uvicorn)
+INSTANCE_ID = os.environ.get("SCHEDULER_INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Durée des baux et fréquence de renouvellement
+SCHEDULER_LEASE_SECONDS = int(os.environ.get("SCHEDULER_LEASE_SECONDS", "30"))
+SCHEDULER_HEARTBEAT_SECONDS = int(os.environ.get("SCHEDULER_HEARTBEAT_SECONDS", "10"))
+
+# Mode réparti: les cibles sont partagées entre instances par hachage cohérent
+SCHEDULER_SHARDING = os.environ.get("SCHEDULER_SHARDING", "false").lower() == "true"
+SCHEDULER_RING_REPLICAS = int(os.environ.get("SCHEDULER_RING_REPLICAS", "64"))
+
+# Rôle des membres: seules les instances qui collectent se partagent les cibles
+MEMBER_ROLE_API = "api"
+MEMBER_ROLE_COLLECTOR = "collector"
+
+# Un membre silencieux depuis plus longtemps est supprimé de la table
+MEMBER_PURGE_AFTER = timedelta(seconds=SCHEDULER_LEASE_SECONDS * 10)
+
+class db_utcnow(FunctionElement):
+    """
+    Heure UTC du serveur de base de données, décalée de `seconds`: les
+    expirations sont écrites et comparées avec une seule horloge, quel que
+    soit le décalage entre les horloges des instances
+    """
+    type = DateTime()
+    inherit_cache = True
+
+    def __init__(self, seconds=0):
+        super().__init__(literal(int(seconds), Integer))
+
+@compiles(db_utcnow)
+def _db_utcnow_default(element, compiler, **kw):
+    raise CompileError(f"db_utcnow non pris en charge par {compiler.dialect.name}")
+
+@compiles(db_utcnow, "mysql")
+def _db_utcnow_mysql(element, compiler, **kw):
+    return f"(UTC_TIMESTAMP(6) + INTERVAL {compiler.process(element.clauses, **kw)} SECOND)"
+
+@compiles(db_utcnow, "postgresql")
+def _db_utcnow_postgresql(element, compiler, **kw):
+    return f"(timezone('utc', now()) + make_interval(secs => {compiler.process(element.clauses, **kw)}))"
+
+@compiles(db_utcnow, "sqlite")
+def _db_utcnow_sqlite(element, compiler, **kw):
+    # Même format que les DateTime écrits par SQLAlchemy (microsecondes)
+    return (f"(strftime('%Y-%m-%d %H:%M:%f', 'now', {compiler.process(element.clauses, **kw)} || ' seconds')"
+            f" || '000')")
+
+def _clock(now, seconds=0):
+    """Horloge de la base, ou heure fournie par l'appelant (tests)"""
+    if now is None:
+        return db_utcnow(seconds)
+    return now + timedelta(seconds=seconds)
+
+def acquire_lease(db, name, owner=INSTANCE_ID, ttl_seconds=SCHEDULER_LEASE_SECONDS, now=None):
+    """
+    Prend ou renouvelle un bail nommé. Le bail est accordé s'il est libre,
+    expiré ou déjà détenu par `owner`; la mise à jour conditionnelle
+    garantit qu'une seule instance l'obtient. L'expiration est calculée
+    et comparée avec l'horloge de la base.
+
+    Returns:
+        bool: Vrai si le bail est obtenu, faux si une autre instance le détient
+    """
+    updated = db.query(SchedulerLease).filter(
+        SchedulerLease.name == name,
+        or_(SchedulerLease.owner == owner, SchedulerLease.expires_at < _clock(now))
+    ).update({SchedulerLease.owner: owner, SchedulerLease.expires_at: _clock(now, ttl_seconds)},
+             synchronize_session=False)
+    db.commit()
+    if updated:
+        return True
+
+    # Premier passage: le bail n'existe pas encore
+    if db.query(SchedulerLease.name).filter(SchedulerLease.name == name).first() is None:
+        db.add(SchedulerLease(name=name, owner=owner, expires_at=_clock(now, ttl_seconds), acquired_at=_clock(now)))
+        try:
+            db.commit()
+            return True
+        except IntegrityError:
+            # Une autre instance l'a créé au même moment
+            db.rollback()
+    return False
+
+def release_lease(db, name, owner=INSTANCE_ID):
+    """Libère un bail détenu pour permettre une reprise immédiate par une autre instance"""
+    db.query(SchedulerLease).filter(
+        SchedulerLease.name == name,
+        SchedulerLease.owner == owner
+    ).delete(synchronize_session=False)
+    db.commit()
+
+def heartbeat_member(db, instance_id=INSTANCE_ID, now=None, role=MEMBER_ROLE_API):
+    """Signale que l'instance est vivante (avec son rôle) et purge les membres disparus"""
+    updated = db.query(SchedulerMember).filter(
+        SchedulerMember.instance_id == instance_id
+    ).update({SchedulerMember.last_seen: _clock(now), SchedulerMember.role: role}, synchronize_session=False)
+    if not updated:
+        db.add(SchedulerMember(instance_id=instance_id, hostname=socket.gethostname(),
+                               started_at=_clock(now), last_seen=_clock(now), role=role))
+    db.query(SchedulerMember).filter(
+        SchedulerMember.last_seen < _clock(now, -MEMBER_PURGE_AFTER.total_seconds())
+    ).delete(synchronize_session=False)
+    db.commit()
+
+def live_members(db, now=None, role=MEMBER_ROLE_COLLECTOR):
+    """Instances d'un rôle ayant signalé leur présence pendant la durée d'un bail"""
+    return sorted(row.instance_id for row in db.query(SchedulerMember.instance_id).filter(
+        SchedulerMember.role == role,
+        SchedulerMember.last_seen >= _clock(now, -SCHEDULER_LEASE_SECONDS)
+    ))
+
+class HashRing:
+    """
+    Anneau de hachage cohérent: chaque cible est attribuée à une instance,
+    et l'arrivée ou le départ d'une instance ne déplace qu'une part
+    proportionnelle des cibles.
+    """
+
+    def __init__(self, members, replicas=SCHEDULER_RING_REPLICAS):
+        self.members = sorted(members)
+        self._points = []
+        for member in self.members:
+            for replica in range(replicas):
+                self._points.append((self._hash(f"{member}#{replica}"), member))
+        self._points.sort()
+        self._keys = [point for point, _ in self._points]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], "big")
+
+    def owner(self, key):
+        if not self._points:
+            return None
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._points)
+        return self._points[index][1]
+
+class LeaderElector:
+    """
+    Renouvelle périodiquement la présence de l'instance et les baux
+    demandés, et notifie les transitions (élu / destitué).
+    """
+
+    def __init__(self, instance_id=INSTANCE_ID, heartbeat_seconds=SCHEDULER_HEARTBEAT_SECONDS,
+                 lease_seconds=SCHEDULER_LEASE_SECONDS):
+        self.instance_id = instance_id
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lease_seconds = lease_seconds
+        self.role = MEMBER_ROLE_API
+        self._leases = {}  # nom -> (on_elected, on_demoted)
+        self._expires = {}  # nom -> échéance locale (time.monotonic) du bail détenu
+        self._ring = HashRing([instance_id])
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name, on_elected=None, on_demoted=None):
+        """Demande un bail; les fonctions sont appelées à son obtention et à sa perte"""
+        with self._lock:
+            self._leases[name] = (on_elected, on_demoted)
+
+    def join_collection(self):
+        """L'instance collecte les métriques: elle entre dans l'anneau de répartition des cibles"""
+        self.role = MEMBER_ROLE_COLLECTOR
+
+    def is_leader(self, name):
+        expires_at = self._expires.get(name)
+        # Marge d'un battement pour ne jamais agir sur un bail sur le point d'expirer
+        return expires_at is not None and time.monotonic() < expires_at - self.heartbeat_seconds
+
+    def owns(self, key):
+        """Indique si une cible revient à cette instance dans le mode réparti"""
+        return self._ring.owner(key) == self.instance_id
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader-elector", daemon=True)
+        self._thread.start()
+        logger.info(f"Coordination des planificateurs démarrée (instance {self.instance_id})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.heartbeat_seconds)
+            self._thread = None
+
+        db = SessionLocal()
+        try:
+            for name in list(self._expires):
+                release_lease(db, name, self.instance_id)
+                self._demote(name)
+            db.query(SchedulerMember).filter(
+                SchedulerMember.instance_id == self.instance_id
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Erreur lors de la libération des baux: {str(e)}")
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            self.heartbeat()
+
+    def heartbeat(self):
+        db = SessionLocal()
+        try:
+            heartbeat_member(db, self.instance_id, role=self.role)
+            members = live_members(db, role=MEMBER_ROLE_COLLECTOR) or [self.instance_id]
+            if members != self._ring.members:
+                self._ring = HashRing(members)
+                logger.info(f"Répartition des cibles sur {len(self._ring.members)} collecteurs")
+
+            with self._lock:
+                leases = dict(self._leases)
+            for name in leases:
+                # Échéance comptée depuis la demande: jamais plus tardive que celle écrite en base
+                requested_at = time.monotonic()
+                if acquire_lease(db, name, self.instance_id, self.lease_seconds):
+                    elected = name not in self._expires
+                    self._expires[name] = requested_at + self.lease_seconds
+                    if elected:
+                        self._elect(name)
+                elif name in self._expires:
+                    self._demote(name)
+        except Exception as e:
+            logger.error(f"Erreur de coordination des planificateurs: {str(e)}")
+            db.rollback()
+            # Sans base, les baux détenus expirent localement
+            for name in [name for name in self._expires if not self.is_leader(name)]:
+                self._demote(name)
+        finally:
+            db.close()
+
+    def _elect(self, name):
+        logger.info(f"Instance {self.instance_id} élue pour {name}")
+        self._notify(name, self._leases[name][0])
+
+    def _demote(self, name):
+        self._expires.pop(name, None)
+        logger.info(f"Instance {self.instance_id} n'est plus responsable de {name}")
+        self._notify(name, self._leases[name][1])
+
+    def _notify(self, name, callback):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Erreur lors du changement de responsable de {name}: {str(e)}")
+
+elector = LeaderElector()
+
+def run_if_leader(lease_name):
+    """Décorateur: la tâche ne s'exécute que sur l'instance détentrice du bail"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not elector.is_leader(lease_name):
+                logger.debug(f"{func.__name__} ignorée: bail {lease_name} détenu par une autre instance")
+                return None
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -2,9 +2,11 @@ import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Tuple
 import logging
-from statistics import mean, stdev
 from enum import Enum
 
+from app.modules.monitoring.correlation import correlation_matrix
+from app.modules.monitoring.streaming import MetricStats
+
 logger = logging.getLogger(__name__)
 
 class AlertSeverity(Enum):
@@ -21,12 +23,18 @@ class AlertType(Enum):
     STORAGE_CRITICAL = "storage_critical"
     PERFORMANCE_DEGRADATION = "performance_degradation"
     SYSTEM_OVERLOAD = "system_overload"
+    SEASONAL_ANOMALY = "seasonal_anomaly"
+
+# Metrics tracked by the running statistics
+STREAMED_METRICS = ("cpu_usage", "memory_usage", "disk_usage", "connections_count",
+                    "query_latency", "active_transactions")
 
 class MetricAnalyzer:
     def __init__(self, 
                  connection_id: int, 
                  db_type: str,
-                 thresholds: Optional[Dict[str, Dict[str, float]]] = None):
+                 thresholds: Optional[Dict[str, Dict[str, float]]] = None,
+                 collection_interval: int = 3600):
         """
         Initialize metrics analyzer with thresholds
         
@@ -34,9 +42,11 @@ class MetricAnalyzer:
             connection_id: Database connection ID
             db_type: Type of database (mysql, mongodb, oracle)
             thresholds: Dictionary of thresholds for different metrics
+            collection_interval: Seconds between two collected data points
         """
         self.connection_id = connection_id
         self.db_type = db_type
+        self.collection_interval = collection_interval
         if db_type not in ["mysql", "mongodb", "oracle"]:
             raise ValueError("Invalid database type. Must be one of: mysql, mongodb, oracle")
         
@@ -67,13 +77,49 @@ class MetricAnalyzer:
         # Keep history of recent metrics for trend analysis
         self.metrics_history = []
         self.max_history_size = 100  # Keep last 100 data points
+
+        # Running statistics per metric, over the same samples as the history
+        self.metric_stats: Dict[str, MetricStats] = {}
         
     def add_metrics_to_history(self, metrics: Dict[str, Any]) -> None:
         """Add metrics to historical data for trend analysis"""
         if len(self.metrics_history) >= self.max_history_size:
-            self.metrics_history.pop(0)  # Remove oldest element
+            # Remove oldest element, and its values from the statistics
+            self._remove_statistics(self.metrics_history.pop(0))
         
         self.metrics_history.append(metrics)
+        self._update_statistics(metrics)
+
+    def _update_statistics(self, metrics: Dict[str, Any]) -> None:
+        for metric_name in STREAMED_METRICS:
+            value = metrics.get(metric_name)
+            if value is None:
+                continue
+            stats = self.metric_stats.get(metric_name)
+            if stats is None:
+                stats = self.metric_stats[metric_name] = MetricStats()
+            stats.update(value)
+
+    def _remove_statistics(self, metrics: Dict[str, Any]) -> None:
+        for metric_name in STREAMED_METRICS:
+            value = metrics.get(metric_name)
+            stats = self.metric_stats.get(metric_name)
+            if value is not None and stats is not None:
+                stats.remove(value)
+
+    def rebuild_statistics(self) -> None:
+        """Recompute the running statistics from the current history (after loading it)"""
+        self.metric_stats = {}
+        for metrics in self.metrics_history:
+            self._update_statistics(metrics)
+
+    def is_anomalous(self, metric_name: str, value: float, sensitivity: float = 2.0, adaptive: bool = False) -> bool:
+        """O(1) check of one value against the running baseline of a metric"""
+        stats = self.metric_stats.get(metric_name)
+        if stats is None or stats.count < 10:
+            return False
+        avg, std_dev = stats.baseline(adaptive)
+        return value > avg + sensitivity * std_dev
     
     def analyze_metrics(self, current_metrics: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
@@ -238,13 +284,13 @@ class MetricAnalyzer:
         latest = self.metrics_history[-1]
         high_metrics_count = 0
         
-        if latest.get("cpu_usage", 0) > self.thresholds["cpu_usage"]["warning"]:
+        if (latest.get("cpu_usage") or 0) > self.thresholds["cpu_usage"]["warning"]:
             high_metrics_count += 1
-        if latest.get("memory_usage", 0) > self.thresholds["memory_usage"]["warning"]:
+        if (latest.get("memory_usage") or 0) > self.thresholds["memory_usage"]["warning"]:
             high_metrics_count += 1
-        if latest.get("connections_count", 0) > self.thresholds["connections_count"]["warning"]:
+        if (latest.get("connections_count") or 0) > self.thresholds["connections_count"]["warning"]:
             high_metrics_count += 1
-        if latest.get("query_latency", 0) > self.thresholds["query_latency"]["warning"]:
+        if (latest.get("query_latency") or 0) > self.thresholds["query_latency"]["warning"]:
             high_metrics_count += 1
             
         if high_metrics_count >= 3:
@@ -335,12 +381,12 @@ class MetricAnalyzer:
             return recommendations
             
         # CPU recommendations
-        if metrics.get("cpu_usage", 0) > self.thresholds["cpu_usage"]["warning"]:
+        if (metrics.get("cpu_usage") or 0) > self.thresholds["cpu_usage"]["warning"]:
             recommendations.append("Review query performance and optimize high-CPU queries")
             recommendations.append("Consider increasing CPU resources if trend continues")
         
         # Memory recommendations
-        if metrics.get("memory_usage", 0) > self.thresholds["memory_usage"]["warning"]:
+        if (metrics.get("memory_usage") or 0) > self.thresholds["memory_usage"]["warning"]:
             if self.db_type == "mysql":
                 recommendations.append("Review MySQL buffer pool configuration")
             elif self.db_type == "mongodb":
@@ -350,28 +396,28 @@ class MetricAnalyzer:
             recommendations.append("Check for memory leaks or excessive caching")
         
         # Connection recommendations
-        if metrics.get("connections_count", 0) > self.thresholds["connections_count"]["warning"]:
+        if (metrics.get("connections_count") or 0) > self.thresholds["connections_count"]["warning"]:
             if metrics["connections_count"] > self.thresholds["connections_count"]["critical"]:
                 recommendations.append("Critique : Trop de connexions actives. Vérifiez les sessions inutilisées et optimisez la gestion des connexions.")
             else:
                 recommendations.append("Attention : Le nombre de connexions commence à être élevé. Surveillez l'activité et envisagez d'optimiser les requêtes.")
 
         # CPU usage recommendations
-        if metrics.get("cpu_usage", 0) > self.thresholds["cpu_usage"]["warning"]:
+        if (metrics.get("cpu_usage") or 0) > self.thresholds["cpu_usage"]["warning"]:
             if metrics["cpu_usage"] > self.thresholds["cpu_usage"]["critical"]:
                 recommendations.append("Critique : L'utilisation du CPU est très élevée. Envisagez d'optimiser les requêtes ou de mettre à niveau les ressources du serveur.")
             else:
                 recommendations.append("Attention : L'utilisation du CPU est au-dessus du seuil recommandé. Analysez les charges de travail.")
 
         # Memory usage recommendations
-        if metrics.get("memory_usage", 0) > self.thresholds["memory_usage"]["warning"]:
+        if (metrics.get("memory_usage") or 0) > self.thresholds["memory_usage"]["warning"]:
             if metrics["memory_usage"] > self.thresholds["memory_usage"]["critical"]:
                 recommendations.append("Critique : La mémoire est presque saturée. Vérifiez les processus gourmands et envisagez d'ajouter de la RAM.")
             else:
                 recommendations.append("Attention : La consommation mémoire est élevée. Optimisez les requêtes et la gestion du cache.")
 
         # Disk usage recommendations
-        if metrics.get("disk_usage", 0) > self.thresholds["disk_usage"]["warning"]:
+        if (metrics.get("disk_usage") or 0) > self.thresholds["disk_usage"]["warning"]:
             if metrics["disk_usage"] > self.thresholds["disk_usage"]["critical"]:
                 recommendations.append("Critique : L'espace disque est presque plein. Libérez de l'espace ou ajoutez du stockage.")
             else:
@@ -383,127 +429,128 @@ class MetricAnalyzer:
         """Sauvegarde l'historique des métriques dans la base de données"""
         storage_service.save_metrics_history(self.connection_id, self.metrics_history)
 
-@classmethod
-def load_metrics_history(cls, connection_id, db_type, thresholds, storage_service):
-    """Charge l'historique des métriques depuis la base de données"""
-    analyzer = cls(connection_id, db_type, thresholds)
-    analyzer.metrics_history = storage_service.get_metrics_history(connection_id)
-    return analyzer
+    @classmethod
+    def load_metrics_history(cls, connection_id, db_type, thresholds, storage_service):
+        """Charge l'historique des métriques depuis la base de données"""
+        analyzer = cls(connection_id, db_type, thresholds)
+        analyzer.metrics_history = storage_service.get_metrics_history(connection_id)
+        analyzer.rebuild_statistics()
+        return analyzer
 
-def detect_anomalies(self, metric_name, sensitivity=2.0):
-    """
-    Détecte les anomalies en utilisant l'écart-type
-    
-    Args:
-        metric_name: Nom de la métrique à analyser
-        sensitivity: Multiplicateur d'écart-type (2.0 = 95% de confiance)
-    """
-    values = [m.get(metric_name) for m in self.metrics_history 
-             if m.get(metric_name) is not None]
-    
-    if len(values) < 10:  # Besoin d'assez de données
-        return []
-    
-    avg = mean(values)
-    std_dev = stdev(values) if len(values) > 1 else 0
-    threshold = avg + (sensitivity * std_dev)
-    
-    anomalies = []
-    for i, val in enumerate(values):
-        if val > threshold:
-            anomalies.append({
-                'index': i,
-                'value': val,
-                'timestamp': self.metrics_history[i]['timestamp'],
-                'deviation': (val - avg) / std_dev if std_dev > 0 else 0
-            })
-    
-    return anomalies
-     
+    def detect_anomalies(self, metric_name, sensitivity=2.0, adaptive=False):
+        """
+        Détecte les anomalies en utilisant l'écart-type
 
+        Args:
+            metric_name: Nom de la métrique à analyser
+            sensitivity: Multiplicateur d'écart-type (2.0 = 95% de confiance)
+            adaptive: Référence sur la moyenne mobile exponentielle plutôt que sur l'historique
+        """
+        stats = self.metric_stats.get(metric_name)
+        if stats is None or stats.count < 10:  # Besoin d'assez de données
+            return []
 
-def find_metric_correlations(self):
-    """Trouve les corrélations entre différentes métriques"""
-    metrics_to_analyze = ['cpu_usage', 'memory_usage', 'connections_count', 'query_latency']
-    results = {}
-    
-    for m1 in metrics_to_analyze:
-        for m2 in metrics_to_analyze:
-            if m1 != m2:
-                correlation = self._calculate_correlation(m1, m2)
-                if abs(correlation) > 0.7:  # Forte corrélation
-                    results[f"{m1}-{m2}"] = correlation
-    
-    return results
+        # Moyenne et écart-type lus dans l'état courant, sans recalcul
+        avg, std_dev = stats.baseline(adaptive)
+        threshold = avg + (sensitivity * std_dev)
+        samples = [m for m in self.metrics_history if m.get(metric_name) is not None]
 
-def _calculate_correlation(self, metric1, metric2):
-    """Calcule le coefficient de corrélation entre deux métriques"""
-    values1 = []
-    values2 = []
-    
-    for m in self.metrics_history:
-        if m.get(metric1) is not None and m.get(metric2) is not None:
-            values1.append(m.get(metric1))
-            values2.append(m.get(metric2))
-    
-    if len(values1) < 5:
-        return 0
-        
-    # Utilisez numpy pour calculer la corrélation
-    return np.corrcoef(values1, values2)[0, 1]
-def predict_future_value(self, metric_name, hours_ahead=24):
-    """
-    Prédit la valeur future d'une métrique basée sur la tendance actuelle
-    Utilise une régression linéaire simple
-    """
-    values = [(i, m.get(metric_name)) 
-             for i, m in enumerate(self.metrics_history) 
-             if m.get(metric_name) is not None]
-    
-    if len(values) < 5:
-        return None
-    
-    x = np.array([v[0] for v in values])
-    y = np.array([v[1] for v in values])
-    
-    # Régression linéaire simple
-    slope, intercept = np.polyfit(x, y, 1)
-    
-    # Prédire la valeur future
-    next_x = len(self.metrics_history) + (hours_ahead * 3600 / self.collection_interval)
-    predicted_value = slope * next_x + intercept
-    
-    return {
-        'current': y[-1],
-        'predicted': predicted_value,
-        'change_percentage': ((predicted_value - y[-1]) / y[-1]) * 100 if y[-1] != 0 else 0,
-        'hours_ahead': hours_ahead
-    }
-
-
-def adapt_thresholds(self, learning_rate=0.1):
-    """Adapte les seuils en fonction des données historiques"""
-    if len(self.metrics_history) < 20:
-        return  # Pas assez de données
-    
-    for metric_name in ['cpu_usage', 'memory_usage', 'connections_count']:
-        values = [m.get(metric_name) for m in self.metrics_history 
+        anomalies = []
+        for i, sample in enumerate(samples):
+            val = sample[metric_name]
+            if val > threshold:
+                anomalies.append({
+                    'index': i,
+                    'value': val,
+                    'timestamp': sample['timestamp'],
+                    'deviation': (val - avg) / std_dev if std_dev > 0 else 0
+                })
+
+        return anomalies
+
+    def find_metric_correlations(self):
+        """Trouve les corrélations entre différentes métriques"""
+        metrics_to_analyze = ['cpu_usage', 'memory_usage', 'connections_count', 'query_latency']
+        results = {}
+
+        # Matrice complète en un seul passage sur l'historique
+        values = np.array([
+            [m.get(name) for name in metrics_to_analyze] for m in self.metrics_history
+        ], dtype=float).reshape(-1, len(metrics_to_analyze)).T
+        matrix = correlation_matrix(values)
+
+        for i, m1 in enumerate(metrics_to_analyze):
+            for j, m2 in enumerate(metrics_to_analyze):
+                if m1 != m2 and abs(matrix[i, j]) > 0.7:  # Forte corrélation
+                    results[f"{m1}-{m2}"] = float(matrix[i, j])
+
+        return results
+
+    def _calculate_correlation(self, metric1, metric2):
+        """Calcule le coefficient de corrélation entre deux métriques"""
+        values1 = []
+        values2 = []
+
+        for m in self.metrics_history:
+            if m.get(metric1) is not None and m.get(metric2) is not None:
+                values1.append(m.get(metric1))
+                values2.append(m.get(metric2))
+
+        if len(values1) < 5:
+            return 0
+
+        # Utilisez numpy pour calculer la corrélation
+        return np.corrcoef(values1, values2)[0, 1]
+
+    def predict_future_value(self, metric_name, hours_ahead=24):
+        """
+        Prédit la valeur future d'une métrique basée sur la tendance actuelle
+        Utilise une régression linéaire simple
+        """
+        values = [(i, m.get(metric_name)) 
+                 for i, m in enumerate(self.metrics_history) 
                  if m.get(metric_name) is not None]
-        
-        if not values:
-            continue
-            
-        # Calcul du 95e percentile
-        p95 = np.percentile(values, 95)
-        
-        # Ajustement du seuil d'avertissement
-        current_warning = self.thresholds.get(metric_name, {}).get('warning')
-        if current_warning and p95 < current_warning * 0.7:
-            # Si le 95e percentile est bien inférieur au seuil, réduire le seuil
-            new_warning = current_warning - (current_warning - p95) * learning_rate
-            self.thresholds[metric_name]['warning'] = new_warning
-        elif p95 > current_warning:
-            # Si le 95e percentile dépasse le seuil, augmenter légèrement
-            new_warning = current_warning + (p95 - current_warning) * learning_rate
-            self.thresholds[metric_name]['warning'] = min(new_warning, 
-                                                        self.thresholds[metric_name]['critical'] * 0.9)
+
+        if len(values) < 5:
+            return None
+
+        x = np.array([v[0] for v in values])
+        y = np.array([v[1] for v in values])
+
+        # Régression linéaire simple
+        slope, intercept = np.polyfit(x, y, 1)
+
+        # Prédire la valeur future
+        next_x = len(self.metrics_history) + (hours_ahead * 3600 / self.collection_interval)
+        predicted_value = slope * next_x + intercept
+
+        return {
+            'current': y[-1],
+            'predicted': predicted_value,
+            'change_percentage': ((predicted_value - y[-1]) / y[-1]) * 100 if y[-1] != 0 else 0,
+            'hours_ahead': hours_ahead
+        }
+
+    def adapt_thresholds(self, learning_rate=0.1):
+        """Adapte les seuils en fonction des données historiques"""
+        for metric_name in ['cpu_usage', 'memory_usage', 'connections_count']:
+            stats = self.metric_stats.get(metric_name)
+            if stats is None or stats.count < 20:
+                continue  # Pas assez de données
+
+            # 95e percentile de l'historique, tenu à jour à chaque échantillon
+            p95 = stats.quantile.value
+
+            # Ajustement du seuil d'avertissement
+            current_warning = self.thresholds.get(metric_name, {}).get('warning')
+            if not current_warning:
+                continue
+            if p95 < current_warning * 0.7:
+                # Si le 95e percentile est bien inférieur au seuil, réduire le seuil
+                new_warning = current_warning - (current_warning - p95) * learning_rate
+                self.thresholds[metric_name]['warning'] = new_warning
+            elif p95 > current_warning:
+                # Si le 95e percentile dépasse le seuil, augmenter légèrement
+                new_warning = current_warning + (p95 - current_warning) * learning_rate
+                self.thresholds[metric_name]['warning'] = min(new_warning, 
+                                                            self.thresholds[metric_name]['critical'] * 0.9)
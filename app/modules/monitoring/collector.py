@@ -1,12 +1,9 @@
-import mysql.connector
-import pymongo
-import oracledb 
 import time
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 import logging
-from mysql.connector.pooling import MySQLConnectionPool
 
+from app.utils.health import CONNECT_TIMEOUT_SECONDS, registry, target_key
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +12,11 @@ class BaseCollector:
         """Base method to collect metrics"""
         raise NotImplementedError("Subclasses must implement this method")
 
+    def open_connection(self):
+        """Connect through the target's circuit breaker: fails fast while the target is down"""
+        with registry.guard(target_key(self.host, self.port)):
+            return self.connect()
+
 class MySQLCollector(BaseCollector):
     def __init__(self, host: str, port: int, username: str, password: str, database: str):
         # Utiliser les paramètres fournis, pas des valeurs en dur
@@ -24,29 +26,22 @@ class MySQLCollector(BaseCollector):
         self.password = password
         self.database = database
         self.db_type = "mysql"  # Ajouter attribut db_type
-        self.pool = MySQLConnectionPool(
-            pool_name="mysql_pool",
-            pool_size=5,
-            host=self.host,
-            port=self.port,
-            user=self.username,
-            password=self.password,
-            database=self.database
-)
-
         
     def connect(self):
+        # Pilotes importés à l'usage: le démarrage de l'API ne les charge pas tous
+        import mysql.connector
         return mysql.connector.connect(
             host=self.host,
             port=self.port,
             user=self.username,
             password=self.password,
-            database=self.database
+            database=self.database,
+            connection_timeout=int(CONNECT_TIMEOUT_SECONDS)
         )
-        return self.pool.get_connection()
+
     def collect_metrics(self) -> Dict[str, Any]:
         try:
-            connection = self.connect()
+            connection = self.open_connection()
             cursor = connection.cursor(dictionary=True)
             
             # Get CPU and memory usage
@@ -94,15 +89,30 @@ class MongoDBCollector(BaseCollector):
         connection_string = f"mongodb://{self.host}:{self.port}"
         if self.username and self.password:
             connection_string = f"mongodb://{self.username}:{self.password}@{self.host}:{self.port}"
-        return pymongo.MongoClient(connection_string)
+        import pymongo
+        timeout_ms = int(CONNECT_TIMEOUT_SECONDS * 1000)
+        return pymongo.MongoClient(connection_string, connectTimeoutMS=timeout_ms,
+                                   serverSelectionTimeoutMS=timeout_ms)
     
     def collect_metrics(self) -> Dict[str, Any]:
         try:
-            client = self.connect()
-            db = client[self.database]
+            from pymongo.errors import OperationFailure
+            # The client connects lazily: the ping is the connection attempt.
+            # A server that answers with a command error (auth, permissions) is
+            # reachable, so only the connection step goes through the breaker.
+            refused = None
+            with registry.guard(target_key(self.host, self.port)):
+                client = self.connect()
+                try:
+                    client.admin.command("ping")
+                except OperationFailure as e:
+                    refused = e
+            if refused is not None:
+                client.close()
+                raise refused
             
             # Get server status
-            server_status = db.command("serverStatus")
+            server_status = client[self.database].command("serverStatus")
             
             # Extract metrics
             connections = server_status.get("connections", {})
@@ -140,12 +150,14 @@ class OracleCollector(BaseCollector):
     def connect(self):
         # dsn = f"{self.host}:{self.port}/{self.service_name}"
         # return oracledb.connect(user=self.username, password=self.password, dsn=dsn)
+        import oracledb
         dsn = oracledb.makedsn(self.host, self.port, service_name=self.service_name)
-        return oracledb.connect(user=self.username, password=self.password, dsn=dsn)
+        return oracledb.connect(user=self.username, password=self.password, dsn=dsn,
+                                tcp_connect_timeout=CONNECT_TIMEOUT_SECONDS)
     
     def collect_metrics(self) -> Dict[str, Any]:
         try:
-            connection = self.connect()
+            connection = self.open_connection()
             cursor = connection.cursor()
             
             # Get CPU usage
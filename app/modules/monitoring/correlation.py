@@ -0,0 +1,155 @@
+"""
+Correlation matrices between metrics of a database, and between
+databases for one metric (e.g. CPU of databases sharing a host).
+
+Each matrix is computed in one pass over an aligned window and cached
+until the window moves.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.modules.monitoring.models import Metric, MetricRollup
+
+CORRELATION_METRICS = ("cpu_usage", "memory_usage", "disk_usage", "connections_count",
+                       "query_latency", "active_transactions")
+
+# Windows end on a multiple of this many seconds, so requests within a step share a cached matrix
+CORRELATION_WINDOW_STEP = int(os.environ.get("CORRELATION_WINDOW_STEP", "300"))
+CORRELATION_CACHE_SIZE = int(os.environ.get("CORRELATION_CACHE_SIZE", "256"))
+
+# Fewer aligned points than this give no correlation
+CORRELATION_MIN_POINTS = 5
+
+def correlation_matrix(values: np.ndarray) -> np.ndarray:
+    """
+    Pearson correlation between the rows of a (series x points) matrix.
+
+    Without missing values this is `np.corrcoef`. With NaN, each pair uses
+    the points where both series are present (pairwise complete), computed
+    for all pairs at once with matrix products. NaN where a pair has fewer
+    than CORRELATION_MIN_POINTS points or a constant series.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.shape[0] == 0:
+        return np.empty((0, 0))
+    present = ~np.isnan(values)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if present.all():
+            if values.shape[1] < CORRELATION_MIN_POINTS:
+                return np.full((values.shape[0], values.shape[0]), np.nan)
+            return np.atleast_2d(np.corrcoef(values))
+
+        mask = present.astype(float)
+        x = np.where(present, values, 0.0)
+        count = mask @ mask.T
+        sum_x = x @ mask.T  # [i, j]: sum of series i where j is present
+        sum_xx = (x * x) @ mask.T
+        sum_xy = x @ x.T
+        covariance = count * sum_xy - sum_x * sum_x.T
+        variance = (count * sum_xx - sum_x * sum_x) * (count * sum_xx - sum_x * sum_x).T
+        matrix = covariance / np.sqrt(variance)
+    matrix[count < CORRELATION_MIN_POINTS] = np.nan
+    return np.clip(matrix, -1.0, 1.0)
+
+class CorrelationCache:
+    """Small LRU of computed matrices, keyed by request and window"""
+
+    def __init__(self, max_entries: int = CORRELATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: Dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry  # most recently used last
+            return entry
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+cache = CorrelationCache()
+
+def window_end(now: Optional[datetime] = None, step: int = CORRELATION_WINDOW_STEP) -> datetime:
+    """Start of the current `step` (a divisor of a day), used as the end of the window"""
+    now = now or datetime.utcnow()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds = int((now - midnight).total_seconds())
+    return midnight + timedelta(seconds=seconds - seconds % step)
+
+def _result(labels, matrix, samples, start, end):
+    return {
+        "labels": list(labels),
+        "matrix": [[None if np.isnan(value) else round(float(value), 6) for value in row] for row in matrix],
+        "samples": int(samples),
+        "window_start": start,
+        "window_end": end,
+        "computed_at": datetime.utcnow()
+    }
+
+def metric_correlations(db, database_id: int, hours: int = 24, now: Optional[datetime] = None,
+                        metrics: Sequence[str] = CORRELATION_METRICS) -> Dict:
+    """Correlation matrix between the metrics of one database over the last `hours`"""
+    end = window_end(now)
+    start = end - timedelta(hours=hours)
+    key = ("metrics", database_id, tuple(metrics), start, end)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Metrics of one row are sampled together: rows are the aligned points
+    rows = (
+        db.query(*[getattr(Metric, name) for name in metrics])
+        .filter(Metric.database_id == database_id, Metric.timestamp >= start, Metric.timestamp < end)
+        .all()
+    )
+    values = np.array(rows, dtype=float).T if rows else np.empty((len(metrics), 0))
+    result = _result(metrics, correlation_matrix(values), len(rows), start, end)
+    cache.put(key, result)
+    return result
+
+def database_correlations(db, database_ids: List[int], metric_name: str = "cpu_usage", hours: int = 168,
+                          now: Optional[datetime] = None) -> Dict:
+    """
+    Correlation matrix between databases for one metric, aligned on the
+    hourly rollups of the last `hours` (detects contention between
+    databases sharing a host or storage)
+    """
+    database_ids = sorted(set(database_ids))
+    end = window_end(now, 3600)
+    start = end - timedelta(hours=hours)
+    key = ("databases", tuple(database_ids), metric_name, start, end)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    index = {database_id: i for i, database_id in enumerate(database_ids)}
+    values = np.full((len(database_ids), hours), np.nan)
+    for database_id, bucket_start, avg_value in (
+        db.query(MetricRollup.database_id, MetricRollup.bucket_start, MetricRollup.avg_value)
+        .filter(MetricRollup.database_id.in_(database_ids),
+                MetricRollup.metric_name == metric_name,
+                MetricRollup.bucket_start >= start,
+                MetricRollup.bucket_start < end)
+        .all()
+    ):
+        values[index[database_id], int((bucket_start - start).total_seconds() // 3600)] = avg_value
+
+    samples = int((~np.isnan(values)).all(axis=0).sum()) if database_ids else 0
+    result = _result(database_ids, correlation_matrix(values), samples, start, end)
+    cache.put(key, result)
+    return result
@@ -0,0 +1,140 @@
+"""
+Capacity forecasting.
+
+Fits a linear trend per database and metric over the hourly rollups of a
+recent window, for the whole fleet in one vectorized least-squares pass,
+and stores the projected time until each metric reaches its critical
+threshold in `capacity_forecasts`. The forecast API only reads that table.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.modules.monitoring.models import CapacityForecast, MetricRollup
+from app.modules.monitoring.seasonality import hour_start
+
+logger = logging.getLogger(__name__)
+
+# Metrics forecast and the level considered exhausted (MetricAnalyzer critical thresholds)
+FORECAST_THRESHOLDS = {
+    "disk_usage": float(os.environ.get("FORECAST_DISK_THRESHOLD", "90")),
+    "memory_usage": float(os.environ.get("FORECAST_MEMORY_THRESHOLD", "90")),
+    "connections_count": float(os.environ.get("FORECAST_CONNECTIONS_THRESHOLD", "200")),
+}
+
+# Hourly points used for the fit
+FORECAST_WINDOW_HOURS = int(os.environ.get("FORECAST_WINDOW_HOURS", str(14 * 24)))
+
+# Trends needing longer than this to reach the threshold are reported as not reaching it
+FORECAST_HORIZON_HOURS = int(os.environ.get("FORECAST_HORIZON_HOURS", str(90 * 24)))
+
+# Minimum hourly points for a trend to be fitted
+FORECAST_MIN_POINTS = int(os.environ.get("FORECAST_MIN_POINTS", "12"))
+
+def fit_trends(values: np.ndarray):
+    """
+    Least-squares line of every row of a (rows x hours) matrix, ignoring NaN.
+
+    Returns:
+        tuple: (slope, intercept, points) arrays, slope and intercept NaN
+        for rows with fewer than two points
+    """
+    mask = ~np.isnan(values)
+    x = np.arange(values.shape[1], dtype=float)
+    y = np.where(mask, values, 0.0)
+    points = mask.sum(axis=1)
+    sum_x = (mask * x).sum(axis=1)
+    sum_y = y.sum(axis=1)
+    sum_xx = (mask * x * x).sum(axis=1)
+    sum_xy = (y * x).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denominator = points * sum_xx - sum_x * sum_x
+        slope = (points * sum_xy - sum_x * sum_y) / denominator
+        intercept = (sum_y - slope * sum_x) / points
+    degenerate = (points < 2) | (denominator == 0)
+    slope[degenerate] = np.nan
+    intercept[degenerate] = np.nan
+    return slope, intercept, points
+
+def hours_to_threshold(level: np.ndarray, slope: np.ndarray, threshold: np.ndarray,
+                       horizon: float = FORECAST_HORIZON_HOURS) -> np.ndarray:
+    """Hours until a trend reaches its threshold: 0 if already above, NaN if never within the horizon"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hours = np.where(slope > 0, (threshold - level) / slope, np.nan)
+    hours = np.where(level >= threshold, 0.0, hours)
+    hours[hours > horizon] = np.nan
+    return hours
+
+def compute_forecasts(db, database_ids: Iterable[int], now: Optional[datetime] = None) -> int:
+    """
+    Refresh the capacity forecasts of these databases from their hourly rollups
+
+    Returns:
+        int: Number of forecasts stored
+    """
+    database_ids = list(database_ids)
+    if not database_ids:
+        return 0
+    now = now or datetime.utcnow()
+    end = hour_start(now)
+    start = end - timedelta(hours=FORECAST_WINDOW_HOURS)
+
+    metrics = list(FORECAST_THRESHOLDS)
+    rows = (
+        db.query(MetricRollup.database_id, MetricRollup.metric_name, MetricRollup.bucket_start, MetricRollup.avg_value)
+        .filter(MetricRollup.database_id.in_(database_ids),
+                MetricRollup.metric_name.in_(metrics),
+                MetricRollup.bucket_start >= start,
+                MetricRollup.bucket_start < end)
+        .all()
+    )
+
+    # One row per (database, metric), one column per hour of the window
+    database_index = {database_id: i for i, database_id in enumerate(database_ids)}
+    metric_index = {name: i for i, name in enumerate(metrics)}
+    values = np.full((len(database_ids) * len(metrics), FORECAST_WINDOW_HOURS), np.nan)
+    for database_id, metric_name, bucket_start, avg_value in rows:
+        row = database_index[database_id] * len(metrics) + metric_index[metric_name]
+        values[row, int((bucket_start - start).total_seconds() // 3600)] = avg_value
+
+    slope, intercept, points = fit_trends(values)
+    # Level of the trend at the latest hour, less noisy than the last point
+    level = intercept + slope * (FORECAST_WINDOW_HOURS - 1)
+    thresholds = np.tile([FORECAST_THRESHOLDS[name] for name in metrics], len(database_ids))
+    hours = hours_to_threshold(level, slope, thresholds)
+
+    observed = ~np.isnan(values)
+    last_column = values.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    current = values[np.arange(values.shape[0]), last_column]
+
+    # Update the stored forecasts in place: unchanged fleets cost no writes
+    existing = {
+        (forecast.database_id, forecast.metric_name): forecast
+        for forecast in db.query(CapacityForecast).filter(CapacityForecast.database_id.in_(database_ids)).all()
+    }
+    stored = 0
+    for row in np.nonzero((points >= FORECAST_MIN_POINTS) & ~np.isnan(slope))[0]:
+        key = (database_ids[row // len(metrics)], metrics[row % len(metrics)])
+        forecast = existing.pop(key, None)
+        if forecast is None:
+            forecast = CapacityForecast(database_id=key[0], metric_name=key[1])
+            db.add(forecast)
+        hours_left = None if np.isnan(hours[row]) else float(hours[row])
+        forecast.current_value = float(current[row])
+        forecast.slope_per_hour = float(slope[row])
+        forecast.threshold = float(thresholds[row])
+        forecast.hours_to_threshold = hours_left
+        forecast.exhaustion_at = now + timedelta(hours=hours_left) if hours_left is not None else None
+        forecast.samples = int(points[row])
+        forecast.computed_at = now
+        stored += 1
+
+    # Trends no longer fitted (not enough recent points)
+    for forecast in existing.values():
+        db.delete(forecast)
+    db.commit()
+    logger.info(f"Computed {stored} capacity forecasts for {len(database_ids)} databases")
+    return stored
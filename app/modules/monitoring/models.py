@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.database import Base
 import datetime
@@ -58,4 +58,48 @@ class AlertRule(Base):
     threshold = Column(Float, nullable=False)
     comparison = Column(String(10), nullable=False)  # >, <, >=, <=, ==
     severity = Column(String(20), nullable=False)
-    enabled = Column(Boolean, default=True)
\ No newline at end of file
+    enabled = Column(Boolean, default=True)
+
+class MetricRollup(Base):
+    """Hourly aggregate of one metric of one database"""
+    __tablename__ = "metric_rollups"
+    __table_args__ = (
+        UniqueConstraint("database_id", "metric_name", "bucket_start", name="uq_metric_rollup_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    database_id = Column(Integer, ForeignKey("database_connections.id"), nullable=False, index=True)
+    metric_name = Column(String(50), nullable=False)
+    bucket_start = Column(DateTime, nullable=False, index=True)  # start of the hour (UTC)
+    sample_count = Column(Integer, nullable=False)
+    avg_value = Column(Float, nullable=False)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    sum_sq_dev = Column(Float, nullable=False)  # sum of squared deviations from avg_value
+
+class SeasonalBaseline(Base):
+    """Aggregate of one metric of one database for one hour of the week"""
+    __tablename__ = "seasonal_baselines"
+
+    database_id = Column(Integer, ForeignKey("database_connections.id"), primary_key=True)
+    metric_name = Column(String(50), primary_key=True)
+    hour_of_week = Column(Integer, primary_key=True)  # 0 = Monday 00:00 UTC
+    buckets = Column(Integer, nullable=False, default=0)  # hourly rollups merged
+    sample_count = Column(Integer, nullable=False, default=0)
+    avg_value = Column(Float, nullable=False, default=0.0)
+    sum_sq_dev = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class CapacityForecast(Base):
+    """Latest trend of one metric of one database and its projected threshold crossing"""
+    __tablename__ = "capacity_forecasts"
+
+    database_id = Column(Integer, ForeignKey("database_connections.id"), primary_key=True)
+    metric_name = Column(String(50), primary_key=True)
+    current_value = Column(Float, nullable=False)  # last hourly average
+    slope_per_hour = Column(Float, nullable=False)
+    threshold = Column(Float, nullable=False)
+    hours_to_threshold = Column(Float, nullable=True)  # None = not reached within the horizon
+    exhaustion_at = Column(DateTime, nullable=True)
+    samples = Column(Integer, nullable=False)  # hourly points used for the fit
+    computed_at = Column(DateTime, nullable=False, index=True)
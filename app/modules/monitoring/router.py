@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.modules.monitoring import schemas
-from app.modules.monitoring.models import DatabaseConnection, Metric, Alert, AlertRule
+from app.modules.monitoring.models import DatabaseConnection, Metric, Alert, AlertRule, CapacityForecast
 from app.database import get_db
 from app.modules.monitoring.collector import get_collector
 from app.modules.monitoring.analyzer import MetricAnalyzer
+from app.modules.monitoring.correlation import CORRELATION_METRICS, database_correlations, metric_correlations
 
 router = APIRouter(
     prefix="/monitoring",
@@ -218,4 +219,59 @@ def get_monitoring_summary(db_id: int, db: Session = Depends(get_db)):
         "critical_alerts": critical_alerts,
         "high_alerts": high_alerts,
         "last_updated": latest_metric.timestamp if latest_metric else None
-    }
\ No newline at end of file
+    }
+
+@router.get("/forecasts", response_model=List[schemas.CapacityForecastResponse])
+def get_capacity_forecasts(
+    metric_name: Optional[str] = None,
+    within_hours: Optional[float] = None,
+    db: Session = Depends(get_db)
+):
+    """Precomputed capacity forecasts of the fleet, soonest exhaustion first"""
+    query = db.query(CapacityForecast)
+    if metric_name:
+        query = query.filter(CapacityForecast.metric_name == metric_name)
+    if within_hours is not None:
+        query = query.filter(CapacityForecast.hours_to_threshold <= within_hours)
+    return query.order_by(
+        CapacityForecast.hours_to_threshold.is_(None),
+        CapacityForecast.hours_to_threshold,
+        CapacityForecast.database_id
+    ).all()
+
+@router.get("/forecasts/{db_id}", response_model=List[schemas.CapacityForecastResponse])
+def get_database_forecasts(db_id: int, db: Session = Depends(get_db)):
+    """Precomputed capacity forecasts of one database"""
+    if not db.query(DatabaseConnection.id).filter(DatabaseConnection.id == db_id).first():
+        raise HTTPException(status_code=404, detail="Database connection not found")
+    return db.query(CapacityForecast).filter(
+        CapacityForecast.database_id == db_id
+    ).order_by(CapacityForecast.metric_name).all()
+
+@router.get("/correlations", response_model=schemas.CorrelationMatrixResponse)
+def get_database_correlations(
+    database_ids: Optional[List[int]] = Query(None),
+    host: Optional[str] = None,
+    metric_name: str = "cpu_usage",
+    hours: int = Query(168, ge=1, le=24 * 90),
+    db: Session = Depends(get_db)
+):
+    """Correlation between databases for one metric (all databases of `host`, or the given ids)"""
+    if metric_name not in CORRELATION_METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric_name}")
+    if host:
+        database_ids = [row.id for row in db.query(DatabaseConnection.id).filter(DatabaseConnection.host == host)]
+    if not database_ids:
+        raise HTTPException(status_code=400, detail="Provide database_ids or a host with registered databases")
+    return database_correlations(db, database_ids, metric_name, hours)
+
+@router.get("/correlations/{db_id}", response_model=schemas.CorrelationMatrixResponse)
+def get_metric_correlations(
+    db_id: int,
+    hours: int = Query(24, ge=1, le=24 * 30),
+    db: Session = Depends(get_db)
+):
+    """Correlation between the metrics of one database"""
+    if not db.query(DatabaseConnection.id).filter(DatabaseConnection.id == db_id).first():
+        raise HTTPException(status_code=404, detail="Database connection not found")
+    return metric_correlations(db, db_id, hours)
@@ -6,6 +6,10 @@ from app.database import SessionLocal
 from app.modules.monitoring.models import DatabaseConnection
 from app.modules.monitoring.collector import get_collector
 from app.modules.monitoring.analyzer import MetricAnalyzer
+from app.modules.coordination.service import SCHEDULER_SHARDING, elector
+from app.modules.monitoring.worker import COLLECTOR_LEASE, connection_params
+from app.modules.monitoring.seasonality import run_seasonal_analysis
+from app.modules.monitoring.forecasting import compute_forecasts
 from datetime import datetime
 import app.modules.monitoring.models as models
 
@@ -13,27 +17,22 @@ logger = logging.getLogger(__name__)
 
 def collect_metrics_job():
     """Scheduled job to collect metrics from all databases"""
+    # Une seule instance collecte, sauf en mode réparti où chacune traite sa part
+    if not SCHEDULER_SHARDING and not elector.is_leader(COLLECTOR_LEASE):
+        return
+    
+    started_at = datetime.utcnow()
     db = SessionLocal()
     try:
         # Get all active database connections
         connections = db.query(DatabaseConnection).all()
+        if SCHEDULER_SHARDING:
+            connections = [connection for connection in connections if elector.owns(connection.id)]
        
         for connection in connections:
             try:
                 # Create collector for specific database type
-                connection_params = {
-                    "host": connection.host,
-                    "port": connection.port,
-                    "username": connection.username,
-                    "password": connection.password,
-                    # Additional parameters depending on db type
-                    "database": ("information_schema" if connection.db_type.lower() == "mysql" 
-                        else "admin" if connection.db_type.lower() == "mongodb"  # Utiliser "admin" ou une autre DB valide
-                        else ""),
-                    "service_name": "orcl" if connection.db_type.lower() != "oracle" else "XE"  # Default service name
-                }
-               
-                collector = get_collector(connection.db_type, connection_params)
+                collector = get_collector(connection.db_type, connection_params(connection))
                 metrics_data = collector.collect_metrics()
                
                 # Store metrics in database
@@ -52,7 +51,7 @@ def collect_metrics_job():
                 db.commit()
                
                 # Corriger cette partie - Utiliser l'ID de la connexion réelle et passer le type de DB
-                analyzer = MetricAnalyzer(connection_id=connection.id, db_type=connection.db_type)
+                analyzer = MetricAnalyzer(connection_id=connection.id, db_type=connection.db_type.lower())
                 
                 # Ne passer que metrics_data à analyze_metrics comme défini dans la classe MetricAnalyzer
                 alerts = analyzer.analyze_metrics(metrics_data)
@@ -71,6 +70,11 @@ def collect_metrics_job():
             except Exception as e:
                 logger.error(f"Error collecting metrics for database {connection.name}: {str(e)}")
                 db.rollback()
+
+        # Comparaison des nouvelles mesures aux niveaux habituels de la même heure de la semaine
+        run_seasonal_analysis(db, [connection.id for connection in connections], started_at)
+        # Prévisions de saturation recalculées sur les agrégats horaires
+        compute_forecasts(db, [connection.id for connection in connections])
    
     except Exception as e:
         logger.error(f"Error in metrics collection job: {str(e)}")
@@ -80,6 +84,10 @@ def collect_metrics_job():
 def start_scheduler():
     """Start the background scheduler"""
     scheduler = BackgroundScheduler()
+    # Only collecting processes take a share of the targets
+    elector.join_collection()
+    if not SCHEDULER_SHARDING:
+        elector.register(COLLECTOR_LEASE)
     
     # Add job to collect metrics every minute
     scheduler.add_job(
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import datetime
 
 class DatabaseConnectionBase(BaseModel):
@@ -75,4 +75,25 @@ class AlertRuleResponse(AlertRuleBase):
 class MetricsTimeRange(BaseModel):
     database_id: int
     start_time: datetime
-    end_time: Optional[datetime] = None
\ No newline at end of file
+    end_time: Optional[datetime] = None
+class CapacityForecastResponse(BaseModel):
+    database_id: int
+    metric_name: str
+    current_value: float
+    slope_per_hour: float
+    threshold: float
+    hours_to_threshold: Optional[float] = None
+    exhaustion_at: Optional[datetime] = None
+    samples: int
+    computed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class CorrelationMatrixResponse(BaseModel):
+    labels: List[Union[int, str]]  # metric names, or database ids for cross-database matrices
+    matrix: List[List[Optional[float]]]
+    samples: int
+    window_start: datetime
+    window_end: datetime
+    computed_at: datetime
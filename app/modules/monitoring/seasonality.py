@@ -0,0 +1,324 @@
+"""
+Seasonal baselines for anomaly detection.
+
+Raw metrics are rolled up into hourly aggregates (`metric_rollups`), and
+each new hourly rollup is folded into the aggregate of its hour of the
+week (`seasonal_baselines`). Current values are then scored against the
+expectation for their hour of the week, for all targets in one
+vectorized pass, instead of against a single global mean.
+"""
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app.modules.monitoring.analyzer import AlertSeverity, AlertType
+from app.modules.monitoring.models import Alert, Metric, MetricRollup, SeasonalBaseline
+
+logger = logging.getLogger(__name__)
+
+SEASONAL_METRICS = ("cpu_usage", "memory_usage", "disk_usage", "connections_count",
+                    "query_latency", "active_transactions")
+
+HOURS_PER_WEEK = 7 * 24
+
+# Deviation (in standard deviations above the seasonal mean) reported as an anomaly
+SEASONAL_SENSITIVITY = float(os.environ.get("SEASONAL_SENSITIVITY", "3.0"))
+
+# An hour of the week is scored once it has been seen on this many weeks
+SEASONAL_MIN_WEEKS = int(os.environ.get("SEASONAL_MIN_WEEKS", "3"))
+
+# Bound on the hours rolled up in one run after a long interruption
+ROLLUP_MAX_HOURS = int(os.environ.get("ROLLUP_MAX_HOURS", str(HOURS_PER_WEEK)))
+
+def hour_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def hour_of_week(timestamp: datetime) -> int:
+    return timestamp.weekday() * 24 + timestamp.hour
+
+def merge_moments(count_a, mean_a, m2_a, count_b, mean_b, m2_b) -> Tuple[int, float, float]:
+    """Combine (count, mean, sum of squared deviations) of two sample sets (Chan et al.)"""
+    count = count_a + count_b
+    if count == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta * count_b / count
+    m2 = m2_a + m2_b + delta * delta * count_a * count_b / count
+    return count, mean, m2
+
+def _rollup_starts(db, database_ids, end):
+    """First hour still to roll up for each database"""
+    last = dict(
+        db.query(MetricRollup.database_id, func.max(MetricRollup.bucket_start))
+        .filter(MetricRollup.database_id.in_(database_ids))
+        .group_by(MetricRollup.database_id)
+        .all()
+    )
+    missing = [database_id for database_id in database_ids if database_id not in last]
+    first = dict(
+        db.query(Metric.database_id, func.min(Metric.timestamp))
+        .filter(Metric.database_id.in_(missing))
+        .group_by(Metric.database_id)
+        .all()
+    ) if missing else {}
+
+    floor = end - timedelta(hours=ROLLUP_MAX_HOURS)
+    starts = {}
+    for database_id in database_ids:
+        if database_id in last:
+            start = last[database_id] + timedelta(hours=1)
+        elif first.get(database_id) is not None:
+            start = hour_start(first[database_id])
+        else:
+            continue
+        start = max(start, floor)
+        if start < end:
+            starts[database_id] = start
+    return starts
+
+def rollup_metrics(db, database_ids: Iterable[int], now: Optional[datetime] = None) -> int:
+    """
+    Aggregate the completed hours not yet rolled up for these databases,
+    then fold the new hourly aggregates into their hour-of-week baselines.
+
+    Returns:
+        int: Number of hourly rollups written
+    """
+    database_ids = list(database_ids)
+    end = hour_start(now or datetime.utcnow())
+    starts = _rollup_starts(db, database_ids, end) if database_ids else {}
+    if not starts:
+        return 0
+
+    columns = [getattr(Metric, name) for name in SEASONAL_METRICS]
+    rows = (
+        db.query(Metric.database_id, Metric.timestamp, *columns)
+        .filter(Metric.database_id.in_(list(starts)),
+                Metric.timestamp >= min(starts.values()),
+                Metric.timestamp < end)
+        .all()
+    )
+
+    samples = defaultdict(list)  # (database_id, metric, hour) -> values
+    for row in rows:
+        database_id, timestamp = row[0], row[1]
+        if timestamp < starts[database_id]:
+            continue
+        bucket = hour_start(timestamp)
+        for metric_name, value in zip(SEASONAL_METRICS, row[2:]):
+            if value is not None:
+                samples[(database_id, metric_name, bucket)].append(value)
+
+    rollups = []
+    for (database_id, metric_name, bucket), values in samples.items():
+        values = np.asarray(values, dtype=float)
+        mean = float(values.mean())
+        rollups.append(MetricRollup(
+            database_id=database_id,
+            metric_name=metric_name,
+            bucket_start=bucket,
+            sample_count=len(values),
+            avg_value=mean,
+            min_value=float(values.min()),
+            max_value=float(values.max()),
+            sum_sq_dev=float(((values - mean) ** 2).sum())
+        ))
+    if not rollups:
+        return 0
+
+    db.add_all(rollups)
+    _fold_into_baselines(db, rollups)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another collector rolled up the same hours (target ownership moving between replicas)
+        db.rollback()
+        logger.warning("Metric rollups already written by another collector, skipped")
+        return 0
+
+    logger.info(f"Rolled up {len(rollups)} hourly metric aggregates for {len(starts)} databases")
+    return len(rollups)
+
+def _fold_into_baselines(db, rollups: List[MetricRollup]) -> None:
+    keys = {(r.database_id, r.metric_name, hour_of_week(r.bucket_start)) for r in rollups}
+    baselines = {
+        (b.database_id, b.metric_name, b.hour_of_week): b
+        for b in db.query(SeasonalBaseline).filter(
+            SeasonalBaseline.database_id.in_({key[0] for key in keys}),
+            SeasonalBaseline.hour_of_week.in_({key[2] for key in keys})
+        ).all()
+    }
+    for rollup in rollups:
+        key = (rollup.database_id, rollup.metric_name, hour_of_week(rollup.bucket_start))
+        baseline = baselines.get(key)
+        if baseline is None:
+            baseline = baselines[key] = SeasonalBaseline(
+                database_id=key[0], metric_name=key[1], hour_of_week=key[2],
+                buckets=0, sample_count=0, avg_value=0.0, sum_sq_dev=0.0
+            )
+            db.add(baseline)
+        baseline.sample_count, baseline.avg_value, baseline.sum_sq_dev = merge_moments(
+            baseline.sample_count, baseline.avg_value, baseline.sum_sq_dev,
+            rollup.sample_count, rollup.avg_value, rollup.sum_sq_dev
+        )
+        baseline.buckets += 1
+
+class SeasonalScorer:
+    """
+    Hour-of-week expectations of a set of databases held in dense arrays
+    (database x hour of week x metric), so scoring is a single vectorized
+    lookup for all targets. Only the hours of the week in `hours` are
+    held (all by default): scoring the latest samples needs one or two.
+    """
+
+    def __init__(self, database_ids: Iterable[int], metrics=SEASONAL_METRICS, hours=None):
+        self.database_ids = list(database_ids)
+        self.metrics = tuple(metrics)
+        self.hours = sorted(set(range(HOURS_PER_WEEK) if hours is None else hours))
+        self._index = {database_id: i for i, database_id in enumerate(self.database_ids)}
+        # Hour of the week -> slot in the arrays; hours not held map to the empty last slot
+        self._hour_slot = np.full(HOURS_PER_WEEK, -1, dtype=int)
+        self._hour_slot[self.hours] = np.arange(len(self.hours))
+        shape = (len(self.database_ids), len(self.hours) + 1, len(self.metrics))
+        self.mean = np.full(shape, np.nan)
+        self.std = np.full(shape, np.nan)
+        self.buckets = np.zeros(shape, dtype=int)
+
+    @classmethod
+    def load(cls, db, database_ids: Iterable[int], metrics=SEASONAL_METRICS, hours=None) -> "SeasonalScorer":
+        scorer = cls(database_ids, metrics, hours)
+        if not scorer.database_ids:
+            return scorer
+        query = db.query(SeasonalBaseline).filter(
+            SeasonalBaseline.database_id.in_(scorer.database_ids),
+            SeasonalBaseline.metric_name.in_(scorer.metrics)
+        )
+        if hours is not None:
+            query = query.filter(SeasonalBaseline.hour_of_week.in_(scorer.hours))
+        for baseline in query.all():
+            scorer.set(baseline.database_id, baseline.metric_name, baseline.hour_of_week,
+                       baseline.buckets, baseline.sample_count, baseline.avg_value, baseline.sum_sq_dev)
+        return scorer
+
+    def _positions(self, database_ids, timestamps):
+        rows = np.fromiter((self._index[database_id] for database_id in database_ids), dtype=int)
+        hours = np.fromiter((hour_of_week(timestamp) for timestamp in timestamps), dtype=int)
+        return rows, self._hour_slot[hours]
+
+    def set(self, database_id, metric_name, how, buckets, count, mean, m2) -> None:
+        position = (self._index[database_id], self._hour_slot[how], self.metrics.index(metric_name))
+        self.buckets[position] = buckets
+        self.mean[position] = mean
+        self.std[position] = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+
+    def expected(self, database_id: int, metric_name: str, timestamp: datetime) -> Optional[float]:
+        """Seasonal expectation of a metric at a given time, None while not learnt"""
+        rows, slots = self._positions([database_id], [timestamp])
+        position = (rows[0], slots[0], self.metrics.index(metric_name))
+        if self.buckets[position] < SEASONAL_MIN_WEEKS:
+            return None
+        return float(self.mean[position])
+
+    def score(self, database_ids, timestamps, values) -> np.ndarray:
+        """
+        Deviation of current values from their seasonal expectation, in
+        standard deviations. NaN where the value is missing or the hour
+        of the week has not been seen on enough weeks.
+
+        Args:
+            database_ids: Sequence of N database ids
+            timestamps: Sequence of N sample times
+            values: Array (N x len(metrics)), NaN for missing values
+        """
+        rows, slots = self._positions(database_ids, timestamps)
+        mean = self.mean[rows, slots]
+        std = self.std[rows, slots]
+        learnt = (self.buckets[rows, slots] >= SEASONAL_MIN_WEEKS) & (std > 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = (np.asarray(values, dtype=float) - mean) / std
+        scores[~learnt] = np.nan
+        return scores
+
+    def expectations(self, database_ids, timestamps) -> np.ndarray:
+        """Seasonal means (N x len(metrics)) matching `score`"""
+        rows, slots = self._positions(database_ids, timestamps)
+        return self.mean[rows, slots]
+
+def latest_metrics(db, database_ids: Iterable[int], since: datetime):
+    """Most recent metric row of each database, newer than `since`"""
+    latest = (
+        db.query(Metric.database_id, func.max(Metric.timestamp).label("timestamp"))
+        .filter(Metric.database_id.in_(list(database_ids)), Metric.timestamp >= since)
+        .group_by(Metric.database_id)
+        .subquery()
+    )
+    return db.query(Metric).join(
+        latest,
+        (Metric.database_id == latest.c.database_id) & (Metric.timestamp == latest.c.timestamp)
+    ).all()
+
+def score_latest_metrics(db, database_ids: Iterable[int], since: datetime,
+                         sensitivity: float = SEASONAL_SENSITIVITY) -> List[Dict]:
+    """Seasonal anomaly alerts for the latest sample of each database"""
+    database_ids = list(database_ids)
+    if not database_ids:
+        return []
+    rows = latest_metrics(db, database_ids, since)
+    if not rows:
+        return []
+
+    scorer = SeasonalScorer.load(db, database_ids, hours={hour_of_week(row.timestamp) for row in rows})
+    values = np.array([
+        [np.nan if getattr(row, name) is None else getattr(row, name) for name in scorer.metrics]
+        for row in rows
+    ], dtype=float)
+    database_ids = [row.database_id for row in rows]
+    timestamps = [row.timestamp for row in rows]
+    scores = scorer.score(database_ids, timestamps, values)
+    expected = scorer.expectations(database_ids, timestamps)
+
+    alerts = []
+    for i, j in zip(*np.nonzero(scores > sensitivity)):
+        row, metric_name = rows[i], scorer.metrics[j]
+        alerts.append({
+            "connection_id": row.database_id,
+            "alert_type": AlertType.SEASONAL_ANOMALY.value,
+            "severity": AlertSeverity.WARNING.value,
+            "message": (f"{metric_name} at {values[i, j]:.2f} is {scores[i, j]:.1f} standard deviations "
+                        f"above its usual level for this hour of the week ({expected[i, j]:.2f})"),
+            "timestamp": row.timestamp,
+            "metrics": {metric_name: float(values[i, j]), "expected": float(expected[i, j])}
+        })
+    return alerts
+
+def run_seasonal_analysis(db, database_ids: Iterable[int], since: datetime,
+                          rollup: bool = True, now: Optional[datetime] = None) -> int:
+    """
+    Roll up completed hours (when `rollup`), then score the latest samples
+    of the databases against their seasonal baselines and store the alerts.
+
+    Returns:
+        int: Number of seasonal anomaly alerts stored
+    """
+    database_ids = list(database_ids)
+    if rollup:
+        rollup_metrics(db, database_ids, now)
+    alerts = score_latest_metrics(db, database_ids, since)
+    for alert in alerts:
+        db.add(Alert(
+            database_id=alert["connection_id"],
+            alert_type=alert["alert_type"],
+            severity=alert["severity"],
+            message=alert["message"],
+            timestamp=alert["timestamp"]
+        ))
+    if alerts:
+        db.commit()
+        logger.info(f"Generated {len(alerts)} seasonal anomaly alerts")
+    return len(alerts)
@@ -0,0 +1,213 @@
+"""
+Online estimators updated in O(1) per sample.
+
+Used by `MetricAnalyzer` to keep a running state per metric, so anomaly,
+percentile and threshold decisions do not rescan the metrics history.
+The state covers the same samples as the bounded history: a sample
+evicted from the history is removed from the estimators.
+"""
+import bisect
+import math
+from typing import Optional
+
+class Welford:
+    """Running mean and variance (Welford's algorithm)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def remove(self, value: float) -> None:
+        """Inverse of `update` for a sample seen before"""
+        if self.count <= 1:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        mean = (self.count * self.mean - value) / (self.count - 1)
+        self._m2 -= (value - mean) * (value - self.mean)
+        self.count -= 1
+        self.mean = mean
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, as `statistics.variance`"""
+        # Rounding after removals can leave a tiny negative remainder
+        return max(0.0, self._m2) / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+class EWMA:
+    """Exponentially weighted moving mean and variance"""
+
+    def __init__(self, alpha: float = 0.1):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            return
+        delta = value - self.mean
+        increment = self.alpha * delta
+        self.mean += increment
+        self.variance = (1 - self.alpha) * (self.variance + delta * increment)
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with five markers (P² algorithm, Jain & Chlamtac).
+    Exact until five samples have been seen.
+    """
+
+    def __init__(self, quantile: float):
+        if not 0 < quantile < 1:
+            raise ValueError("quantile must be in (0, 1)")
+        self.quantile = quantile
+        self.count = 0
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5]
+        self._increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        heights = self._heights
+        if self.count <= 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        # Cell containing the new sample, extending the extreme markers if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+
+        positions = self._positions
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in range(1, 4):
+            offset = self._desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+               (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        h, n = self._heights, self._positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, step: int) -> float:
+        h, n = self._heights, self._positions
+        return h[i] + step * (h[i + step] - h[i]) / (n[i + step] - n[i])
+
+    @property
+    def value(self) -> Optional[float]:
+        if not self._heights:
+            return None
+        if self.count <= 5:
+            # Same interpolation as numpy.percentile on the few samples seen
+            rank = self.quantile * (len(self._heights) - 1)
+            lower = math.floor(rank)
+            upper = min(lower + 1, len(self._heights) - 1)
+            return self._heights[lower] + (self._heights[upper] - self._heights[lower]) * (rank - lower)
+        return self._heights[2]
+
+class WindowQuantile:
+    """
+    Exact quantile of a bounded window of samples, kept sorted
+    (same interpolation as numpy.percentile). Insertion and removal are
+    a binary search plus a shift of the window.
+    """
+
+    def __init__(self, quantile: float):
+        if not 0 < quantile < 1:
+            raise ValueError("quantile must be in (0, 1)")
+        self.quantile = quantile
+        self._sorted = []
+
+    def update(self, value: float) -> None:
+        bisect.insort(self._sorted, value)
+
+    def remove(self, value: float) -> None:
+        index = bisect.bisect_left(self._sorted, value)
+        if index < len(self._sorted) and self._sorted[index] == value:
+            del self._sorted[index]
+
+    @property
+    def count(self) -> int:
+        return len(self._sorted)
+
+    @property
+    def value(self) -> Optional[float]:
+        if not self._sorted:
+            return None
+        rank = self.quantile * (len(self._sorted) - 1)
+        lower = math.floor(rank)
+        upper = min(lower + 1, len(self._sorted) - 1)
+        return self._sorted[lower] + (self._sorted[upper] - self._sorted[lower]) * (rank - lower)
+
+class MetricStats:
+    """
+    Running state of one metric of one database, over the samples of the
+    bounded history. The EWMA is recency-weighted by design and is not
+    affected by evictions.
+    """
+
+    def __init__(self, ewma_alpha: float = 0.1, quantile: float = 0.95):
+        self.welford = Welford()
+        self.ewma = EWMA(ewma_alpha)
+        self.quantile = WindowQuantile(quantile)
+
+    def update(self, value: float) -> None:
+        self.welford.update(value)
+        self.ewma.update(value)
+        self.quantile.update(value)
+
+    def remove(self, value: float) -> None:
+        """Forget a sample evicted from the history"""
+        self.welford.remove(value)
+        self.quantile.remove(value)
+
+    @property
+    def count(self) -> int:
+        return self.welford.count
+
+    def baseline(self, adaptive: bool = False):
+        """(mean, stdev) over the window, or weighted towards recent samples when `adaptive`"""
+        if adaptive:
+            return self.ewma.mean, self.ewma.stdev
+        return self.welford.mean, self.welford.stdev
@@ -0,0 +1,409 @@
+"""
+Standalone metrics collector service.
+
+Runs the collection / analysis / storage pipeline outside of the API:
+targets are read from `database_connections` and sharded by id across
+persistent worker processes. Each shard polls its targets, analyzes them
+(analyzers keep their history between cycles) and stores its results in
+one batch per cycle. A small HTTP server exposes /health and /metrics
+for the orchestrator.
+
+Usage: python run_collector.py
+"""
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+from app.database import SessionLocal
+from app.modules.coordination.service import SCHEDULER_SHARDING, elector
+from app.modules.monitoring.analyzer import MetricAnalyzer
+from app.modules.monitoring.collector import get_collector
+from app.modules.monitoring.models import Alert, DatabaseConnection, Metric
+from app.modules.monitoring.forecasting import compute_forecasts
+from app.modules.monitoring.seasonality import hour_start, run_seasonal_analysis
+# DatabaseConnection relationships reference the backup models
+import app.modules.backups.models  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+COLLECTOR_INTERVAL_SECONDS = int(os.environ.get("COLLECTOR_INTERVAL_SECONDS", "60"))
+COLLECTOR_PROCESSES = int(os.environ.get("COLLECTOR_PROCESSES", str(os.cpu_count() or 2)))
+COLLECTOR_THREADS_PER_SHARD = int(os.environ.get("COLLECTOR_THREADS_PER_SHARD", "16"))
+COLLECTOR_TARGET_TIMEOUT = int(os.environ.get("COLLECTOR_TARGET_TIMEOUT", "30"))
+COLLECTOR_HTTP_HOST = os.environ.get("COLLECTOR_HTTP_HOST", "0.0.0.0")
+COLLECTOR_HTTP_PORT = int(os.environ.get("COLLECTOR_HTTP_PORT", "9102"))
+
+# Lease used when targets are not sharded between collector replicas
+COLLECTOR_LEASE = "metrics-collector"
+
+def connection_params(connection: DatabaseConnection) -> Dict[str, Any]:
+    """Build collector parameters for a `database_connections` row"""
+    db_type = connection.db_type.lower()
+    return {
+        "host": connection.host,
+        "port": connection.port,
+        "username": connection.username,
+        "password": connection.password,
+        "database": ("information_schema" if db_type == "mysql"
+                     else "admin" if db_type == "mongodb"
+                     else ""),
+        "service_name": "XE" if db_type == "oracle" else "orcl"
+    }
+
+def collect_target(db_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Poll one target; runs in a shard's thread pool"""
+    try:
+        return get_collector(db_type, params).collect_metrics()
+    except Exception as e:
+        return {"error": str(e), "timestamp": datetime.utcnow()}
+
+def store_results(db, results):
+    """
+    Store metrics and alerts of a whole cycle in a single transaction
+
+    Args:
+        results: List of (database_id, metrics, alerts)
+    """
+    for database_id, metrics, alerts in results:
+        if "error" not in metrics:
+            db.add(Metric(
+                database_id=database_id,
+                cpu_usage=metrics.get("cpu_usage"),
+                memory_usage=metrics.get("memory_usage"),
+                disk_usage=metrics.get("disk_usage"),
+                connections_count=metrics.get("connections_count"),
+                query_latency=metrics.get("query_latency"),
+                active_transactions=metrics.get("active_transactions"),
+                timestamp=metrics.get("timestamp", datetime.utcnow())
+            ))
+        for alert in alerts:
+            db.add(Alert(
+                database_id=database_id,
+                alert_type=alert["alert_type"],
+                severity=alert["severity"],
+                message=alert["message"],
+                timestamp=alert.get("timestamp", datetime.utcnow())
+            ))
+    db.commit()
+
+class CollectorStats:
+    """Counters exposed on /metrics"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.cycles = 0
+        self.targets = 0
+        self.collect_errors = 0
+        self.cycle_errors = 0
+        self.last_cycle_duration = 0.0
+        self.last_success = None
+        self._lock = threading.Lock()
+
+    def record_cycle(self, targets, errors, duration):
+        with self._lock:
+            self.cycles += 1
+            self.targets = targets
+            self.collect_errors += errors
+            self.last_cycle_duration = duration
+            self.last_success = time.time()
+
+    def record_failure(self):
+        with self._lock:
+            self.cycle_errors += 1
+
+    def healthy(self, interval):
+        # Healthy until the first cycle is due, then as long as cycles keep succeeding
+        reference = self.last_success or self.started_at
+        return time.time() - reference < max(3 * interval, 60)
+
+    def render(self):
+        lines = [
+            "# TYPE collector_cycles_total counter",
+            f"collector_cycles_total {self.cycles}",
+            "# TYPE collector_cycle_errors_total counter",
+            f"collector_cycle_errors_total {self.cycle_errors}",
+            "# TYPE collector_target_errors_total counter",
+            f"collector_target_errors_total {self.collect_errors}",
+            "# TYPE collector_targets gauge",
+            f"collector_targets {self.targets}",
+            "# TYPE collector_last_cycle_duration_seconds gauge",
+            f"collector_last_cycle_duration_seconds {self.last_cycle_duration:.3f}",
+            "# TYPE collector_last_success_timestamp_seconds gauge",
+            f"collector_last_success_timestamp_seconds {self.last_success or 0:.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+def run_shard(index, tasks, reports, threads, target_timeout):
+    """
+    Shard process loop: owns the analyzers of its targets, collects them
+    with a thread pool (I/O bound), analyzes them (CPU bound, one GIL per
+    shard) and writes the results of each cycle in one batch.
+    """
+    # Connections inherited from the parent must not be shared after fork
+    bind = SessionLocal.kw.get("bind")
+    if bind is not None:
+        bind.dispose(close=False)
+
+    analyzers = {}
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while True:
+            work = tasks.get()
+            if work is None:
+                break
+            cycle, targets = work
+            started = time.monotonic()
+
+            # Drop the state of targets reassigned or removed since the last cycle
+            owned = {(target["id"], target["db_type"]) for target in targets}
+            for key in set(analyzers) - owned:
+                del analyzers[key]
+
+            futures = [
+                (target, pool.submit(collect_target, target["db_type"], target["params"]))
+                for target in targets
+            ]
+            results = []
+            errors = 0
+            for target, future in futures:
+                try:
+                    metrics = future.result(timeout=target_timeout)
+                except FutureTimeoutError:
+                    metrics = {"error": f"Collection timed out after {target_timeout}s",
+                               "timestamp": datetime.utcnow()}
+                if "error" in metrics:
+                    errors += 1
+                key = (target["id"], target["db_type"])
+                try:
+                    if key not in analyzers:
+                        analyzers[key] = MetricAnalyzer(connection_id=target["id"], db_type=target["db_type"],
+                                                        collection_interval=COLLECTOR_INTERVAL_SECONDS)
+                    alerts = analyzers[key].analyze_metrics(metrics)
+                except ValueError as e:
+                    logger.error(f"Cannot analyze metrics for database {target['name']}: {str(e)}")
+                    alerts = []
+                results.append((target["id"], metrics, alerts))
+
+            stored = True
+            db = SessionLocal()
+            try:
+                store_results(db, results)
+            except Exception as e:
+                db.rollback()
+                stored = False
+                logger.error(f"Shard {index}: error storing metrics: {str(e)}")
+            finally:
+                db.close()
+
+            reports.put((cycle, index, len(targets), errors, time.monotonic() - started, stored))
+
+class CollectorWorker:
+    """
+    Periodic collection loop. Targets are sharded by `database_id % processes`
+    across persistent shard processes, so each target is always analyzed
+    by the same process and analysis scales with the number of cores.
+    """
+
+    def __init__(self, interval=COLLECTOR_INTERVAL_SECONDS, processes=COLLECTOR_PROCESSES,
+                 target_timeout=COLLECTOR_TARGET_TIMEOUT, threads_per_shard=COLLECTOR_THREADS_PER_SHARD):
+        self.interval = interval
+        self.processes = max(1, processes)
+        self.target_timeout = target_timeout
+        self.threads_per_shard = threads_per_shard
+        self.stats = CollectorStats()
+        self._stop = threading.Event()
+        self._context = multiprocessing.get_context("fork")
+        self._reports = self._context.Queue()
+        self._shards = [None] * self.processes
+        self._cycle = 0
+        self._rolled_up_hour = None
+
+    def _ensure_shards(self):
+        # Restart shards that died (their analyzer history is lost)
+        for index, shard in enumerate(self._shards):
+            if shard is not None and shard[0].is_alive():
+                continue
+            if shard is not None:
+                logger.warning(f"Collector shard {index} exited, restarting it")
+            tasks = self._context.Queue()
+            process = self._context.Process(
+                target=run_shard,
+                args=(index, tasks, self._reports, self.threads_per_shard, self.target_timeout),
+                name=f"collector-shard-{index}",
+                daemon=True
+            )
+            process.start()
+            self._shards[index] = (process, tasks)
+
+    def _targets(self, db):
+        connections = db.query(DatabaseConnection).all()
+        if SCHEDULER_SHARDING:
+            return [connection for connection in connections if elector.owns(connection.id)]
+        if not elector.is_leader(COLLECTOR_LEASE):
+            return []
+        return connections
+
+    def run_cycle(self):
+        """Dispatch owned targets to their shard and wait for every shard report"""
+        started = time.monotonic()
+        started_at = datetime.utcnow()
+        self._cycle += 1
+        db = SessionLocal()
+        try:
+            work = [[] for _ in range(self.processes)]
+            for connection in self._targets(db):
+                work[connection.id % self.processes].append({
+                    "id": connection.id,
+                    "name": connection.name,
+                    "db_type": connection.db_type.lower(),
+                    "params": connection_params(connection)
+                })
+        except Exception as e:
+            self.stats.record_failure()
+            logger.error(f"Error loading collection targets: {str(e)}")
+            return
+        finally:
+            db.close()
+
+        self._ensure_shards()
+        for (process, tasks), targets in zip(self._shards, work):
+            tasks.put((self._cycle, targets))
+
+        # Each shard bounds its own collection time; allow for analysis and storage
+        deadline = time.monotonic() + self.target_timeout + self.interval
+        pending = set(range(self.processes))
+        targets_count = errors = 0
+        stored = True
+        while pending:
+            try:
+                cycle, index, count, shard_errors, _, shard_stored = self._reports.get(
+                    timeout=max(0.1, deadline - time.monotonic())
+                )
+            except queue.Empty:
+                logger.error(f"Collector shards {sorted(pending)} did not report in time")
+                self.stats.record_failure()
+                return
+            if cycle != self._cycle:
+                continue  # late report of a previous cycle
+            pending.discard(index)
+            targets_count += count
+            errors += shard_errors
+            stored = stored and shard_stored
+
+        if not stored:
+            self.stats.record_failure()
+            return
+        self._fleet_analysis([target["id"] for targets in work for target in targets], started_at)
+        self.stats.record_cycle(targets_count, errors, time.monotonic() - started)
+        logger.info(f"Collected metrics for {targets_count} databases on {self.processes} shards ({errors} errors)")
+
+    def _fleet_analysis(self, database_ids, since):
+        """
+        Score the cycle's samples against seasonal baselines; once per hour,
+        roll up the completed hour and refresh capacity forecasts
+        """
+        now = datetime.utcnow()
+        rollup = hour_start(now) != self._rolled_up_hour
+        db = SessionLocal()
+        try:
+            run_seasonal_analysis(db, database_ids, since, rollup=rollup, now=now)
+            if rollup:
+                compute_forecasts(db, database_ids, now)
+                self._rolled_up_hour = hour_start(now)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error in fleet analysis: {str(e)}")
+        finally:
+            db.close()
+
+    def run(self):
+        try:
+            while not self._stop.is_set():
+                cycle_started = time.monotonic()
+                self.run_cycle()
+                self._stop.wait(max(0.0, self.interval - (time.monotonic() - cycle_started)))
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self):
+        for shard in self._shards:
+            if shard is not None and shard[0].is_alive():
+                shard[1].put(None)
+        for shard in self._shards:
+            if shard is not None:
+                shard[0].join(timeout=self.target_timeout)
+                if shard[0].is_alive():
+                    shard[0].terminate()
+        self._shards = [None] * self.processes
+
+def make_http_server(worker, host=COLLECTOR_HTTP_HOST, port=COLLECTOR_HTTP_PORT):
+    """HTTP server exposing /health (JSON) and /metrics (Prometheus text format)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/health":
+                healthy = worker.stats.healthy(worker.interval)
+                body = json.dumps({
+                    "status": "ok" if healthy else "stale",
+                    "cycles": worker.stats.cycles,
+                    "targets": worker.stats.targets,
+                    "last_success": worker.stats.last_success
+                }).encode()
+                self._send(200 if healthy else 503, "application/json", body)
+            elif self.path == "/metrics":
+                self._send(200, "text/plain; version=0.0.4", worker.stats.render().encode())
+            else:
+                self._send(404, "text/plain", b"not found\n")
+
+        def _send(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    worker = CollectorWorker()
+    server = make_http_server(worker)
+    threading.Thread(target=server.serve_forever, name="collector-http", daemon=True).start()
+    logger.info(f"Collector health and metrics on http://{COLLECTOR_HTTP_HOST}:{COLLECTOR_HTTP_PORT}")
+
+    # One replica collects everything unless targets are sharded between replicas
+    elector.join_collection()
+    if not SCHEDULER_SHARDING:
+        elector.register(COLLECTOR_LEASE)
+    elector.start()
+
+    def handle_signal(signum, frame):
+        logger.info("Stopping collector...")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    try:
+        worker.run()
+    finally:
+        server.shutdown()
+        elector.stop()
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.modules.coordination.service import elector
+from app.modules.users import models
+from app.modules.users.provisioning import pool
+
+logger = logging.getLogger(__name__)
+
+# Bail de coordination: une seule instance de l'API prend les inventaires
+INVENTORY_LEASE = "user-inventory"
+
+INVENTORY_INTERVAL_MINUTES = int(os.getenv("INVENTORY_INTERVAL_MINUTES", "60"))
+INVENTORY_MAX_PARALLEL = int(os.getenv("INVENTORY_MAX_PARALLEL", "8"))
+
+# Comptes propres au moteur, jamais rattachés à un utilisateur de la plateforme
+SYSTEM_ACCOUNTS = {
+    "mysql": {"root", "mysql.sys", "mysql.session", "mysql.infoschema", "debian-sys-maint"},
+    "oracle": set(),  # Exclus par la requête (oracle_maintained)
+    "mongodb": set(),
+}
+
+def encode_users(users: List[Dict]):
+    """(contenu compressé, empreinte) d'une liste d'utilisateurs, indépendants de l'ordre"""
+    payload = json.dumps(sorted(users, key=lambda user: (user["username"], user.get("host") or "")),
+                         separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return zlib.compress(payload, 6), hashlib.sha256(payload).hexdigest()
+
+def decode_users(content: Optional[bytes]) -> List[Dict]:
+    return json.loads(zlib.decompress(content)) if content else []
+
+def _fetch(database: models.ManagedDatabase):
+    try:
+        with pool.acquire(database) as adapter:
+            return adapter.get_inventory(), None
+    except Exception as e:
+        return None, str(e)[:500]
+
+def snapshot_inventory(db: Session, database_ids: Optional[Iterable[int]] = None,
+                       max_parallel: int = INVENTORY_MAX_PARALLEL, now: Optional[datetime] = None) -> Dict:
+    """
+    Inventorie les utilisateurs et privilèges des bases gérées, en parallèle.
+
+    Un inventaire identique au précédent ne réécrit pas son contenu; en cas
+    d'échec le dernier inventaire réussi est conservé.
+
+    Returns:
+        dict: nombre de bases inventoriées, en échec et modifiées
+    """
+    now = now or datetime.utcnow()
+    query = db.query(models.ManagedDatabase).filter(models.ManagedDatabase.is_active == True)
+    if database_ids is not None:
+        query = query.filter(models.ManagedDatabase.id.in_(list(database_ids)))
+    databases = query.all()
+    if not databases:
+        return {"databases": 0, "failed": 0, "changed": 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(databases)))) as executor:
+        fetched = list(executor.map(_fetch, databases))
+
+    snapshots = {
+        snapshot.database_id: snapshot
+        for snapshot in db.query(models.UserInventorySnapshot).filter(
+            models.UserInventorySnapshot.database_id.in_([database.id for database in databases])
+        )
+    }
+    failed = changed = 0
+    for database, (users, error) in zip(databases, fetched):
+        snapshot = snapshots.get(database.id)
+        if snapshot is None:
+            snapshot = models.UserInventorySnapshot(database_id=database.id)
+            db.add(snapshot)
+        snapshot.checked_at = now
+        if error is not None:
+            logger.error(f"Inventory of database {database.name} failed: {error}")
+            snapshot.status, snapshot.error = "error", error
+            failed += 1
+            continue
+        content, checksum = encode_users(users)
+        if snapshot.checksum != checksum:
+            snapshot.content, snapshot.checksum = content, checksum
+            snapshot.user_count = len(users)
+            changed += 1
+        snapshot.status, snapshot.error, snapshot.taken_at = "ok", None, now
+    db.commit()
+    logger.info(f"Inventoried {len(databases) - failed}/{len(databases)} databases ({changed} changed)")
+    return {"databases": len(databases), "failed": failed, "changed": changed}
+
+def get_snapshot(db: Session, database_id: int) -> Optional[Dict]:
+    snapshot = db.get(models.UserInventorySnapshot, database_id)
+    if snapshot is None:
+        return None
+    return {
+        "database_id": snapshot.database_id,
+        "status": snapshot.status,
+        "error": snapshot.error,
+        "user_count": snapshot.user_count,
+        "taken_at": snapshot.taken_at,
+        "checked_at": snapshot.checked_at,
+        "users": decode_users(snapshot.content)
+    }
+
+def compute_drift(db: Session, database_ids: Optional[Iterable[int]] = None) -> List[Dict]:
+    """
+    Écart entre les mappings de la plateforme et le dernier inventaire de chaque base:
+    utilisateurs mappés absents de la base, et utilisateurs présents sans mapping
+    """
+    databases = db.query(models.ManagedDatabase)
+    if database_ids is not None:
+        databases = databases.filter(models.ManagedDatabase.id.in_(list(database_ids)))
+    databases = {database.id: database for database in databases}
+
+    expected: Dict[int, set] = {database_id: set() for database_id in databases}
+    for database_id, username in db.query(models.UserDatabaseMapping.database_id,
+                                          models.UserDatabaseMapping.database_username).filter(
+        models.UserDatabaseMapping.database_id.in_(list(databases))
+    ):
+        expected[database_id].add(username)
+
+    snapshots = {
+        snapshot.database_id: snapshot
+        for snapshot in db.query(models.UserInventorySnapshot).filter(
+            models.UserInventorySnapshot.database_id.in_(list(databases))
+        )
+    }
+    stale_before = datetime.utcnow() - timedelta(minutes=2 * INVENTORY_INTERVAL_MINUTES)
+
+    drift = []
+    for database_id, database in sorted(databases.items()):
+        snapshot = snapshots.get(database_id)
+        if snapshot is None or snapshot.taken_at is None:
+            continue
+        ignored = SYSTEM_ACCOUNTS.get(database.db_type.lower(), set()) | {database.username}
+        actual = {user["username"] for user in decode_users(snapshot.content)}
+        drift.append({
+            "database_id": database_id,
+            "taken_at": snapshot.taken_at,
+            "stale": snapshot.taken_at < stale_before,
+            "missing": sorted(expected[database_id] - actual),
+            "unmanaged": sorted(actual - expected[database_id] - ignored),
+        })
+    return drift
+
+def inventory_job():
+    """Inventaire périodique, pris par l'instance élue"""
+    if not elector.is_leader(INVENTORY_LEASE):
+        return
+    db = SessionLocal()
+    try:
+        snapshot_inventory(db)
+    except Exception as e:
+        logger.error(f"Error in inventory job: {str(e)}")
+    finally:
+        db.close()
+
+def start_inventory_scheduler():
+    """Démarre l'inventaire périodique des utilisateurs des bases gérées"""
+    scheduler = BackgroundScheduler()
+    elector.register(INVENTORY_LEASE)
+    scheduler.add_job(
+        inventory_job,
+        IntervalTrigger(minutes=INVENTORY_INTERVAL_MINUTES),
+        id="user_inventory_job",
+        replace_existing=True
+    )
+    scheduler.start()
+    logger.info("Started user inventory scheduler")
+    return scheduler
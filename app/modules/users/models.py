@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, LargeBinary, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -92,4 +92,20 @@ class UserDatabaseMapping(Base):
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     def __repr__(self):
-        return f"<UserDatabaseMapping platform_user={self.platform_user_id} database={self.database_id}>"
\ No newline at end of file
+        return f"<UserDatabaseMapping platform_user={self.platform_user_id} database={self.database_id}>"
+
+class UserInventorySnapshot(Base):
+    """Dernier inventaire des utilisateurs et privilèges d'une base gérée"""
+    __tablename__ = "user_inventory_snapshots"
+
+    database_id = Column(Integer, ForeignKey("managed_databases.id"), primary_key=True)
+    status = Column(String(20), nullable=False)  # ok, error
+    error = Column(String(500))
+    user_count = Column(Integer)
+    checksum = Column(String(64))
+    content = Column(LargeBinary(length=2 ** 24))  # Liste JSON compressée (zlib)
+    taken_at = Column(DateTime)  # Dernier inventaire réussi
+    checked_at = Column(DateTime)  # Dernière tentative
+    
+    def __repr__(self):
+        return f"<UserInventorySnapshot database={self.database_id} users={self.user_count}>"
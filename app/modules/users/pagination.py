@@ -0,0 +1,80 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, inspect
+from sqlalchemy.orm import Session, load_only, selectinload
+
+# Taille maximale d'une page des listes
+MAX_PAGE_SIZE = 1000
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[Set[str]]:
+    """Champs demandés (`?fields=email,roles`), l'identifiant étant toujours inclus"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(sorted(unknown))}")
+    return requested | {"id"}
+
+def keyset_page(db: Session, model, limit: int = 100, after_id: Optional[int] = None, skip: int = 0,
+                fields: Optional[Set[str]] = None, relationships: Sequence[str] = ()) -> Tuple[List[Any], int]:
+    """
+    Page d'une table ordonnée par identifiant, avec le nombre total de lignes.
+
+    La page suit `after_id` (pagination par clé, sans parcourir les lignes
+    précédentes) ou à défaut saute `skip` lignes. Le total est calculé par
+    une fonction de fenêtre dans la même requête, et les relations sont
+    chargées en une requête par relation (`selectinload`), quel que soit le
+    nombre de lignes. Avec `fields`, seules ces colonnes et relations sont
+    chargées.
+
+    Returns:
+        tuple: (lignes, total)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # Le total porte sur toute la table: la fenêtre est calculée sur les seuls
+    # identifiants, avant le filtre de page
+    numbered = db.query(model.id.label("id"), func.count().over().label("total")).subquery()
+
+    columns = [column.key for column in inspect(model).column_attrs]
+    wanted_columns = columns if fields is None else [name for name in columns if name in fields]
+    wanted_relationships = [name for name in relationships if fields is None or name in fields]
+
+    query = (
+        db.query(model, numbered.c.total)
+        .join(numbered, numbered.c.id == model.id)
+        .options(load_only(*[getattr(model, name) for name in wanted_columns]),
+                 *[selectinload(getattr(model, name)) for name in wanted_relationships])
+        .order_by(model.id)
+    )
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+    elif skip:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+
+    if rows:
+        total = rows[0].total
+    else:
+        # Au-delà de la dernière page la fenêtre ne renvoie rien
+        total = db.query(func.count(model.id)).scalar()
+    return [row[0] for row in rows], total
+
+def page_headers(items: List[Any], total: int, limit: int) -> Dict[str, str]:
+    """En-têtes de pagination: total et curseur de la page suivante"""
+    headers = {"X-Total-Count": str(total)}
+    if items and len(items) >= min(limit, MAX_PAGE_SIZE):
+        headers["X-Next-After-Id"] = str(items[-1].id)
+    return headers
+
+def project(item, fields: Set[str], nested: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Représentation d'une ligne réduite aux champs chargés (aucun chargement différé)"""
+    nested = nested or {}
+    result = {}
+    for name in fields:
+        value = getattr(item, name)
+        if name in nested:
+            value = [nested[name].model_validate(child).model_dump() for child in value]
+        result[name] = value
+    return result
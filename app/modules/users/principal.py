@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.modules.users import models, schemas
+
+# Durée de vie d'une entrée du cache: borne le délai de prise en compte d'une
+# modification faite par une autre instance de l'API (l'invalidation est locale)
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+@dataclass(frozen=True)
+class Principal:
+    """Utilisateur authentifié, figé au moment de sa résolution"""
+    id: int
+    email: str
+    is_active: bool
+    is_superuser: bool
+    roles: Tuple[str, ...]
+    user: schemas.User  # Profil déjà sérialisé, renvoyé tel quel par /me
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        profile = schemas.User.model_validate(user)  # Charge les rôles une seule fois
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser),
+            roles=tuple(sorted(role.name for role in profile.roles)),
+            user=profile
+        )
+
+    def has_role(self, name: str) -> bool:
+        return name in self.roles
+
+class PrincipalCache:
+    """Cache des utilisateurs authentifiés, indexé par le sujet du token"""
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS, max_entries: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, Principal]] = {}
+        self._subjects: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.monotonic():
+                self._remove(subject)
+                return None
+            return principal
+
+    def put(self, subject: str, principal: Principal) -> None:
+        with self._lock:
+            self._remove(subject)
+            self._remove(self._subjects.get(principal.id))
+            # Le plus ancien est évincé (les dictionnaires gardent l'ordre d'insertion)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._entries[subject] = (time.monotonic() + self.ttl, principal)
+            self._subjects[principal.id] = subject
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Oublie l'utilisateur, quel que soit le sujet sous lequel il a été mis en cache"""
+        with self._lock:
+            self._remove(self._subjects.get(user_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._subjects.clear()
+
+    def _remove(self, subject: Optional[str]) -> None:
+        entry = self._entries.pop(subject, None) if subject is not None else None
+        if entry is not None:
+            self._subjects.pop(entry[1].id, None)
+
+cache = PrincipalCache()
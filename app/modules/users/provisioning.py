@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.modules.users import models
+from app.utils.health import registry as health, target_key
+
+logger = logging.getLogger(__name__)
+
+# Bases provisionnées simultanément par une requête
+PROVISIONING_MAX_PARALLEL_DATABASES = int(os.getenv("PROVISIONING_MAX_PARALLEL_DATABASES", "8"))
+
+# Sessions simultanées au plus sur une même base, toutes requêtes confondues
+PROVISIONING_PER_DATABASE_LIMIT = int(os.getenv("PROVISIONING_PER_DATABASE_LIMIT", "2"))
+
+# Un adaptateur inutilisé plus longtemps est déconnecté au lieu d'être réutilisé
+PROVISIONING_ADAPTER_IDLE_SECONDS = float(os.getenv("PROVISIONING_ADAPTER_IDLE_SECONDS", "300"))
+
+def create_adapter(database: models.ManagedDatabase):
+    """Adaptateur correspondant au type d'une base gérée (pilote importé à l'usage)"""
+    db_type = database.db_type.lower()
+    if db_type == 'mysql':
+        from app.adapters.mysql_adapter import MySQLAdapter
+        return MySQLAdapter(
+            host=database.host,
+            port=database.port,
+            user=database.username,
+            password=database.password,
+            database=database.database_name
+        )
+    elif db_type == 'oracle':
+        from app.adapters.oracle_adapter import OracleAdapter
+        return OracleAdapter(
+            host=database.host,
+            port=database.port,
+            user=database.username,
+            password=database.password,
+            service_name=database.database_name
+        )
+    elif db_type == 'mongodb':
+        from app.adapters.mongo_adapter import MongoDBAdapter
+        return MongoDBAdapter(
+            host=database.host,
+            port=database.port,
+            user=database.username,
+            password=database.password,
+            database=database.database_name
+        )
+    raise ValueError(f"Unsupported database type: {database.db_type}")
+
+def temporary_password() -> str:
+    """Mot de passe initial que l'utilisateur devra changer"""
+    return secrets.token_urlsafe(16)
+
+class AdapterPool:
+    """
+    Adaptateurs connectés réutilisés d'une requête à l'autre, par base gérée.
+    Le nombre de sessions simultanées sur une base est borné par un sémaphore.
+    """
+
+    def __init__(self, per_database: int = PROVISIONING_PER_DATABASE_LIMIT,
+                 idle_seconds: float = PROVISIONING_ADAPTER_IDLE_SECONDS):
+        self.per_database = per_database
+        self.idle_seconds = idle_seconds
+        self._slots: Dict[int, threading.BoundedSemaphore] = {}
+        self._idle: Dict[int, List] = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, database_id: int) -> threading.BoundedSemaphore:
+        with self._lock:
+            if database_id not in self._slots:
+                self._slots[database_id] = threading.BoundedSemaphore(self.per_database)
+            return self._slots[database_id]
+
+    def _take_idle(self, database_id: int):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(database_id, [])
+            while idle:
+                released_at, adapter = idle.pop()
+                if now - released_at < self.idle_seconds:
+                    return adapter
+                adapter.disconnect()
+        return None
+
+    @contextmanager
+    def acquire(self, database: models.ManagedDatabase):
+        with self._slot(database.id):
+            adapter = self._take_idle(database.id)
+            if adapter is None:
+                adapter = create_adapter(database)
+                # Échec immédiat tant que la base est considérée hors service
+                with health.guard(target_key(database.host, database.port)):
+                    if not adapter.connect():
+                        raise ConnectionError(f"Failed to connect to database {database.name}")
+            try:
+                yield adapter
+            except Exception:
+                # Session dans un état inconnu: pas de réutilisation
+                adapter.disconnect()
+                raise
+            with self._lock:
+                self._idle.setdefault(database.id, []).append((time.monotonic(), adapter))
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for adapters in idle.values():
+            for _, adapter in adapters:
+                adapter.disconnect()
+
+pool = AdapterPool()
+
+def _provision_database(database: models.ManagedDatabase, items: List[Dict]) -> List[Dict]:
+    """Crée les utilisateurs d'une base en un lot, dans une seule session"""
+    batch = [{"username": item["database_username"], "password": item["password"], "roles": item["roles"]}
+             for item in items]
+    try:
+        with pool.acquire(database) as adapter:
+            outcomes = adapter.create_users(batch)
+    except Exception as e:
+        logger.error(f"Provisioning on database {database.id} failed: {str(e)}")
+        outcomes = [(user["username"], False, str(e)) for user in batch]
+
+    for item, (_, success, error) in zip(items, outcomes):
+        item["status"] = "created" if success else "failed"
+        item["error"] = error
+    return items
+
+def provision_users(db: Session, users: List[Dict], database_ids: List[int], roles: List[str],
+                    max_parallel: int = PROVISIONING_MAX_PARALLEL_DATABASES) -> Dict:
+    """
+    Crée chaque utilisateur sur chaque base, les bases étant traitées en parallèle.
+
+    Les paires déjà provisionnées (mapping existant) sont ignorées, ce qui
+    permet de relancer la même requête, ou seulement son champ `retry`,
+    après un échec partiel.
+
+    Args:
+        users: dictionnaires (platform_user_id, database_username)
+        database_ids: bases cibles
+        roles: rôles accordés sur chaque base
+
+    Returns:
+        dict: résultats par paire, compteurs et requête à rejouer pour les échecs
+    """
+    database_ids = list(dict.fromkeys(database_ids))
+    # Un utilisateur répété n'est provisionné qu'une fois, avec sa première entrée
+    unique_users = {}
+    for user in users:
+        unique_users.setdefault(user["platform_user_id"], user)
+    users = list(unique_users.values())
+    user_ids = {user["platform_user_id"] for user in users}
+    known_users = {user.id for user in db.query(models.User.id).filter(models.User.id.in_(user_ids))}
+    databases = {
+        database.id: database
+        for database in db.query(models.ManagedDatabase).filter(models.ManagedDatabase.id.in_(database_ids))
+    }
+    existing = {
+        (mapping.platform_user_id, mapping.database_id)
+        for mapping in db.query(models.UserDatabaseMapping.platform_user_id, models.UserDatabaseMapping.database_id)
+        .filter(models.UserDatabaseMapping.platform_user_id.in_(user_ids),
+                models.UserDatabaseMapping.database_id.in_(database_ids))
+    }
+
+    results, pending = [], {}
+    for database_id in database_ids:
+        for user in users:
+            item = {
+                "platform_user_id": user["platform_user_id"],
+                "database_id": database_id,
+                "database_username": user["database_username"],
+                "roles": list(roles),
+                "status": None,
+                "error": None,
+            }
+            results.append(item)
+            if user["platform_user_id"] not in known_users:
+                item.update(status="failed", error="User not found")
+            elif database_id not in databases:
+                item.update(status="failed", error="Database not found")
+            elif (user["platform_user_id"], database_id) in existing:
+                item["status"] = "exists"
+            else:
+                item["password"] = temporary_password()
+                pending.setdefault(database_id, []).append(item)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(pending)))) as executor:
+            list(executor.map(lambda database_id: _provision_database(databases[database_id], pending[database_id]),
+                              pending))
+
+    # Mappings des utilisateurs créés, en un seul commit
+    for item in results:
+        if item["status"] == "created":
+            db.add(models.UserDatabaseMapping(
+                platform_user_id=item["platform_user_id"],
+                database_id=item["database_id"],
+                database_username=item["database_username"],
+                database_roles=json.dumps(item["roles"])
+            ))
+    db.commit()
+
+    for item in results:
+        # Le mot de passe temporaire n'est communiqué que pour les utilisateurs créés
+        password = item.pop("password", None)
+        item["temporary_password"] = password if item["status"] == "created" else None
+
+    failed = [item for item in results if item["status"] == "failed"]
+    # Seuls les échecs sur la base elle-même sont à rejouer (pas les identifiants inconnus)
+    retryable = [item for item in failed if item["database_id"] in pending]
+    retry_users = {item["platform_user_id"]: item["database_username"] for item in retryable}
+    return {
+        "created": sum(item["status"] == "created" for item in results),
+        "existing": sum(item["status"] == "exists" for item in results),
+        "failed": len(failed),
+        "results": results,
+        "retry": {
+            "users": [{"platform_user_id": user_id, "database_username": username}
+                      for user_id, username in retry_users.items()],
+            "database_ids": sorted({item["database_id"] for item in retryable}),
+            "roles": list(roles)
+        } if retryable else None
+    }
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import timedelta
 from pydantic import BaseModel
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.config import API_ACCESS_TOKEN_EXPIRE_MINUTES
-from app.modules.users import models, schemas, service
+from app.modules.users import inventory, models, provisioning, schemas, service
+from app.modules.users.principal import Principal, cache as principal_cache
+from app.modules.users.pagination import MAX_PAGE_SIZE, page_headers, parse_fields, project
+from app.utils import security
 
 router = APIRouter()
 
@@ -17,7 +24,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 class TokenData(BaseModel):
     email: Optional[str] = None  # Champ email pour stocker l'email dans le token
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -31,17 +38,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = TokenData(email=email)  # Utilisation du modèle TokenData
     except service.JWTError:
         raise credentials_exception
-    user = service.get_user_by_email(db, email=token_data.email)  # Récupération de l'utilisateur par email
+    # Le token est vérifié à chaque requête, seul l'utilisateur est mis en cache
+    principal = principal_cache.get(token_data.email)
+    if principal is not None:
+        return principal
+    user = await service.get_user_by_email_async(db, email=token_data.email)  # Récupération de l'utilisateur par email
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(token_data.email, principal)
+    return principal
 
-async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-async def get_current_admin_user(current_user: models.User = Depends(get_current_active_user)):
+async def get_current_admin_user(current_user: Principal = Depends(get_current_active_user)):
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
@@ -54,7 +67,7 @@ class LoginRequest(BaseModel):
 # Route d'authentification
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = service.authenticate_user(db, login_data.email, login_data.password)  # Authentification par email
+    user = await service.authenticate_user_async(db, login_data.email, login_data.password)  # Authentification par email
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -72,42 +85,61 @@ async def login_for_access_token(login_data: LoginRequest, db: Session = Depends
 # Routes pour les utilisateurs
 @router.post("/", response_model=schemas.User)
 async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db),
-                      current_user: models.User = Depends(get_current_admin_user)):
-    return service.create_user(db=db, user=user)
+                      current_user: Principal = Depends(get_current_admin_user)):
+    hashed_password = await security.hash_password_async(user.password)
+    return await run_in_threadpool(service.create_user, db=db, user=user, hashed_password=hashed_password)
 
+# Listes paginées: `after_id` (valeur de l'en-tête X-Next-After-Id) pour la page suivante,
+# `fields` pour ne renvoyer que certains champs; le total est dans X-Total-Count
 @router.get("/", response_model=List[schemas.User])
-async def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                    current_user: models.User = Depends(get_current_active_user)):
-    users = service.get_users(db, skip=skip, limit=limit)
+def read_users(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                    after_id: Optional[int] = None, fields: Optional[str] = None,
+                    db: Session = Depends(get_db),
+                    current_user: Principal = Depends(get_current_active_user)):
+    selected = parse_fields(fields, schemas.User.model_fields)
+    users, total = service.list_users(db, limit=limit, after_id=after_id, skip=skip, fields=selected)
+    headers = page_headers(users, total, limit)
+    if selected:
+        content = [project(user, selected, nested={"roles": schemas.Role}) for user in users]
+        return JSONResponse(content=jsonable_encoder(content), headers=headers)
+    response.headers.update(headers)
     return users
 
 @router.get("/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(get_current_active_user)):
-    return current_user
+async def read_users_me(current_user: Principal = Depends(get_current_active_user)):
+    return current_user.user
 
 # Routes pour les rôles 
 @router.post("/roles", response_model=schemas.Role)
-async def create_role(role: schemas.RoleCreate, db: Session = Depends(get_db),
-                    current_user: models.User = Depends(get_current_admin_user)):
+def create_role(role: schemas.RoleCreate, db: Session = Depends(get_db),
+                    current_user: Principal = Depends(get_current_admin_user)):
     return service.create_role(db=db, role=role)
 
 @router.get("/roles", response_model=List[schemas.Role])
-async def read_roles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                    current_user: models.User = Depends(get_current_active_user)):
+def read_roles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+                    current_user: Principal = Depends(get_current_active_user)):
     roles = service.get_roles(db, skip=skip, limit=limit)
     return roles
 
 # Routes pour les bases de données gérées - PLACÉES AVANT LES ROUTES AVEC PARAMÈTRES
 @router.post("/databases", response_model=schemas.ManagedDatabase)
-async def create_database(database: schemas.ManagedDatabaseCreate, db: Session = Depends(get_db),
-                         current_user: models.User = Depends(get_current_admin_user)):
+def create_database(database: schemas.ManagedDatabaseCreate, db: Session = Depends(get_db),
+                         current_user: Principal = Depends(get_current_admin_user)):
     return service.create_database(db=db, database=database)
 
 @router.get("/databases", response_model=List[schemas.ManagedDatabase])
-async def read_databases(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
-                        current_user: models.User = Depends(get_current_active_user)):
+def read_databases(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                        after_id: Optional[int] = None, fields: Optional[str] = None,
+                        db: Session = Depends(get_db),
+                        current_user: Principal = Depends(get_current_active_user)):
+    selected = parse_fields(fields, schemas.ManagedDatabase.model_fields)
     try:
-        databases = service.get_databases(db, skip=skip, limit=limit)
+        databases, total = service.list_databases(db, limit=limit, after_id=after_id, skip=skip, fields=selected)
+        headers = page_headers(databases, total, limit)
+        if selected:
+            content = [project(database, selected) for database in databases]
+            return JSONResponse(content=jsonable_encoder(content), headers=headers)
+        response.headers.update(headers)
         return databases
     except Exception as e:
         # Enregistrez les détails de l'erreur
@@ -118,15 +150,51 @@ async def read_databases(skip: int = 0, limit: int = 100, db: Session = Depends(
             detail=f"Erreur de base de données: {str(e)}"
         )
 # Routes pour la synchronisation des utilisateurs - PLACÉE AVANT LES ROUTES AVEC PARAMÈTRES
-@router.post("/sync-with-database", response_model=schemas.UserDatabaseMapping)
-async def sync_user_with_database(mapping: schemas.UserDatabaseMappingCreate, db: Session = Depends(get_db),
-                                 current_user: models.User = Depends(get_current_admin_user)):
+@router.post("/sync-with-database", response_model=schemas.UserDatabaseMappingCreated)
+def sync_user_with_database(mapping: schemas.UserDatabaseMappingCreate, db: Session = Depends(get_db),
+                                 current_user: Principal = Depends(get_current_admin_user)):
     return service.sync_user_with_database(db=db, mapping=mapping)
 
+# Provisionnement d'utilisateurs sur plusieurs bases: résultat par paire utilisateur/base,
+# le champ `retry` de la réponse peut être renvoyé tel quel pour rejouer les échecs
+@router.post("/provision", response_model=schemas.BulkProvisionResponse)
+def provision_users(request: schemas.BulkProvisionRequest, db: Session = Depends(get_db),
+                    current_user: Principal = Depends(get_current_admin_user)):
+    return provisioning.provision_users(
+        db,
+        users=[user.model_dump() for user in request.users],
+        database_ids=request.database_ids,
+        roles=request.roles
+    )
+
+# Inventaire des utilisateurs des bases gérées, servi depuis le dernier instantané
+@router.get("/inventory", response_model=List[schemas.InventorySnapshot])
+def read_inventory(db: Session = Depends(get_db),
+                   current_user: Principal = Depends(get_current_active_user)):
+    return db.query(models.UserInventorySnapshot).order_by(models.UserInventorySnapshot.database_id).all()
+
+@router.get("/inventory/drift", response_model=List[schemas.DatabaseDrift])
+def read_inventory_drift(database_id: Optional[int] = None, db: Session = Depends(get_db),
+                         current_user: Principal = Depends(get_current_active_user)):
+    return inventory.compute_drift(db, [database_id] if database_id is not None else None)
+
+@router.post("/inventory/refresh", response_model=schemas.InventoryRefreshResponse)
+def refresh_inventory(database_id: Optional[int] = None, db: Session = Depends(get_db),
+                      current_user: Principal = Depends(get_current_admin_user)):
+    return inventory.snapshot_inventory(db, [database_id] if database_id is not None else None)
+
+@router.get("/inventory/{database_id}", response_model=schemas.InventorySnapshot)
+def read_database_inventory(database_id: int, db: Session = Depends(get_db),
+                            current_user: Principal = Depends(get_current_active_user)):
+    snapshot = inventory.get_snapshot(db, database_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No inventory for this database")
+    return snapshot
+
 # Routes avec paramètres - PLACÉES APRÈS TOUTES LES ROUTES SPÉCIFIQUES
 @router.get("/{user_id}", response_model=schemas.User)
-async def read_user(user_id: int, db: Session = Depends(get_db),
-                   current_user: models.User = Depends(get_current_active_user)):
+def read_user(user_id: int, db: Session = Depends(get_db),
+                   current_user: Principal = Depends(get_current_active_user)):
     db_user = service.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -134,10 +202,12 @@ async def read_user(user_id: int, db: Session = Depends(get_db),
 
 @router.put("/{user_id}", response_model=schemas.User)
 async def update_user(user_id: int, user: schemas.UserUpdate, db: Session = Depends(get_db),
-                     current_user: models.User = Depends(get_current_admin_user)):
-    return service.update_user(db=db, user_id=user_id, user=user)
+                     current_user: Principal = Depends(get_current_admin_user)):
+    hashed_password = await security.hash_password_async(user.password) if user.password else None
+    return await run_in_threadpool(service.update_user, db=db, user_id=user_id, user=user,
+                                   hashed_password=hashed_password)
 
 @router.delete("/{user_id}", response_model=schemas.User)
-async def delete_user(user_id: int, db: Session = Depends(get_db),
-                     current_user: models.User = Depends(get_current_admin_user)):
+def delete_user(user_id: int, db: Session = Depends(get_db),
+                     current_user: Principal = Depends(get_current_admin_user)):
     return service.delete_user(db=db, user_id=user_id)
\ No newline at end of file
@@ -97,6 +97,66 @@ class UserDatabaseMapping(UserDatabaseMappingBase):
     class Config:
         from_attributes = True
 
+class UserDatabaseMappingCreated(UserDatabaseMapping):
+    # Mot de passe temporaire du compte créé, renvoyé une seule fois et non conservé
+    temporary_password: Optional[str] = None
+
+# Schémas pour le provisionnement en masse
+class BulkProvisionUser(BaseModel):
+    platform_user_id: int
+    database_username: str
+
+class BulkProvisionRequest(BaseModel):
+    users: List[BulkProvisionUser]
+    database_ids: List[int]
+    roles: List[str] = []
+
+class BulkProvisionItem(BaseModel):
+    platform_user_id: int
+    database_id: int
+    database_username: str
+    roles: List[str]
+    status: str  # created, exists, failed
+    error: Optional[str] = None
+    temporary_password: Optional[str] = None
+
+class BulkProvisionResponse(BaseModel):
+    created: int
+    existing: int
+    failed: int
+    results: List[BulkProvisionItem]
+    retry: Optional[BulkProvisionRequest] = None  # Requête à rejouer pour les échecs
+
+# Schémas pour l'inventaire des utilisateurs des bases gérées
+class InventoryUser(BaseModel):
+    username: str
+    host: Optional[str] = None
+    grants: List[str] = []
+
+class InventorySnapshot(BaseModel):
+    database_id: int
+    status: str
+    error: Optional[str] = None
+    user_count: Optional[int] = None
+    taken_at: Optional[datetime] = None
+    checked_at: Optional[datetime] = None
+    users: Optional[List[InventoryUser]] = None
+
+    class Config:
+        from_attributes = True
+
+class DatabaseDrift(BaseModel):
+    database_id: int
+    taken_at: datetime
+    stale: bool
+    missing: List[str]  # Mappés sur la plateforme, absents de la base
+    unmanaged: List[str]  # Présents sur la base, sans mapping
+
+class InventoryRefreshResponse(BaseModel):
+    databases: int
+    failed: int
+    changed: int
+
 # Schéma pour authentification
 class Token(BaseModel):
     access_token: str
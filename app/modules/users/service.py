@@ -1,31 +1,48 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException, status
-from passlib.context import CryptContext
+from fastapi.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Set
 import json
 
 from app.config import API_SECRET_KEY, API_ALGORITHM, API_ACCESS_TOKEN_EXPIRE_MINUTES
 from app.modules.users import models, schemas
-from app.adapters.mysql_adapter import MySQLAdapter
-from app.adapters.oracle_adapter import OracleAdapter
-from app.adapters.mongo_adapter import MongoDBAdapter
-
-# Configuration de l'encryption des mots de passe
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.modules.users.principal import cache as principal_cache
+from app.modules.users.pagination import keyset_page
+from app.modules.users import provisioning
+from app.adapters.base import user_result
+from app.utils import security
 
+# Hachage des mots de passe (bcrypt, coût réglable par BCRYPT_ROUNDS)
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return security.hash_password(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return security.verify_password(plain_password, hashed_password)
 
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(models.User).filter(models.User.email == email).first()
     if not user or not verify_password(password, user.hashed_password):
         return False
     return user
+
+async def authenticate_user_async(db: Session, email: str, password: str):
+    '''Authentification sans bloquer la boucle d'événements: la base est interrogée dans
+    le pool de threads de l'API et bcrypt s'exécute dans le pool dédié'''
+    user = await run_in_threadpool(get_user_by_email, db, email)
+    if not user:
+        return False
+    valid, new_hash = await security.verify_and_update_async(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        # Hachage d'un coût inférieur au coût courant: mis à niveau à la connexion
+        user.hashed_password = new_hash
+        await run_in_threadpool(db.commit)
+    return user
 '''ajout de la fonction get_current_user pour vérifier si l'utilisateur est authentifié'''
 def get_current_user(db: Session, token: str = None):
     try:
@@ -63,11 +80,25 @@ def get_user(db: Session, user_id: int):
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    '''Version asynchrone, rôles compris (pas de chargement différé en async)'''
+    result = await db.execute(
+        select(models.User).options(selectinload(models.User.roles)).where(models.User.email == email)
+    )
+    return result.scalars().first()
+
 def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+    return (db.query(models.User).options(selectinload(models.User.roles))
+            .order_by(models.User.id).offset(skip).limit(limit).all())
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+def list_users(db: Session, limit: int = 100, after_id: Optional[int] = None, skip: int = 0,
+               fields: Optional[Set[str]] = None):
+    '''Page d'utilisateurs avec leurs rôles et le total, en un nombre constant de requêtes'''
+    return keyset_page(db, models.User, limit=limit, after_id=after_id, skip=skip,
+                       fields=fields, relationships=("roles",))
+
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: Optional[str] = None):
+    hashed_password = hashed_password or get_password_hash(user.password)
     
     # Vérifier si l'utilisateur existe déjà
     # db_user_username = get_user_by_username(db, username=user.username)
@@ -107,7 +138,7 @@ def create_user(db: Session, user: schemas.UserCreate):
     
     return db_user
 
-def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
+def update_user(db: Session, user_id: int, user: schemas.UserUpdate, hashed_password: Optional[str] = None):
     db_user = get_user(db, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -115,7 +146,8 @@ def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
     # Mettre à jour les champs fournis
     user_data = user.dict(exclude_unset=True)
     if 'password' in user_data:
-        user_data['hashed_password'] = get_password_hash(user_data.pop('password'))
+        password = user_data.pop('password')
+        user_data['hashed_password'] = hashed_password or get_password_hash(password)
     
     # Traiter les rôles séparément
     roles = user_data.pop('roles', None)
@@ -129,6 +161,7 @@ def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
     
     db.commit()
     db.refresh(db_user)
+    principal_cache.invalidate_user(user_id)
     return db_user
 
 def delete_user(db: Session, user_id: int):
@@ -138,6 +171,7 @@ def delete_user(db: Session, user_id: int):
     
     db.delete(db_user)
     db.commit()
+    principal_cache.invalidate_user(user_id)
     return db_user
 
 # Service CRUD pour Role
@@ -170,6 +204,7 @@ def delete_role(db: Session, role_id: int):
     
     db.delete(db_role)
     db.commit()
+    principal_cache.clear()  # Les rôles mis en cache de tous les utilisateurs sont à revoir
     return db_role
     
 # Service CRUD pour ManagedDatabase
@@ -177,7 +212,12 @@ def get_database(db: Session, database_id: int):
     return db.query(models.ManagedDatabase).filter(models.ManagedDatabase.id == database_id).first()
 
 def get_databases(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.ManagedDatabase).offset(skip).limit(limit).all()
+    return db.query(models.ManagedDatabase).order_by(models.ManagedDatabase.id).offset(skip).limit(limit).all()
+
+def list_databases(db: Session, limit: int = 100, after_id: Optional[int] = None, skip: int = 0,
+                   fields: Optional[Set[str]] = None):
+    '''Page de bases de données gérées et le total'''
+    return keyset_page(db, models.ManagedDatabase, limit=limit, after_id=after_id, skip=skip, fields=fields)
 '''Implémenter une validation des informations de connexion avant de créer une base de données.'''
 
 def create_database(db: Session, database: schemas.ManagedDatabaseCreate):
@@ -226,51 +266,33 @@ def sync_user_with_database(db: Session, mapping: schemas.UserDatabaseMappingCre
     db.commit()
     db.refresh(db_mapping)
     
-    # Créer l'utilisateur dans la base de données externe
-    
-    if database.db_type == 'mysql':
-        adapter = MySQLAdapter(
-            host=database.host,
-            port=database.port,
-            user=database.username,
-            password=database.password,
-            database=database.database_name
-        )
-    elif database.db_type == 'oracle':
-        adapter = OracleAdapter(
-            host=database.host,
-            port=database.port,
-            user=database.username,
-            password=database.password,
-            sid=database.database_name
-        )
-    elif database.db_type == 'mongodb':
-        adapter = MongoDBAdapter(
-            host=database.host,
-            port=database.port,
-            user=database.username,
-            password=database.password,
-            database=database.database_name
-        )
+    # Créer l'utilisateur dans la base de données externe, avec un mot de passe
+    # temporaire que l'utilisateur devra changer
+    password = provisioning.temporary_password()
+    try:
+        with provisioning.pool.acquire(database) as adapter:
+            outcome = adapter.create_user(
+                username=mapping.database_username,
+                password=password,
+                roles=mapping.database_roles
+            )
+    except ValueError as e:
+        error = HTTPException(status_code=400, detail=str(e))
+    except ConnectionError:
+        error = HTTPException(status_code=500, detail="Failed to connect to the database")
     else:
-        raise HTTPException(status_code=400, detail=f"Unsupported database type: {database.db_type}")
-    
-    # Se connecter et créer l'utilisateur
-    if not adapter.connect():
-        raise HTTPException(status_code=500, detail="Failed to connect to the database")
-    
-    success = adapter.create_user(
-        username=mapping.database_username,
-        password=user.username,  # Utilisation d'un mot de passe temporaire que l'utilisateur devra changer
-        roles=mapping.database_roles
-    )
+        success, _ = user_result(outcome)
+        error = None if success else HTTPException(status_code=500, detail="Failed to create user in the external database")
     
-    if not success:
+    if error:
         db.delete(db_mapping)
         db.commit()
-        raise HTTPException(status_code=500, detail="Failed to create user in the external database")
+        raise error
     
-    return db_mapping
+    # Le mot de passe n'est pas conservé: cette réponse est le seul moyen de le transmettre
+    created = schemas.UserDatabaseMappingCreated.model_validate(db_mapping, from_attributes=True)
+    created.temporary_password = password
+    return created
 '''ajout de la fonction get_user_databases pour récupérer les bases de données associées à un utilisateur'''
 def get_user_databases(db: Session, user_id: int): 
     return db.query(models.ManagedDatabase).join(models.UserDatabaseMapping).filter(models.UserDatabaseMapping.platform_user_id == user_id).all()
@@ -0,0 +1,177 @@
+"""
+État de santé des bases gérées et disjoncteur par cible (hôte:port).
+
+Après plusieurs échecs de connexion consécutifs, le disjoncteur s'ouvre:
+les tentatives suivantes échouent immédiatement (CircuitOpenError) au lieu
+d'attendre le délai de connexion du pilote. Une fois le délai d'ouverture
+écoulé, une seule tentative (sonde) est laissée passer (semi-ouvert): sa
+réussite referme le disjoncteur, son échec le rouvre pour un délai doublé.
+
+L'état est partagé par les modules d'un même processus (collecte,
+sauvegardes, provisionnement, inventaire); chaque processus de collecte
+tient le sien pour les cibles qui lui sont attribuées.
+"""
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Délai de connexion des pilotes et des sondes (secondes)
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get("CONNECT_TIMEOUT_SECONDS", "5"))
+
+# Échecs consécutifs ouvrant le disjoncteur
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "3"))
+
+# Durée d'ouverture avant la première sonde, doublée à chaque sonde en échec jusqu'au maximum
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_MAX_OPEN_SECONDS = float(os.environ.get("CIRCUIT_MAX_OPEN_SECONDS", "300"))
+
+# Une cible vue joignable depuis moins longtemps n'est pas sondée à nouveau
+HEALTH_CACHE_SECONDS = float(os.environ.get("HEALTH_CACHE_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(ConnectionError):
+    """Cible considérée hors service: la tentative n'a pas été faite"""
+
+def target_key(host, port) -> str:
+    return f"{host}:{port}"
+
+class CircuitBreaker:
+    """État d'une cible; les transitions se font sous le verrou du registre"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = 0.0
+        self.last_error = None
+        self.last_success = None
+        self.probing = False
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            "target": self.key,
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in": round(max(0.0, self.retry_at - now), 1) if self.state == OPEN else None,
+            "last_error": self.last_error,
+        }
+
+class HealthRegistry:
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 open_seconds: float = CIRCUIT_OPEN_SECONDS, max_open_seconds: float = CIRCUIT_MAX_OPEN_SECONDS,
+                 cache_seconds: float = HEALTH_CACHE_SECONDS, clock=time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.cache_seconds = cache_seconds
+        self.clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(key)
+        return breaker
+
+    def state(self, key: str) -> str:
+        with self._lock:
+            return self._breaker(key).state
+
+    def allow(self, key: str) -> bool:
+        """
+        Vrai si une tentative peut être faite. Disjoncteur ouvert et délai
+        écoulé: passe en semi-ouvert et autorise ce seul appelant (la sonde)
+        """
+        with self._lock:
+            breaker = self._breaker(key)
+            if breaker.state == CLOSED:
+                return True
+            if breaker.state == OPEN and self.clock() >= breaker.retry_at:
+                breaker.state = HALF_OPEN
+            if breaker.state == HALF_OPEN and not breaker.probing:
+                breaker.probing = True
+                return True
+            return False
+
+    def record_success(self, key: str) -> None:
+        with self._lock:
+            breaker = self._breaker(key)
+            breaker.state = CLOSED
+            breaker.failures = breaker.trips = 0
+            breaker.probing = False
+            breaker.last_success = self.clock()
+
+    def record_failure(self, key: str, error=None) -> None:
+        with self._lock:
+            breaker = self._breaker(key)
+            breaker.failures += 1
+            breaker.last_error = str(error)[:500] if error is not None else None
+            breaker.last_success = None
+            # Déjà ouvert (tentatives commencées avant l'ouverture): le délai n'est pas prolongé
+            if breaker.state == HALF_OPEN or (breaker.state == CLOSED and breaker.failures >= self.failure_threshold):
+                delay = min(self.max_open_seconds, self.open_seconds * 2 ** breaker.trips)
+                breaker.state = OPEN
+                breaker.trips += 1
+                breaker.retry_at = self.clock() + delay
+            breaker.probing = False
+
+    def recently_healthy(self, key: str) -> bool:
+        with self._lock:
+            breaker = self._breaker(key)
+            return (breaker.state == CLOSED and breaker.last_success is not None
+                    and self.clock() - breaker.last_success < self.cache_seconds)
+
+    @contextmanager
+    def guard(self, key: str):
+        """
+        Encadre une connexion à la cible: lève CircuitOpenError sans rien
+        tenter si le disjoncteur est ouvert, sinon enregistre le résultat
+        """
+        if not self.allow(key):
+            with self._lock:
+                breaker = self._breaker(key)
+                message = f"Circuit open for {key}: {breaker.last_error}"
+            raise CircuitOpenError(message)
+        try:
+            yield
+        except Exception as e:
+            self.record_failure(key, e)
+            raise
+        self.record_success(key)
+
+    def snapshot(self) -> List[Dict]:
+        now = self.clock()
+        with self._lock:
+            return [breaker.to_dict(now) for _, breaker in sorted(self._breakers.items())]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+registry = HealthRegistry()
+
+def tcp_probe(host, port, timeout: float = CONNECT_TIMEOUT_SECONDS) -> None:
+    """Ouvre puis referme une connexion TCP; lève OSError si la cible ne répond pas"""
+    with socket.create_connection((host, int(port)), timeout=timeout):
+        pass
+
+def check_reachable(host, port, timeout: float = CONNECT_TIMEOUT_SECONDS) -> None:
+    """
+    Vérifie qu'une cible est joignable avant un traitement qui s'y connecte
+    par ses propres moyens (outils de sauvegarde): résultat en cache tant
+    que la cible est saine, échec immédiat si son disjoncteur est ouvert
+    """
+    key = target_key(host, port)
+    if registry.recently_healthy(key):
+        return
+    with registry.guard(key):
+        tcp_probe(host, port, timeout)
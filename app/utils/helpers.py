@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+
+try:
+    import xxhash
+except ImportError:  # Dépendance optionnelle, sha256 reste disponible
+    xxhash = None
+
+# Taille des blocs lus/écrits lors des copies en flux
+CHUNK_SIZE = 1024 * 1024
+
+# Nom du manifeste des sauvegardes découpées par table
+MANIFEST_FILENAME = "manifest.json"
+
+# Algorithme d'empreinte utilisé par défaut pour les sauvegardes
+BACKUP_CHECKSUM_ALGORITHM = os.environ.get("BACKUP_CHECKSUM_ALGORITHM", "sha256")
+
+def new_hasher(algorithm=BACKUP_CHECKSUM_ALGORITHM):
+    """Retourne un objet de hachage pour l'algorithme demandé (sha256, xxh64, ...)"""
+    if algorithm.startswith("xxh"):
+        if xxhash is None:
+            raise ValueError(f"L'algorithme {algorithm} nécessite le paquet xxhash")
+        return getattr(xxhash, algorithm)()
+    return hashlib.new(algorithm)
+
+class RateLimiter:
+    """
+    Limiteur de débit par cadencement: chaque bloc consommé repousse la date
+    du prochain envoi autorisé selon les limites en octets et en opérations.
+    Le facteur permet de ralentir ou d'accélérer dynamiquement le flux.
+    """
+
+    def __init__(self, max_bytes_per_sec=None, max_ops_per_sec=None):
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self.max_ops_per_sec = max_ops_per_sec
+        self.factor = 1.0
+        self._next_allowed = time.monotonic()
+
+    @property
+    def enabled(self):
+        return bool(self.max_bytes_per_sec or self.max_ops_per_sec)
+
+    def consume(self, nbytes, ops=1):
+        """Comptabilise un bloc et attend si le débit autorisé est dépassé"""
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        if self._next_allowed < now:
+            self._next_allowed = now
+
+        cost = 0.0
+        if self.max_bytes_per_sec:
+            cost = max(cost, nbytes / (self.max_bytes_per_sec * self.factor))
+        if self.max_ops_per_sec:
+            cost = max(cost, ops / (self.max_ops_per_sec * self.factor))
+        self._next_allowed += cost
+
+        delay = self._next_allowed - now
+        if delay > 0:
+            time.sleep(delay)
+
+class HashingWriter:
+    """Enveloppe un fichier ouvert en écriture et calcule l'empreinte des octets écrits"""
+
+    def __init__(self, fileobj, algorithm=BACKUP_CHECKSUM_ALGORITHM):
+        self.fileobj = fileobj
+        self.algorithm = algorithm
+        self.hasher = new_hasher(algorithm)
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.hasher.update(data)
+        self.bytes_written += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+class GzipStreamDecoder:
+    """Décompresse un flux gzip bloc par bloc (archives multi-membres comprises)"""
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    @property
+    def eof(self):
+        return self._decompressor.eof
+
+    def decode(self, chunk):
+        output = []
+        while chunk:
+            output.append(self._decompressor.decompress(chunk))
+            chunk = self._decompressor.unused_data
+            if chunk:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b''.join(output)
+
+def open_binary(path):
+    """Ouverture par défaut des archives: fichier local en lecture binaire"""
+    return open(path, 'rb')
+
+def verify_archive(path, expected_checksum=None, algorithm=BACKUP_CHECKSUM_ALGORITHM,
+                   max_bytes_per_sec=None, decompress=True, opener=open_binary):
+    """
+    Relit une archive en une seule passe pour recalculer son empreinte
+    et tester la décompression gzip, à débit limité.
+
+    Args:
+        path: Chemin de l'archive
+        expected_checksum: Empreinte attendue (None pour ne pas comparer)
+        algorithm: Algorithme de l'empreinte
+        max_bytes_per_sec: Débit de lecture maximal (None = illimité)
+        decompress: Tester la décompression gzip en plus de l'empreinte
+        opener: Fonction ouvrant l'archive en lecture (stockage local par défaut)
+
+    Returns:
+        dict: {'valid', 'checksum', 'size', 'message'}
+    """
+    hasher = new_hasher(algorithm)
+    decoder = GzipStreamDecoder() if decompress else None
+    # Débit limité pour ne pas saturer le disque
+    limiter = RateLimiter(max_bytes_per_sec=max_bytes_per_sec)
+    size = 0
+
+    try:
+        with opener(path) as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                size += len(chunk)
+                limiter.consume(len(chunk))
+
+                # Tester la décompression sans conserver le résultat
+                if decoder is not None:
+                    decoder.decode(chunk)
+    except (OSError, zlib.error) as e:
+        return {'valid': False, 'checksum': None, 'size': size, 'message': str(e)}
+
+    checksum = hasher.hexdigest()
+
+    if decoder is not None and not decoder.eof:
+        return {'valid': False, 'checksum': checksum, 'size': size,
+                'message': "Archive tronquée: flux gzip incomplet"}
+
+    if expected_checksum and checksum != expected_checksum:
+        return {'valid': False, 'checksum': checksum, 'size': size,
+                'message': f"Empreinte différente: attendue {expected_checksum}, obtenue {checksum}"}
+
+    return {'valid': True, 'checksum': checksum, 'size': size, 'message': None}
+
+def verify_manifest(manifest_path, expected_checksum=None, algorithm=BACKUP_CHECKSUM_ALGORITHM,
+                    max_bytes_per_sec=None, opener=open_binary):
+    """
+    Vérifie une sauvegarde découpée par table: l'empreinte du manifeste,
+    puis chaque fichier référencé contre l'empreinte qu'il enregistre.
+    """
+    result = verify_archive(manifest_path, expected_checksum=expected_checksum,
+                            algorithm=algorithm, decompress=False, opener=opener)
+    if not result['valid']:
+        return result
+
+    with opener(manifest_path) as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(manifest_path)
+    total_size = result['size']
+    for part in manifest_parts(manifest):
+        part_result = verify_archive(
+            os.path.join(base_dir, part['file']),
+            expected_checksum=part['checksum'],
+            algorithm=manifest.get('checksum_algorithm', algorithm),
+            max_bytes_per_sec=max_bytes_per_sec,
+            opener=opener
+        )
+        total_size += part_result['size']
+        if not part_result['valid']:
+            return {'valid': False, 'checksum': result['checksum'], 'size': total_size,
+                    'message': f"{part['file']}: {part_result['message']}"}
+
+    return {'valid': True, 'checksum': result['checksum'], 'size': total_size, 'message': None}
+
+def manifest_parts(manifest):
+    """Liste les fichiers d'une sauvegarde découpée: schéma d'abord, puis les tables"""
+    return [manifest['schema']] + list(manifest.get('tables', []))
+
+def is_manifest(path):
+    return bool(path) and os.path.basename(path) == MANIFEST_FILENAME
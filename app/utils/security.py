@@ -0,0 +1,81 @@
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+# Coût bcrypt des nouveaux hachages (2^rounds itérations, ~250 ms à 12)
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+# Threads réservés au hachage: bcrypt libère le GIL, ce pool borne le CPU
+# consommé par une rafale de connexions sans bloquer la boucle d'événements
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# bcrypt ne prend en compte que les 72 premiers octets (passlib tronquait de même)
+BCRYPT_MAX_BYTES = 72
+
+_BCRYPT_HASH = re.compile(r"^\$2[aby]?\$(\d{2})\$")
+
+_executor = None
+
+def _secret(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+def hash_password(password: str, rounds: int = None) -> str:
+    """Hache un mot de passe avec bcrypt au coût configuré"""
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+    return bcrypt.hashpw(_secret(password), salt).decode("ascii")
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    """Vérifie un mot de passe; un hachage illisible ne correspond à rien"""
+    if not hashed_password:
+        return False
+    try:
+        return bcrypt.checkpw(_secret(password), hashed_password.encode("ascii"))
+    except ValueError:
+        return False
+
+def needs_rehash(hashed_password: str, rounds: int = None) -> bool:
+    """Vrai si le hachage n'est pas un bcrypt au moins au coût configuré"""
+    match = _BCRYPT_HASH.match(hashed_password or "")
+    return match is None or int(match.group(1)) < (rounds or BCRYPT_ROUNDS)
+
+def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Vérifie le mot de passe et, s'il est correct mais haché à un coût
+    inférieur au coût courant, retourne son nouveau hachage
+
+    Returns:
+        tuple: (valide, nouveau hachage ou None)
+    """
+    if not verify_password(password, hashed_password):
+        return False, None
+    if needs_rehash(hashed_password):
+        return True, hash_password(password)
+    return True, None
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    return _executor
+
+async def _run(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, password, hashed_password)
+
+async def verify_and_update_async(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update, password, hashed_password)
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,213 @@
+"""
+Analyzer micro-benchmark and golden outputs.
+
+Generates deterministic metric histories (daily cycle, slow growth,
+correlated metrics, spikes and missing values) and times each
+`MetricAnalyzer` method on them: per-call latency (best and median of
+several runs) and allocations (tracemalloc peak and net new blocks).
+
+`golden_outputs()` computes the reference results pinned in
+`golden_analyzer.json`; `test_analyzer_golden.py` checks that the
+analyzer still produces them, so a faster rewrite can be proven
+equivalent.
+
+Usage:
+    python -m benchmarks.bench_analyzer --sizes 100 1000 10000 100000 1000000
+    python -m benchmarks.bench_analyzer --write-golden
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.modules.monitoring.analyzer import MetricAnalyzer
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_analyzer.json")
+
+GOLDEN_SIZES = (100, 1000)
+GOLDEN_STREAM_LENGTH = 200
+
+COLLECTION_INTERVAL = 60
+HISTORY_START = datetime(2024, 1, 1)
+
+def generate_history(size: int, seed: int = 42, interval: int = COLLECTION_INTERVAL) -> List[Dict[str, Any]]:
+    """Deterministic history of `size` data points spaced by `interval` seconds"""
+    rng = np.random.default_rng(seed)
+    index = np.arange(size)
+    day = 2 * math.pi * index * interval / 86400
+
+    cpu = 45 + 20 * np.sin(day) + rng.normal(0, 5, size)
+    spikes = rng.random(size) < 0.01
+    cpu[spikes] += rng.uniform(20, 45, spikes.sum())
+    cpu = np.clip(cpu, 0, 100)
+    memory = np.clip(50 + 25 * index / max(size, 1) + rng.normal(0, 2, size), 0, 100)
+    disk = np.clip(60 + 10 * index / max(size, 1) + rng.normal(0, 0.5, size), 0, 100)
+    connections = np.maximum(0, np.round(2 * cpu + rng.normal(0, 10, size))).astype(int)
+    latency = np.abs(0.02 * cpu + rng.normal(0, 0.2, size))
+    transactions = rng.poisson(5, size)
+    latency_missing = rng.random(size) < 0.02
+    errors = rng.random(size) < 0.005
+
+    history = []
+    for i in range(size):
+        timestamp = HISTORY_START + timedelta(seconds=i * interval)
+        if errors[i]:
+            history.append({"error": "Connection refused", "timestamp": timestamp})
+            continue
+        history.append({
+            "cpu_usage": float(cpu[i]),
+            "memory_usage": float(memory[i]),
+            "disk_usage": float(disk[i]),
+            "connections_count": int(connections[i]),
+            "query_latency": None if latency_missing[i] else float(latency[i]),
+            "active_transactions": int(transactions[i]),
+            "timestamp": timestamp
+        })
+    return history
+
+def make_analyzer(history: List[Dict[str, Any]], db_type: str = "mysql") -> MetricAnalyzer:
+    analyzer = MetricAnalyzer(connection_id=1, db_type=db_type, collection_interval=COLLECTION_INTERVAL)
+    analyzer.max_history_size = max(analyzer.max_history_size, len(history))
+    analyzer.metrics_history = list(history)
+    analyzer.rebuild_statistics()
+    return analyzer
+
+def _plain(value):
+    """Convert numpy scalars and containers to JSON types"""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _alerts(alerts):
+    # Alert timestamps are the analysis time, not part of the result
+    return [[alert["alert_type"], alert["severity"], alert["message"]] for alert in alerts]
+
+def golden_outputs() -> Dict[str, Any]:
+    """Reference results of every analyzer method on the golden histories"""
+    outputs = {}
+    for size in GOLDEN_SIZES:
+        history = generate_history(size)
+        analyzer = make_analyzer(history)
+        adapted = make_analyzer(history)
+        adapted.adapt_thresholds()
+        outputs[str(size)] = _plain({
+            "detect_anomalies": {
+                metric: [[a["index"], a["value"], a["deviation"]] for a in analyzer.detect_anomalies(metric)]
+                for metric in ("cpu_usage", "query_latency")
+            },
+            "find_metric_correlations": analyzer.find_metric_correlations(),
+            "predict_future_value": {
+                metric: analyzer.predict_future_value(metric)
+                for metric in ("cpu_usage", "memory_usage", "disk_usage")
+            },
+            "adapt_thresholds": adapted.thresholds,
+            "analyze_trends": _alerts(analyzer.analyze_trends()),
+            "generate_health_score": [analyzer.generate_health_score(m) for m in history[:100]],
+        })
+
+    # Streaming analysis with the default bounded history
+    stream = MetricAnalyzer(connection_id=1, db_type="mysql", collection_interval=COLLECTION_INTERVAL)
+    outputs["analyze_metrics"] = [
+        [step, *alert]
+        for step, metrics in enumerate(generate_history(GOLDEN_STREAM_LENGTH, seed=7))
+        for alert in _alerts(stream.analyze_metrics(metrics))
+    ]
+    return outputs
+
+def _cases(analyzer, history):
+    latest = history[-1]
+    thresholds = copy.deepcopy(analyzer.thresholds)
+
+    def adapt():
+        analyzer.adapt_thresholds()
+        analyzer.thresholds = copy.deepcopy(thresholds)
+
+    return {
+        # The history is full: each call evicts the oldest point, as in production
+        "analyze_metrics": lambda: analyzer.analyze_metrics(latest),
+        "analyze_trends": analyzer.analyze_trends,
+        "generate_health_score": lambda: analyzer.generate_health_score(latest),
+        "detect_anomalies": lambda: analyzer.detect_anomalies("cpu_usage"),
+        "find_metric_correlations": analyzer.find_metric_correlations,
+        "predict_future_value": lambda: analyzer.predict_future_value("cpu_usage"),
+        "adapt_thresholds": adapt,
+    }
+
+def measure(func, repeat: int = 5) -> Dict[str, Any]:
+    """Latency (best / median of `repeat` calls) and allocations of one call"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    net_new_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return {
+        "best_ms": round(min(timings) * 1000, 4),
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "net_new_blocks": net_new_blocks
+    }
+
+def run(sizes, repeat=5, methods=None):
+    results = []
+    for size in sizes:
+        history = generate_history(size)
+        analyzer = make_analyzer(history)
+        for name, func in _cases(analyzer, history).items():
+            if methods and name not in methods:
+                continue
+            result = {"method": name, "size": size, **measure(func, repeat)}
+            results.append(result)
+            print(json.dumps(result))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MetricAnalyzer methods")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--methods", nargs="+", default=None)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--write-golden", action="store_true", help="Regenerate golden_analyzer.json")
+    args = parser.parse_args(argv)
+
+    if args.write_golden:
+        with open(GOLDEN_PATH, "w") as f:
+            json.dump(golden_outputs(), f, indent=1)
+            f.write("\n")
+        return 0
+
+    results = run(args.sizes, args.repeat, args.methods)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
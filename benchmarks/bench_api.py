@@ -0,0 +1,133 @@
+"""
+API load test.
+
+Sends concurrent requests to a running API and reports throughput and
+latency percentiles per endpoint. Run it against the server before and
+after a change, saving each run with --output, then compare them:
+
+    python -m benchmarks.bench_api --base-url http://localhost:8000 \\
+        --token "$TOKEN" --concurrency 50 --requests 2000 --output before.json
+    python -m benchmarks.bench_api ... --output after.json --compare before.json
+
+Requires httpx (pip install httpx).
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from typing import Dict, List, Optional
+
+try:
+    import httpx
+except ImportError:  # Only needed to run the load test
+    httpx = None
+
+DEFAULT_PATHS = [
+    "/",
+    "/api/users/me",
+    "/api/users/?limit=100",
+    "/api/users/databases",
+    "/api/backups/sauvegarde/backups?limit=50",
+    "/api/monitoring/monitoring/alerts",
+]
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))
+    return values[rank]
+
+async def _load(client, path: str, concurrency: int, requests: int) -> Dict:
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def user():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[user() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "path": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_sec": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+async def run(base_url: str, paths: List[str], concurrency: int, requests: int,
+              token: Optional[str] = None, timeout: float = 30.0) -> List[Dict]:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=timeout) as client:
+        for path in paths:
+            await client.get(path)  # warm-up
+            result = await _load(client, path, concurrency, requests)
+            results.append(result)
+            print(json.dumps(result))
+    return results
+
+def compare(results: List[Dict], baseline: List[Dict]) -> List[Dict]:
+    """p99 and throughput of each endpoint against a previous run"""
+    previous = {item["path"]: item for item in baseline}
+    rows = []
+    for result in results:
+        before = previous.get(result["path"])
+        if before is None:
+            continue
+        rows.append({
+            "path": result["path"],
+            "p99_before_ms": before["p99_ms"],
+            "p99_after_ms": result["p99_ms"],
+            "rps_before": before["requests_per_sec"],
+            "rps_after": result["requests_per_sec"],
+        })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the API and report latency percentiles")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument("--token", help="Bearer token for authenticated endpoints")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Previous results to compare with")
+    args = parser.parse_args(argv)
+
+    if httpx is None:
+        print("httpx is required: pip install httpx", file=sys.stderr)
+        return 2
+
+    results = asyncio.run(run(args.base_url, args.paths, args.concurrency, args.requests, args.token))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            for row in compare(results, json.load(f)):
+                print(json.dumps(row))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Collection pass benchmark.
+
+Drives the monitoring pipeline against synthetic targets: collectors are
+replaced by fake MySQL / MongoDB / Oracle collectors with configurable
+latency, jitter and failure rate, and the central database is a
+temporary SQLite file. Each scenario runs in a fresh process so peak RSS
+is measured per scenario.
+
+Engines:
+    job     - `collect_metrics_job` (APScheduler job of the API)
+    worker  - `CollectorWorker.run_cycle` (standalone collector, sharded processes)
+
+Usage:
+    python -m benchmarks.bench_collection --targets 10 100 1000 10000
+    python -m benchmarks.bench_collection --write-baseline
+    python -m benchmarks.bench_collection --check
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_collection.json")
+
+# Per database type: (latency seconds, jitter seconds, failure rate)
+DEFAULT_PROFILES = {
+    "mysql": (0.002, 0.001, 0.02),
+    "mongodb": (0.003, 0.002, 0.02),
+    "oracle": (0.005, 0.003, 0.05),
+}
+
+DB_TYPES = ("MySQL", "MongoDB", "Oracle")
+
+# A pass may be slower than the baseline by this factor before it is a regression
+DEFAULT_TOLERANCE = 1.5
+
+class FakeCollector:
+    """Collector returning synthetic metrics after a simulated network round trip"""
+
+    def __init__(self, db_type: str, params: Dict[str, Any], profile, seed: int):
+        self.db_type = db_type.lower()
+        self.params = params
+        self.latency, self.jitter, self.failure_rate = profile
+        self._random = random.Random(seed)
+
+    def collect_metrics(self) -> Dict[str, Any]:
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self._random.random() < self.failure_rate:
+            return {"error": f"Connection refused by {self.params['host']}", "timestamp": datetime.utcnow()}
+        return {
+            "cpu_usage": self._random.uniform(5, 99),
+            "memory_usage": self._random.uniform(10, 95),
+            "disk_usage": self._random.uniform(10, 95),
+            "connections_count": self._random.randint(1, 200),
+            "query_latency": self._random.uniform(1, 800),
+            "active_transactions": self._random.randint(0, 50),
+            "timestamp": datetime.utcnow()
+        }
+
+def fake_collector_factory(profiles, pass_counter):
+    """`get_collector` replacement; outcomes depend only on target and pass number"""
+    def get_collector(db_type: str, params: Dict[str, Any]) -> FakeCollector:
+        seed = zlib.crc32(f"{params['host']}#{pass_counter.value}".encode())
+        return FakeCollector(db_type, params, profiles[db_type.lower()], seed)
+    return get_collector
+
+def _setup_database(path, targets, write_counter):
+    from app.database import Base
+    import app.modules.backups.models  # noqa: F401
+    import app.modules.coordination.models  # noqa: F401
+    from app.modules.monitoring.models import DatabaseConnection
+
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_writes(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            with write_counter.get_lock():
+                write_counter.value += 1
+
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    try:
+        db.bulk_save_objects([
+            DatabaseConnection(
+                id=index,
+                name=f"target-{index}",
+                host=f"target-{index}.bench",
+                port=3306,
+                db_type=DB_TYPES[index % len(DB_TYPES)],
+                username="bench",
+                password="bench"
+            )
+            for index in range(1, targets + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return factory
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux; children covers the worker shards
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / 1024, 1)
+
+def _run_scenario(engine_name, targets, passes, profiles, processes, results):
+    from app.modules.coordination.service import elector
+    from app.modules.monitoring import scheduler, worker
+
+    context = multiprocessing.get_context("fork")
+    write_counter = context.Value("l", 0)
+    pass_counter = context.Value("l", 0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        factory = _setup_database(os.path.join(directory, "central.db"), targets, write_counter)
+        scheduler.SessionLocal = factory
+        worker.SessionLocal = factory
+        scheduler.get_collector = worker.get_collector = fake_collector_factory(profiles, pass_counter)
+        elector._expires[worker.COLLECTOR_LEASE] = time.monotonic() + 86400
+
+        collector = None
+        if engine_name == "worker":
+            collector = worker.CollectorWorker(processes=processes)
+            run_pass = collector.run_cycle
+        else:
+            run_pass = scheduler.collect_metrics_job
+
+        durations = []
+        writes_before = write_counter.value
+        try:
+            for number in range(passes):
+                pass_counter.value = number
+                started = time.perf_counter()
+                run_pass()
+                durations.append(time.perf_counter() - started)
+        finally:
+            if collector is not None:
+                collector.shutdown()
+        writes = write_counter.value - writes_before
+
+    duration = sum(durations) / len(durations)
+    results.put({
+        "engine": engine_name,
+        "targets": targets,
+        "passes": passes,
+        "pass_duration_s": round(duration, 4),
+        "targets_per_s": round(targets / duration, 1) if duration else None,
+        "db_writes_per_pass": round(writes / passes, 1),
+        "peak_rss_mb": _peak_rss_mb()
+    })
+
+def run_scenario(engine_name="job", targets=100, passes=3, profiles=None, processes=None):
+    """Run one scenario in a fresh process and return its measurements"""
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    process = context.Process(
+        target=_run_scenario,
+        args=(engine_name, targets, passes, profiles or DEFAULT_PROFILES,
+              processes or os.cpu_count() or 2, results)
+    )
+    process.start()
+    while True:
+        try:
+            result = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"Scenario {engine_name}/{targets} exited with code {process.exitcode}")
+    process.join()
+    return result
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(result, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    List regressions of a result against the matching baseline entry:
+    slower passes beyond `tolerance`, or more DB writes per pass.
+    """
+    reference = next((entry for entry in baseline["results"]
+                      if entry["engine"] == result["engine"] and entry["targets"] == result["targets"]), None)
+    if reference is None:
+        return []
+    regressions = []
+    if result["pass_duration_s"] > reference["pass_duration_s"] * tolerance:
+        regressions.append(
+            f"{result['engine']}/{result['targets']}: pass took {result['pass_duration_s']}s "
+            f"(baseline {reference['pass_duration_s']}s)"
+        )
+    if result["db_writes_per_pass"] > reference["db_writes_per_pass"]:
+        regressions.append(
+            f"{result['engine']}/{result['targets']}: {result['db_writes_per_pass']} writes per pass "
+            f"(baseline {reference['db_writes_per_pass']})"
+        )
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark metric collection passes")
+    parser.add_argument("--targets", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--engines", nargs="+", default=["job", "worker"], choices=["job", "worker"])
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=None, help="Override latency of every profile (seconds)")
+    parser.add_argument("--jitter", type=float, default=None, help="Override jitter of every profile (seconds)")
+    parser.add_argument("--failure-rate", type=float, default=None, help="Override failure rate of every profile")
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    profiles = {
+        db_type: (
+            profile[0] if args.latency is None else args.latency,
+            profile[1] if args.jitter is None else args.jitter,
+            profile[2] if args.failure_rate is None else args.failure_rate,
+        )
+        for db_type, profile in DEFAULT_PROFILES.items()
+    }
+
+    results = []
+    for engine_name in args.engines:
+        for targets in args.targets:
+            result = run_scenario(engine_name, targets, args.passes, profiles, args.processes)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.write_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"profiles": profiles, "cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+            f.write("\n")
+
+    if args.check:
+        baseline = load_baseline()
+        regressions = [message for result in results for message in compare(result, baseline, args.tolerance)]
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
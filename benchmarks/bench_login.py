@@ -0,0 +1,88 @@
+"""
+Login throughput benchmark.
+
+Runs bursts of concurrent password verifications, as `login_for_access_token`
+does, either inline on the event loop (the former behaviour) or through the
+bounded hashing pool of `app.utils.security`. A heartbeat coroutine ticking
+every 10 ms measures how long other requests would have been stalled.
+
+Usage:
+    python -m benchmarks.bench_login --logins 32 --rounds 12
+    python -m benchmarks.bench_login --modes pool --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils import security
+
+HEARTBEAT_INTERVAL = 0.01
+
+async def _heartbeat(stop: asyncio.Event, delays: list):
+    """Records how late each tick runs compared to its schedule"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + HEARTBEAT_INTERVAL
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        delays.append(max(0.0, loop.time() - expected))
+
+async def _burst(mode: str, logins: int, hashed: str) -> dict:
+    stop = asyncio.Event()
+    delays = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, delays))
+    await asyncio.sleep(0)
+
+    async def login():
+        if mode == "inline":
+            return security.verify_and_update("correct horse", hashed)
+        return await security.verify_and_update_async("correct horse", hashed)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[login() for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+
+    assert all(valid for valid, _ in results)
+    return {
+        "logins_per_sec": round(logins / elapsed, 2),
+        "elapsed_s": round(elapsed, 3),
+        "max_loop_stall_ms": round(max(delays, default=elapsed) * 1000, 1),
+    }
+
+def run(modes, logins, rounds, workers):
+    hashed = security.hash_password("correct horse", rounds=rounds)
+    results = []
+    for mode in modes:
+        for count in (workers if mode == "pool" else [None]):
+            if count is not None:
+                security.shutdown_executor()
+                security._executor = ThreadPoolExecutor(max_workers=count, thread_name_prefix="password-hash")
+            result = {"mode": mode, "workers": count, "logins": logins, "rounds": rounds,
+                      **asyncio.run(_burst(mode, logins, hashed))}
+            results.append(result)
+            print(json.dumps(result))
+    security.shutdown_executor()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark login password verification")
+    parser.add_argument("--logins", type=int, default=32, help="Concurrent logins per burst")
+    parser.add_argument("--rounds", type=int, default=security.BCRYPT_ROUNDS)
+    parser.add_argument("--modes", nargs="+", choices=["inline", "pool"], default=["inline", "pool"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[security.PASSWORD_HASH_WORKERS])
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.modes, args.logins, args.rounds, args.workers)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+# Tous les modèles: leurs relations se référencent d'un module à l'autre
+import app.modules.users.models  # noqa: F401
+import app.modules.monitoring.models  # noqa: F401
+import app.modules.backups.models  # noqa: F401
+import app.modules.coordination.models  # noqa: F401
+
+@pytest.fixture
+def db_engine():
+    """Base SQLite en mémoire avec le schéma complet, partagée entre threads"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(db_engine):
+    """Session sur la base de test; les modules de test la complètent en redéfinissant `db(db)`"""
+    session = sessionmaker(bind=db_engine)()
+    yield session
+    session.close()
@@ -0,0 +1,194 @@
+import pytest
+from pymysql.converters import escape_string
+
+from app.adapters import ddl
+from app.adapters.mysql_adapter import MySQLAdapter
+
+class FakeMySQLConnection:
+    """Connexion multi-instructions simulée: échoue sur les comptes déjà existants et les GRANT refusés"""
+
+    def __init__(self, existing=(), denied_grants=()):
+        self.existing = set(existing)
+        self.denied_grants = set(denied_grants)
+        self.queries = []
+
+    def escape(self, value):
+        return "'" + escape_string(value) + "'"
+
+    def cursor(self):
+        return FakeMySQLCursor(self)
+
+class FakeMySQLCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _run(self, statement):
+        if statement.startswith("CREATE USER"):
+            account = statement.split()[2]
+            if account in self.connection.existing:
+                raise RuntimeError(f"Operation CREATE USER failed for {account}")
+            self.connection.existing.add(account)
+        elif statement.startswith("GRANT"):
+            account = statement.split(" TO ")[1].split()[0]
+            if account in self.connection.denied_grants:
+                raise RuntimeError(f"Access denied for GRANT to {account}")
+        elif statement.startswith("DROP USER IF EXISTS"):
+            self.connection.existing.discard(statement.split()[4])
+
+    def execute(self, query):
+        self.connection.queries.append(query)
+        statements = query.split(";\n")
+        self._run(statements[0])
+        self.pending = statements[1:]
+
+    def nextset(self):
+        if not self.pending:
+            return None
+        self._run(self.pending.pop(0))
+        return True
+
+class FakeVar:
+    def __init__(self):
+        self.value = None
+
+    def getvalue(self):
+        return self.value
+
+class FakeOracleCursor:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def var(self, type_):
+        return FakeVar()
+
+    def execute(self, sql, binds):
+        self.calls.append((sql, binds))
+        # Le serveur renseigne l'erreur du sous-bloc en échec
+        for name, value in binds.items():
+            if name.startswith("u") and value == "taken":
+                binds[f"e{name[1:]}"].value = "ORA-01920: user name conflicts with another user or role name"
+
+class FakeOracleConnection:
+    def __init__(self):
+        self.calls = []
+
+    def cursor(self):
+        return FakeOracleCursor(self.calls)
+
+@pytest.mark.parametrize("name", ["", "a b", "x'; DROP USER root; --", "é", "a" * 33, None])
+def test_invalid_mysql_usernames_are_rejected(name):
+    with pytest.raises(ValueError):
+        ddl.validate_identifier(name)
+
+def test_oracle_identifiers():
+    assert ddl.validate_identifier("APP_USER$1", ddl.ORACLE_IDENTIFIER_PATTERN) == "APP_USER$1"
+    for name in ["1abc", "app-user", 'a"b']:
+        with pytest.raises(ValueError):
+            ddl.validate_identifier(name, ddl.ORACLE_IDENTIFIER_PATTERN)
+
+def test_mysql_statements_quote_values_through_the_driver():
+    statements = ddl.mysql_create_user_statements(FakeMySQLConnection(), "alice", "p'w\\d", ["read_only", "unknown"])
+    assert statements == [
+        "CREATE USER 'alice'@'%' IDENTIFIED BY 'p\\'w\\\\d'",
+        "GRANT SELECT ON *.* TO 'alice'@'%'",
+    ]
+
+def test_mysql_users_are_created_in_one_round_trip_without_flush():
+    adapter = MySQLAdapter("h", 3306, "root", "p", "app")
+    adapter.connection = FakeMySQLConnection()
+    users = [{"username": f"u{i}", "password": "pw", "roles": ["admin", "read_only"]} for i in range(10)]
+
+    results = adapter.create_users(users)
+
+    assert all(success for _, success, _ in results)
+    assert len(adapter.connection.queries) == 1
+    assert "FLUSH" not in adapter.connection.queries[0]
+
+def test_mysql_batch_resumes_after_failing_user():
+    adapter = MySQLAdapter("h", 3306, "root", "p", "app")
+    adapter.connection = FakeMySQLConnection(existing={"'u1'@'%'"})
+    users = [{"username": name, "password": "pw", "roles": ["read_only"]} for name in ["u0", "u1", "bad name", "u2"]]
+
+    results = adapter.create_users(users)
+
+    assert [(name, success) for name, success, _ in results] == [
+        ("u0", True), ("u1", False), ("bad name", False), ("u2", True)
+    ]
+    assert "u1" in results[1][2] and "Invalid identifier" in results[2][2]
+    # Le lot est renvoyé à partir de l'utilisateur suivant l'échec, le nom invalide n'est jamais envoyé
+    assert len(adapter.connection.queries) == 2
+    assert adapter.connection.queries[1].startswith("CREATE USER 'u2'")
+    assert all("bad name" not in query for query in adapter.connection.queries)
+
+def test_mysql_users_fail_cleanly_without_connection(monkeypatch):
+    """Connexion impossible: un échec par utilisateur, sans exception"""
+    adapter = MySQLAdapter("127.0.0.1", 1, "root", "p", "app")
+    monkeypatch.setattr(adapter, "connect", lambda: False)
+
+    results = adapter.create_users([{"username": "u0", "password": "pw"}, {"username": "u1", "password": "pw"}])
+
+    assert results == [("u0", False, "Connexion MySQL indisponible"), ("u1", False, "Connexion MySQL indisponible")]
+    assert adapter.create_user("u0", "pw") is False
+    assert adapter.delete_user("u0") is False
+
+def test_mysql_user_is_dropped_when_a_grant_fails():
+    """Un compte créé dont un GRANT échoue est supprimé: la nouvelle tentative aboutit"""
+    adapter = MySQLAdapter("h", 3306, "root", "p", "app")
+    adapter.connection = FakeMySQLConnection(existing={"'taken'@'%'"}, denied_grants={"'u1'@'%'"})
+    users = [{"username": name, "password": "pw", "roles": ["read_only"]} for name in ["u0", "u1", "taken", "u2"]]
+
+    results = adapter.create_users(users)
+
+    assert [success for _, success, _ in results] == [True, False, False, True]
+    assert "Access denied" in results[1][2]
+    assert "DROP USER IF EXISTS 'u1'@'%'" in adapter.connection.queries
+    # Un compte préexistant (CREATE USER en échec) n'est jamais supprimé
+    assert adapter.connection.existing == {"'u0'@'%'", "'taken'@'%'", "'u2'@'%'"}
+
+    adapter.connection.denied_grants.clear()
+    assert adapter.create_users(users[1:2])[0][1] is True
+
+def test_oracle_block_drops_user_created_before_a_failing_grant():
+    statements, _ = ddl.oracle_create_user_statements(0, "alice", "pw", ["read_only"])
+    drop, _ = ddl.oracle_drop_user_statements(0, "alice")
+
+    block = ddl.oracle_block([(0, statements)], undo={0: drop})
+
+    lines = [line.strip() for line in block.splitlines()]
+    # L'annulation n'a lieu qu'une fois le CREATE USER passé
+    assert lines.index("started := TRUE;") == lines.index(f"EXECUTE IMMEDIATE {statements[0]};") + 1
+    handler = lines.index("EXCEPTION WHEN OTHERS THEN :e0 := SQLERRM;")
+    assert lines[handler + 1] == "IF started THEN"
+    assert f"EXECUTE IMMEDIATE {drop[0]};" in lines[handler + 1:]
+
+def test_oracle_batch_is_one_plsql_block_with_bound_names():
+    connection = FakeOracleConnection()
+    groups, binds = [], {}
+    for key, name in enumerate(["alice", "taken", "bob"]):
+        statements, variables = ddl.oracle_create_user_statements(key, name, 'pw"', ["read_only"])
+        groups.append((key, statements))
+        binds.update(variables)
+
+    results = ddl.execute_oracle_batch(connection, groups, binds)
+
+    assert len(connection.calls) == 1
+    sql, sent = connection.calls[0]
+    assert "alice" not in sql and 'pw"' not in sql
+    assert sql.count("EXCEPTION WHEN OTHERS") == 3
+    assert "DBMS_ASSERT.ENQUOTE_NAME(:p1, FALSE)" in sql
+    assert sent["u0"] == "alice" and sent["p2"] == 'pw"'
+    assert results[0] == (True, None) and results[2] == (True, None)
+    assert results[1][0] is False and "ORA-01920" in results[1][1]
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from benchmarks.bench_analyzer import GOLDEN_PATH, golden_outputs
+
+# Écart relatif admis sur les flottants: ordre des opérations seulement
+FLOAT_TOLERANCE = 1e-9
+
+def assert_close(actual, expected, path="golden"):
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and actual.keys() == expected.keys(), path
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(actual) == len(expected), path
+        for index, (got, want) in enumerate(zip(actual, expected)):
+            assert_close(got, want, f"{path}[{index}]")
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=FLOAT_TOLERANCE, abs=FLOAT_TOLERANCE), path
+    else:
+        assert actual == expected, path
+
+def test_analyzer_matches_golden_outputs():
+    """L'analyseur produit les résultats de référence sur les historiques générés."""
+    with open(GOLDEN_PATH) as f:
+        expected = json.load(f)
+    # Aller-retour JSON pour comparer des types identiques (tuples, clés)
+    actual = json.loads(json.dumps(golden_outputs()))
+    assert_close(actual, expected)
@@ -0,0 +1,49 @@
+import gzip
+import hashlib
+
+from app.utils.helpers import HashingWriter, verify_archive
+
+def write_archive(path, payload):
+    """Écrit une archive gzip en calculant son empreinte à la volée."""
+    with open(path, 'wb') as raw_file:
+        writer = HashingWriter(raw_file, "sha256")
+        with gzip.GzipFile(fileobj=writer, mode='wb') as output:
+            output.write(payload)
+    return writer
+
+def test_streaming_checksum_matches_file(tmp_path):
+    """L'empreinte calculée pendant l'écriture correspond au fichier final."""
+    archive = tmp_path / "dump.sql.gz"
+    writer = write_archive(archive, b"INSERT INTO t VALUES (1);\n" * 1000)
+
+    assert writer.hexdigest() == hashlib.sha256(archive.read_bytes()).hexdigest()
+    assert writer.bytes_written == archive.stat().st_size
+
+def test_verify_valid_archive(tmp_path):
+    """Une archive intacte est validée."""
+    archive = tmp_path / "dump.sql.gz"
+    writer = write_archive(archive, b"CREATE TABLE t (id INT);\n")
+
+    result = verify_archive(str(archive), expected_checksum=writer.hexdigest())
+    assert result["valid"] is True
+
+def test_verify_detects_corruption(tmp_path):
+    """Un octet modifié est détecté par l'empreinte ou la décompression."""
+    archive = tmp_path / "dump.sql.gz"
+    writer = write_archive(archive, b"SELECT 1;\n" * 5000)
+
+    data = bytearray(archive.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    archive.write_bytes(bytes(data))
+
+    result = verify_archive(str(archive), expected_checksum=writer.hexdigest())
+    assert result["valid"] is False
+
+def test_verify_detects_truncation(tmp_path):
+    """Une archive tronquée est signalée même sans empreinte attendue."""
+    archive = tmp_path / "dump.sql.gz"
+    write_archive(archive, b"SELECT 1;\n" * 5000)
+    archive.write_bytes(archive.read_bytes()[:-20])
+
+    result = verify_archive(str(archive))
+    assert result["valid"] is False
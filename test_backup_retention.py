@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from app.modules.backups.models import Backup, BackupStatus
+from app.modules.backups.retention import select_gfs_keep
+from app.modules.backups.service import _bulk_delete_backups
+
+def test_gfs_keeps_latest_per_day_week_and_month():
+    """La rotation GFS garde la plus récente de chaque période retenue."""
+    now = datetime(2024, 3, 31, 23, 0)
+    backups = [(i, now - timedelta(hours=12 * i)) for i in range(120)]
+
+    keep = select_gfs_keep(backups, daily=3, weekly=2, monthly=2)
+
+    # 3 derniers jours: 31/03 23h, 30/03 23h, 29/03 23h
+    assert {0, 2, 4} <= keep
+    # Semaine ISO précédente (se termine le dimanche 24/03 à 23h)
+    assert 14 in keep
+    # Mois précédent: dernière sauvegarde de février
+    assert (now - timedelta(hours=12 * 62)).month == 2 and 62 in keep
+    assert len(keep) == 5
+
+def test_gfs_always_keeps_newest():
+    """Sans politique, seule la sauvegarde la plus récente est conservée."""
+    now = datetime.now()
+    assert select_gfs_keep([(1, now - timedelta(days=1)), (2, now)]) == {2}
+
+def test_bulk_delete_returns_file_paths(db):
+    """La suppression en masse ne touche que les lignes ciblées et retourne leurs fichiers."""
+    now = datetime.now()
+    db.add_all([
+        Backup(id=1, database_id=1, status=BackupStatus.COMPLETED, file_path="/b/old.sql.gz",
+               completed_at=now - timedelta(days=40), retention_days=30),
+        Backup(id=2, database_id=1, status=BackupStatus.COMPLETED, file_path="/b/new.sql.gz",
+               completed_at=now, retention_days=30),
+    ])
+    db.commit()
+
+    expired = _bulk_delete_backups(db, Backup.completed_at < now - timedelta(days=30))
+
+    assert expired == [(1, "/b/old.sql.gz", None)]
+    assert [backup.id for backup in db.query(Backup).all()] == [2]
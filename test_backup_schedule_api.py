@@ -0,0 +1,66 @@
+import pytest
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from fastapi import FastAPI
+from sqlalchemy.orm import sessionmaker
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.modules.backups import router, scheduler
+from app.modules.backups.models import BackupSchedule, BackupType
+from app.modules.monitoring.models import DatabaseConnection
+
+@pytest.fixture
+def client(db, db_engine, monkeypatch):
+    db.add(DatabaseConnection(id=1, name="db1", host="h", port=3306, db_type="MySQL", username="u", password="p"))
+    db.commit()
+    factory = sessionmaker(bind=db_engine)
+    monkeypatch.setattr(scheduler, "SessionLocal", factory)
+    # Planificateur en pause: les tâches sont enregistrées sans s'exécuter
+    backup_scheduler = BackgroundScheduler(jobstores={"default": MemoryJobStore(), "backups": MemoryJobStore()})
+    backup_scheduler.start(paused=True)
+    monkeypatch.setattr(scheduler, "_scheduler", backup_scheduler)
+
+    def override_db():
+        session = factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(router.router)
+    app.dependency_overrides[get_db] = override_db
+    yield TestClient(app), backup_scheduler
+    backup_scheduler.shutdown(wait=False)
+
+def test_created_schedule_is_registered_with_the_scheduler(client, db):
+    """Un planning créé avec les valeurs par défaut est enregistré et planifié aussitôt"""
+    http, backup_scheduler = client
+    response = http.post("/sauvegarde/schedules", json={"database_id": 1, "name": "nightly", "frequency": "0 2 * * *"})
+
+    assert response.status_code == 200, response.text
+    schedule_id = response.json()["id"]
+    assert response.json()["backup_type"] == "full"
+    assert db.get(BackupSchedule, schedule_id).backup_type is BackupType.FULL
+    job = backup_scheduler.get_job(f"{scheduler.JOB_PREFIX}{schedule_id}", jobstore="backups")
+    assert job is not None and job.name == "nightly"
+
+def test_unknown_backup_type_is_rejected(client):
+    http, _ = client
+    response = http.post("/sauvegarde/schedules",
+                         json={"database_id": 1, "name": "n", "frequency": "0 2 * * *", "backup_type": "weekly"})
+    assert response.status_code == 400
+
+    schedule_id = http.post("/sauvegarde/schedules",
+                            json={"database_id": 1, "name": "n", "frequency": "0 2 * * *"}).json()["id"]
+    response = http.put(f"/sauvegarde/schedules/{schedule_id}", json={"backup_type": "weekly"})
+    assert response.status_code == 400
+    assert http.put(f"/sauvegarde/schedules/{schedule_id}", json={"backup_type": "incremental"}).status_code == 200
+
+def test_backup_with_unknown_type_is_rejected(client):
+    http, _ = client
+    response = http.post("/sauvegarde/backups", json={"database_id": 1, "backup_type": "weekly"})
+    assert response.status_code == 400
@@ -0,0 +1,32 @@
+import pickle
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.modules.backups.scheduler import OffsetCronTrigger, build_trigger
+
+def test_offset_trigger_shifts_fire_time():
+    """Le déclencheur décalé s'exécute au créneau cron plus son décalage."""
+    trigger = OffsetCronTrigger.from_crontab("0 0 * * *")
+    trigger.offset = 300
+    now = datetime(2024, 1, 1, 0, 2, tzinfo=trigger.timezone)
+
+    # Minuit + 5 min n'est pas encore passé: exécution le jour même
+    assert trigger.get_next_fire_time(None, now) == datetime(2024, 1, 1, 0, 5, tzinfo=trigger.timezone)
+    fired = datetime(2024, 1, 1, 0, 5, tzinfo=trigger.timezone)
+    following = trigger.get_next_fire_time(fired, fired)
+    assert following == datetime(2024, 1, 2, 0, 5, tzinfo=trigger.timezone)
+
+def test_schedules_sharing_a_slot_are_spread():
+    """Des plannings identiques reçoivent des décalages stables et différents."""
+    offsets = [build_trigger(SimpleNamespace(id=i, frequency="0 0 * * *")).offset for i in range(1, 20)]
+    assert len(set(offsets)) > 10
+    assert offsets == [build_trigger(SimpleNamespace(id=i, frequency="0 0 * * *")).offset for i in range(1, 20)]
+    # Le décalage reste inférieur à la moitié de la période
+    assert build_trigger(SimpleNamespace(id=7, frequency="*/2 * * * *")).offset < 60
+
+def test_offset_survives_job_store_pickling():
+    """Le décalage est conservé par le stockage persistant des tâches."""
+    trigger = build_trigger(SimpleNamespace(id=3, frequency="30 2 * * 1"))
+    restored = pickle.loads(pickle.dumps(trigger))
+    assert restored.offset == trigger.offset
+    assert str(restored) == str(trigger)
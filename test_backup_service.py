@@ -0,0 +1,89 @@
+import hashlib
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.modules.backups import service
+from app.modules.backups.models import Backup, BackupStatus, RestoreJob
+from app.modules.backups.schemas import BackupCreate, RestoreJobResponse
+from app.modules.monitoring.models import DatabaseConnection
+
+class FakeAdapter:
+    """Adaptateur dont la sauvegarde réussit sauf pour la base « down »"""
+    supports_storage = False
+    storage = None
+
+    calls = []
+
+    def __init__(self, name):
+        self.name = name
+
+    def backup(self, destination_path, backup_type="full", **options):
+        FakeAdapter.calls.append((destination_path, backup_type))
+        if self.name == "down":
+            return {'status': 'error', 'message': "Connection refused"}
+        return {'status': 'success', 'path': f"{destination_path}.sql.gz", 'size': 10,
+                'checksum': "0" * 64, 'checksum_algorithm': "sha256"}
+
+@pytest.fixture
+def db(db, db_engine, monkeypatch, tmp_path):
+    db.add_all([
+        DatabaseConnection(id=i, name=name, host="h", port=3306, db_type="MySQL", username="u", password="p")
+        for i, name in [(1, "db1"), (2, "down")]
+    ])
+    db.add_all([Backup(id=i, database_id=i, status=BackupStatus.RUNNING) for i in (1, 2)])
+    db.commit()
+    names = {1: "db1", 2: "down"}
+    monkeypatch.setattr(service, "SessionLocal", sessionmaker(bind=db_engine))
+    monkeypatch.setattr(service, "get_adapter_for_database", lambda db_id: FakeAdapter(names[db_id]))
+    monkeypatch.setattr(service, "BACKUP_ROOT", str(tmp_path))
+    FakeAdapter.calls.clear()
+    return db
+
+def test_backup_outcome_is_stored_as_enum(db):
+    """Le statut final est celui de l'énumération, retrouvé par les filtres du vérificateur et de la rétention"""
+    service.execute_backup(1)
+    service.execute_backup(2)
+
+    db.expire_all()
+    assert [backup.id for backup in db.query(Backup).filter(Backup.status == BackupStatus.COMPLETED)] == [1]
+    assert [backup.id for backup in db.query(Backup).filter(Backup.status == BackupStatus.FAILED)] == [2]
+    assert db.execute(text("SELECT status FROM backups ORDER BY id")).scalars().all() == ["COMPLETED", "FAILED"]
+
+def test_adapter_receives_the_backup_type_as_a_string(db):
+    """Le type transmis à l'adaptateur est la valeur de l'énumération (« incremental »)"""
+    backup = service.create_backup(db, BackupCreate(database_id=1, backup_type="incremental"))
+    service.execute_backup(backup.id)
+
+    path, backup_type = FakeAdapter.calls[-1]
+    assert backup_type == "incremental" and type(backup_type) is str
+    assert path.endswith("_incremental")
+
+def test_mongodump_archive_is_verified_without_gzip_decoding(db, tmp_path):
+    """Une archive mongodump (non gzip) intacte n'est pas marquée corrompue"""
+    archive = tmp_path / "mongo.archive.gz"
+    archive.write_bytes(b"\x6d\xe2\x99\x81" + b"mongodump archive" * 100)
+    db.add(DatabaseConnection(id=3, name="mongo", host="h", port=27017, db_type="MongoDB", username="u", password="p"))
+    db.add(Backup(id=3, database_id=3, status=BackupStatus.COMPLETED, file_path=str(archive),
+                  checksum=hashlib.sha256(archive.read_bytes()).hexdigest(), checksum_algorithm="sha256"))
+    db.commit()
+
+    result = service.verify_backup(3, max_bytes_per_sec=None)
+
+    assert result["valid"] is True
+    db.expire_all()
+    backup = db.get(Backup, 3)
+    assert backup.status == BackupStatus.COMPLETED and backup.verified_at is not None
+
+def test_restore_job_outlives_its_swept_backup(db):
+    """Une restauration dont la sauvegarde a été supprimée reste lisible"""
+    job = RestoreJob(id=1, backup_id=None, target_database_id=1, status=BackupStatus.COMPLETED,
+                     workers=1, started_at=datetime(2024, 3, 1, 12, 0))
+    db.add(job)
+    db.commit()
+
+    response = RestoreJobResponse.model_validate(job, from_attributes=True)
+
+    assert response.backup_id is None
@@ -0,0 +1,56 @@
+import hashlib
+import sys
+
+import pytest
+
+from app.adapters.base import DatabaseAdapter
+from app.modules.backups.storage import S3_MIN_PART_SIZE, S3Storage
+from app.utils.helpers import verify_archive
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+PAYLOAD_SCRIPT = "import os, sys; sys.stdout.buffer.write(os.urandom(12 * 1024 * 1024))"
+
+@pytest.fixture
+def s3_storage():
+    """Stockage S3 simulé par moto, parts de taille minimale."""
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="backups")
+        yield S3Storage("backups", prefix="platform", client=client,
+                        part_size=S3_MIN_PART_SIZE, range_size=1024 * 1024)
+
+@pytest.fixture
+def adapter(s3_storage, tmp_path):
+    adapter = DatabaseAdapter({}, str(tmp_path))
+    adapter.storage = s3_storage
+    return adapter
+
+def test_multipart_upload_then_ranged_read(adapter, s3_storage):
+    """Un dump est envoyé en plusieurs parts puis relu par plages sans modification."""
+    location = s3_storage.location("mysql/db_full.raw")
+
+    info = adapter.stream_command_to_file([sys.executable, "-c", PAYLOAD_SCRIPT], location, compress=False)
+
+    head = s3_storage.client.head_object(Bucket="backups", Key=location)
+    assert head["ContentLength"] == info["size"] == 12 * 1024 * 1024
+    # 12 Mo envoyés en trois parts de 5 Mo maximum
+    assert head["ETag"].strip('"').endswith("-3")
+
+    with s3_storage.open_read(location) as reader:
+        assert hashlib.sha256(reader.read()).hexdigest() == info["checksum"]
+    result = verify_archive(location, expected_checksum=info["checksum"], decompress=False,
+                            opener=s3_storage.open_read)
+    assert result["valid"]
+
+def test_failed_dump_aborts_upload(adapter, s3_storage):
+    """Un dump en échec n'est pas publié et son envoi multipart est annulé."""
+    location = s3_storage.location("mysql/broken.raw")
+    script = PAYLOAD_SCRIPT + "; sys.exit(2)"
+
+    with pytest.raises(Exception):
+        adapter.stream_command_to_file([sys.executable, "-c", script], location, compress=False)
+
+    assert not s3_storage.exists(location)
+    assert s3_storage.client.list_multipart_uploads(Bucket="backups").get("Uploads", []) == []
@@ -0,0 +1,68 @@
+import gzip
+import hashlib
+import subprocess
+import sys
+
+import pytest
+
+from app.adapters.base import DatabaseAdapter
+from app.adapters.mysql_adapter import MySQLAdapter
+
+PAYLOAD_SCRIPT = "import sys; sys.stdout.buffer.write(b'INSERT INTO t VALUES (42);\\n' * 20000)"
+
+@pytest.fixture
+def adapter(tmp_path):
+    """Adaptateur de base suffisant pour les flux dump/restauration."""
+    return DatabaseAdapter({}, str(tmp_path))
+
+def test_dump_then_restore_stream(adapter, tmp_path):
+    """Une archive produite en flux est restaurée en flux sans être modifiée."""
+    archive = tmp_path / "dump.sql.gz"
+    restored = tmp_path / "restored.sql"
+
+    info = adapter.stream_command_to_file([sys.executable, "-c", PAYLOAD_SCRIPT], str(archive))
+    archive_bytes = archive.read_bytes()
+    assert info["size"] == len(archive_bytes)
+
+    consumed = []
+    copy_script = f"import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open({str(restored)!r}, 'wb'))"
+    adapter.stream_file_to_command(str(archive), [sys.executable, "-c", copy_script], progress=consumed.append)
+
+    assert restored.read_bytes() == b"INSERT INTO t VALUES (42);\n" * 20000
+    assert sum(consumed) == len(archive_bytes)
+    # L'archive compressée est conservée intacte
+    assert archive.read_bytes() == archive_bytes
+
+def test_restore_stream_reports_command_failure(adapter, tmp_path):
+    """Un échec du client de restauration est remonté."""
+    archive = tmp_path / "dump.sql.gz"
+    adapter.stream_command_to_file([sys.executable, "-c", PAYLOAD_SCRIPT], str(archive))
+
+    with pytest.raises(subprocess.CalledProcessError):
+        adapter.stream_file_to_command(str(archive), [sys.executable, "-c", "import sys; sys.exit(3)"])
+
+DUMP_SCRIPT = r"""
+import sys
+out = sys.stdout.buffer
+out.write(b"/*!40101 SET NAMES utf8mb4 */;\n")
+for table in (b"orders", b"odd``name"):
+    out.write(b"\n--\n-- Dumping data for table `" + table + b"`\n--\n\n")
+    out.write(b"INSERT INTO `" + table + b"` VALUES (1),(2);\n")
+"""
+
+def test_single_snapshot_dump_is_split_per_table(tmp_path):
+    """Un seul dump des données est découpé en une archive par table, avec l'en-tête de session."""
+    adapter = MySQLAdapter("h", 3306, "root", "p", "app")
+    tables = adapter._stream_table_data([sys.executable, "-c", DUMP_SCRIPT], str(tmp_path), "sha256")
+
+    assert [table["name"] for table in tables] == ["orders", "odd`name"]
+    first = gzip.decompress((tmp_path / tables[0]["file"]).read_bytes())
+    assert first.startswith(b"/*!40101 SET NAMES utf8mb4 */;\n")
+    assert b"INSERT INTO `orders`" in first and b"odd" not in first
+    assert tables[1]["checksum"] == hashlib.sha256((tmp_path / tables[1]["file"]).read_bytes()).hexdigest()
+
+def test_split_dump_reports_failure(tmp_path):
+    """Un mysqldump en échec fait échouer la sauvegarde découpée."""
+    adapter = MySQLAdapter("h", 3306, "root", "p", "app")
+    with pytest.raises(subprocess.CalledProcessError):
+        adapter._stream_table_data([sys.executable, "-c", DUMP_SCRIPT + "\nsys.exit(2)"], str(tmp_path), "sha256")
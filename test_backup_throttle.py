@@ -0,0 +1,35 @@
+import time
+
+from app.modules.backups.executor import AdaptiveThrottle
+from app.utils.helpers import RateLimiter
+
+def test_rate_limiter_paces_bytes():
+    """Le limiteur étale les blocs selon le débit autorisé."""
+    limiter = RateLimiter(max_bytes_per_sec=10_000)
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.consume(1_000)
+    assert time.monotonic() - started >= 0.3
+
+def test_rate_limiter_disabled_without_limits():
+    """Sans limite configurée, aucun délai n'est imposé."""
+    limiter = RateLimiter()
+    started = time.monotonic()
+    for _ in range(1000):
+        limiter.consume(1024 * 1024)
+    assert time.monotonic() - started < 0.1
+
+def test_adaptive_throttle_follows_target_load():
+    """Le facteur baisse quand la base est chargée et remonte ensuite."""
+    load = {"overloaded": True}
+    throttle = AdaptiveThrottle(lambda: load["overloaded"], max_bytes_per_sec=10**9,
+                                check_interval=0, min_factor=0.25)
+
+    for _ in range(3):
+        throttle.consume(1)
+    assert throttle.factor == 0.25
+
+    load["overloaded"] = False
+    for _ in range(2):
+        throttle.consume(1)
+    assert throttle.factor == 1.0
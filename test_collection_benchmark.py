@@ -0,0 +1,10 @@
+from benchmarks.bench_collection import compare, load_baseline, run_scenario
+
+def test_collection_pass_against_baseline():
+    """Les passes de collecte ne régressent pas par rapport à la référence enregistrée."""
+    baseline = load_baseline()
+    for engine_name, targets in (("job", 10), ("worker", 100)):
+        result = run_scenario(engine_name, targets, passes=2, processes=1)
+        assert result["db_writes_per_pass"] > 0
+        # Tolérance large sur la durée: la machine de test n'est pas celle de la référence
+        assert compare(result, baseline, tolerance=3.0) == []
@@ -1,20 +1,42 @@
-from app.modules.monitoring.collector import DatabaseCollector
+import socket
+
+import pytest
+
+from app.modules.monitoring.collector import get_collector
 
 # Configuration de test (adapte selon tes bases)
-db_config = {
-    'db_type': 'MySQL',  # ou 'MySQL', 'Oracle'
-    'host': 'localhost',
-    'port': 3306,
-    'db_name': 'teste_db',
-    'user': 'root',  # Pour MySQL et Oracle
-    'password': ''  # Pour MySQL et Oracle
+DB_TYPE = "mysql"  # ou "mongodb", "oracle"
+CONNECTION_PARAMS = {
+    "host": "localhost",
+    "port": 3306,
+    "username": "root",  # Pour MySQL et Oracle
+    "password": "",  # Pour MySQL et Oracle
+    "database": "teste_db"
 }
 
-# Initialiser et exécuter la collecte
-collector = DatabaseCollector(db_config)
-metrics = collector.collect_metrics()
 
-# Afficher les résultats
-print("📊 Métriques collectées :")
-for key, value in metrics.items():
-    print(f"{key}: {value}")
+def _reachable(host, port):
+    try:
+        with socket.create_connection((host, port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+# Test d'intégration : nécessite une base locale joignable
+pytestmark = pytest.mark.skipif(
+    not _reachable(CONNECTION_PARAMS["host"], CONNECTION_PARAMS["port"]),
+    reason="Base de données locale injoignable",
+)
+
+def test_collect_metrics():
+    """Collecte les métriques d'une base locale."""
+    collector = get_collector(DB_TYPE, CONNECTION_PARAMS)
+    metrics = collector.collect_metrics()
+
+    # Afficher les résultats
+    print("📊 Métriques collectées :")
+    for key, value in metrics.items():
+        print(f"{key}: {value}")
+
+    assert "error" not in metrics
@@ -0,0 +1,51 @@
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.modules.monitoring import worker
+from app.modules.monitoring.models import Alert, DatabaseConnection, Metric
+
+@pytest.fixture
+def session_factory(monkeypatch, tmp_path):
+    """Base SQLite fichier partagée par le collecteur et ses processus."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'collector.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(worker, "SessionLocal", factory)
+    monkeypatch.setitem(worker.elector._expires, worker.COLLECTOR_LEASE, time.monotonic() + 300)
+    return factory
+
+def fake_collect(db_type, params):
+    if params["host"] == "down":
+        return {"error": "Connection refused", "timestamp": datetime.utcnow()}
+    return {"cpu_usage": 95.0, "memory_usage": 10.0, "connections_count": 3, "timestamp": datetime.utcnow()}
+
+def test_cycle_stores_metrics_and_alerts(session_factory, monkeypatch):
+    """Un cycle répartit les cibles entre processus qui enregistrent métriques et alertes."""
+    db = session_factory()
+    db.add_all([
+        DatabaseConnection(id=1, name="up", host="up", port=3306, db_type="MySQL", username="u", password="p"),
+        DatabaseConnection(id=2, name="down", host="down", port=3306, db_type="MySQL", username="u", password="p"),
+    ])
+    db.commit()
+    monkeypatch.setattr(worker, "collect_target", fake_collect)
+
+    collector = worker.CollectorWorker(processes=2, target_timeout=5)
+    try:
+        collector.run_cycle()
+        shard_pids = [process.pid for process, _ in collector._shards]
+        # Les processus sont conservés d'un cycle à l'autre
+        collector.run_cycle()
+        assert [process.pid for process, _ in collector._shards] == shard_pids
+    finally:
+        collector.shutdown()
+
+    assert [metric.database_id for metric in db.query(Metric).all()] == [1, 1]
+    alerts = {(alert.database_id, alert.alert_type) for alert in db.query(Alert).all()}
+    assert alerts == {(1, "high_cpu_usage"), (2, "connection_issue")}
+    assert collector.stats.cycles == 2 and collector.stats.collect_errors == 2
+    assert "collector_targets 2" in collector.stats.render()
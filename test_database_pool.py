@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app import database
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = database.build_engine(f"sqlite:///{tmp_path / 'central.db'}", pool_size=1, max_overflow=0,
+                                   pool_timeout=0.2, pool_recycle=-1)
+    yield engine
+    engine.dispose()
+
+def test_engine_uses_timed_pool(engine):
+    """Le pool est dimensionné et vérifie les connexions avant usage"""
+    assert isinstance(engine.pool, database.TimedQueuePool)
+    assert engine.pool._pre_ping is database.DB_POOL_PRE_PING
+    with engine.connect() as connection:
+        assert connection.execute(text("select 1")).scalar() == 1
+    status = database.pool_status(engine)
+    assert status["size"] == 1 and status["checked_out"] == 0
+    assert status["checkouts"] == 1
+
+def test_checkout_wait_and_timeout_are_measured(engine):
+    """L'attente d'une connexion occupée et l'expiration sont comptabilisées"""
+    held = engine.connect()
+    threading.Timer(0.05, held.close).start()
+    with engine.connect():
+        pass
+    stats = engine.pool.stats.snapshot()
+    assert stats["checkouts"] == 2
+    assert stats["max_wait_ms"] >= 40
+
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    assert engine.pool.stats.snapshot()["timeouts"] == 1
+
+def test_async_url_keeps_credentials():
+    """L'URL du moteur asynchrone ne change que le pilote"""
+    url = database.async_database_url("mysql+pymysql://admin:s3cret@db:3306/central")
+    assert url == "mysql+asyncmy://admin:s3cret@db:3306/central"
+
+@pytest.mark.parametrize("max_connections, workers", [(100, 1), (100, 4), (40, 3), (2, 1)])
+def test_sync_and_async_pools_share_the_connection_budget(max_connections, workers):
+    """Les pools synchrone et async d'un worker tiennent ensemble dans sa part de DB_MAX_CONNECTIONS"""
+    env = {key: value for key, value in os.environ.items() if not key.startswith("DB_")}
+    env.update(DB_MAX_CONNECTIONS=str(max_connections), WEB_CONCURRENCY=str(workers))
+    code = ("import json; from app import database as d; print(json.dumps([d.DB_POOL_SIZE, d.DB_MAX_OVERFLOW, "
+            "d.DB_ASYNC_POOL_SIZE, d.DB_ASYNC_MAX_OVERFLOW]))")
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    pool_size, max_overflow, async_pool_size, async_max_overflow = json.loads(result.stdout)
+    assert pool_size >= 1 and async_pool_size >= 1
+    assert pool_size + max_overflow + async_pool_size + async_max_overflow <= max(2, max_connections // workers)
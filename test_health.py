@@ -0,0 +1,161 @@
+import socket
+from types import SimpleNamespace
+
+import pytest
+
+from app.modules.monitoring.collector import MongoDBCollector, MySQLCollector
+from app.modules.users import provisioning
+from app.utils import health
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health.registry, "clock", clock)
+    monkeypatch.setattr(health.registry, "failure_threshold", 2)
+    monkeypatch.setattr(health.registry, "open_seconds", 30)
+    health.registry.reset()
+    yield clock
+    health.registry.reset()
+
+def fail():
+    raise OSError("connection refused")
+
+def attempt(key, func):
+    with health.registry.guard(key):
+        func()
+
+def test_circuit_opens_then_recovers_through_a_single_probe(clock):
+    registry = health.registry
+    for _ in range(2):
+        with pytest.raises(OSError):
+            attempt("db:3306", fail)
+    assert registry.state("db:3306") == health.OPEN
+
+    # Ouvert: aucune tentative
+    with pytest.raises(health.CircuitOpenError):
+        attempt("db:3306", lambda: pytest.fail("should not be attempted"))
+
+    # Délai écoulé: une seule sonde, les autres appelants échouent immédiatement
+    clock.now += 30
+    assert registry.allow("db:3306")
+    assert registry.state("db:3306") == health.HALF_OPEN
+    assert not registry.allow("db:3306")
+    registry.record_failure("db:3306", "still down")
+
+    # Sonde en échec: délai doublé
+    clock.now += 30
+    assert not registry.allow("db:3306")
+    clock.now += 30
+    attempt("db:3306", lambda: None)
+    assert registry.state("db:3306") == health.CLOSED
+    assert registry.snapshot()[0]["failures"] == 0
+
+def test_check_reachable_caches_success_and_fails_fast(clock, monkeypatch):
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    port = server.getsockname()[1]
+    probes = []
+    real_probe = health.tcp_probe
+    monkeypatch.setattr(health, "tcp_probe", lambda *args: probes.append(args) or real_probe(*args))
+
+    health.check_reachable("127.0.0.1", port)
+    health.check_reachable("127.0.0.1", port)
+    assert len(probes) == 1
+
+    server.close()
+    clock.now += health.registry.cache_seconds
+    for _ in range(2):
+        with pytest.raises(OSError):
+            health.check_reachable("127.0.0.1", port)
+    with pytest.raises(health.CircuitOpenError):
+        health.check_reachable("127.0.0.1", port)
+    assert len(probes) == 3
+
+def test_adapter_pool_does_not_connect_to_a_tripped_database(clock, monkeypatch):
+    connects = []
+
+    class DownAdapter:
+        def connect(self):
+            connects.append(1)
+            return False
+
+    monkeypatch.setattr(provisioning, "create_adapter", lambda database: DownAdapter())
+    pool = provisioning.AdapterPool()
+    database = SimpleNamespace(id=1, name="down", host="db", port=3306)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            with pool.acquire(database):
+                pass
+    assert len(connects) == 2
+
+def test_collector_reports_open_circuit_without_connecting(clock, monkeypatch):
+    collector = MySQLCollector("db", 3306, "root", "p", "information_schema")
+    connects = []
+    monkeypatch.setattr(collector, "connect", lambda: connects.append(1) or fail())
+
+    results = [collector.collect_metrics() for _ in range(3)]
+
+    assert all("error" in result for result in results)
+    assert "Circuit open" in results[-1]["error"]
+    assert len(connects) == 2
+
+class FakeMongoClient:
+    def __init__(self, ping_error=None, status_error=None):
+        self.ping_error = ping_error
+        self.status_error = status_error
+        self.admin = SimpleNamespace(command=self.command)
+
+    def command(self, name):
+        error = self.ping_error if name == "ping" else self.status_error
+        if error:
+            raise error
+        return {}
+
+    def __getitem__(self, name):
+        return SimpleNamespace(command=self.command)
+
+    def close(self):
+        pass
+
+@pytest.mark.parametrize("client_kwargs", [
+    {"ping_error": "auth"},
+    {"status_error": "unauthorized"},
+])
+def test_mongo_command_errors_do_not_open_the_circuit(clock, monkeypatch, client_kwargs):
+    errors = pytest.importorskip("pymongo.errors")
+    client_kwargs = {key: errors.OperationFailure(message) for key, message in client_kwargs.items()}
+    collector = MongoDBCollector("mongo", 27017, "admin", "p", "admin")
+    connects = []
+    monkeypatch.setattr(collector, "connect", lambda: connects.append(1) or FakeMongoClient(**client_kwargs))
+
+    results = [collector.collect_metrics() for _ in range(3)]
+
+    assert all("error" in result for result in results)
+    assert not any("Circuit open" in result["error"] for result in results)
+    assert len(connects) == 3
+
+def test_mongo_unreachable_server_opens_the_circuit(clock, monkeypatch):
+    errors = pytest.importorskip("pymongo.errors")
+    collector = MongoDBCollector("mongo", 27017, "admin", "p", "admin")
+    connects = []
+    timeout = errors.ServerSelectionTimeoutError("mongo:27017: timed out")
+    monkeypatch.setattr(collector, "connect", lambda: connects.append(1) or FakeMongoClient(ping_error=timeout))
+
+    results = [collector.collect_metrics() for _ in range(3)]
+
+    assert "Circuit open" in results[-1]["error"]
+    assert len(connects) == 2
+
+def test_oracle_dsn_bounds_connection_time():
+    oracle_adapter = pytest.importorskip("app.adapters.oracle_adapter")
+    dsn = oracle_adapter.oracle_dsn("db", 1521, "orcl", timeout=2.5)
+    assert "(CONNECT_TIMEOUT=3)" in dsn and "(TRANSPORT_CONNECT_TIMEOUT=3)" in dsn
+    assert "(HOST=db)(PORT=1521)" in dsn and "(SERVICE_NAME=orcl)" in dsn
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.modules.monitoring import correlation
+from app.modules.monitoring.models import DatabaseConnection, MetricRollup
+
+def test_pairwise_matrix_matches_corrcoef_per_pair():
+    """Avec des valeurs manquantes, chaque paire utilise ses points communs, comme np.corrcoef."""
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=(4, 200))
+    values[1] += values[0]
+    values[rng.random(values.shape) < 0.1] = np.nan
+
+    matrix = correlation.correlation_matrix(values)
+
+    for i in range(4):
+        for j in range(4):
+            both = ~np.isnan(values[i]) & ~np.isnan(values[j])
+            assert matrix[i, j] == pytest.approx(np.corrcoef(values[i, both], values[j, both])[0, 1], abs=1e-9)
+
+def test_database_correlations_are_cached_per_window(db):
+    """La matrice inter-bases repère les bases qui varient ensemble et est réutilisée dans la fenêtre."""
+    now = datetime(2024, 3, 1, 12, 10)
+    start = datetime(2024, 3, 1, 12) - timedelta(hours=48)
+    rng = np.random.default_rng(2)
+    shared = rng.normal(50, 10, 48)
+    series = {1: shared + rng.normal(0, 1, 48), 2: shared + rng.normal(0, 1, 48), 3: rng.normal(50, 10, 48)}
+    for database_id, values in series.items():
+        db.add(DatabaseConnection(id=database_id, name=f"db{database_id}", host="h", port=3306,
+                                  db_type="MySQL", username="u", password="p"))
+        for hour, value in enumerate(values):
+            db.add(MetricRollup(database_id=database_id, metric_name="cpu_usage",
+                                bucket_start=start + timedelta(hours=hour), sample_count=60,
+                                avg_value=float(value), min_value=0, max_value=100, sum_sq_dev=0))
+    db.commit()
+    correlation.cache.clear()
+
+    result = correlation.database_correlations(db, [3, 1, 2], hours=48, now=now)
+
+    assert result["labels"] == [1, 2, 3] and result["samples"] == 48
+    assert result["matrix"][0][1] > 0.9
+    assert abs(result["matrix"][0][2]) < 0.5
+    assert correlation.database_correlations(db, [1, 2, 3], hours=48, now=now + timedelta(minutes=20)) is result
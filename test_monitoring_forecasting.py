@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.modules.monitoring.forecasting import compute_forecasts
+from app.modules.monitoring.models import CapacityForecast, DatabaseConnection, MetricRollup
+
+NOW = datetime(2024, 3, 1, 12, 30)
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        DatabaseConnection(id=i, name=f"db{i}", host="h", port=3306, db_type="MySQL", username="u", password="p")
+        for i in (1, 2)
+    ])
+    end = NOW.replace(minute=0)
+    series = {
+        (1, "disk_usage"): lambda h: 60 + 0.5 * h,        # +0.5 %/h, 83.5 % à la dernière heure
+        (1, "connections_count"): lambda h: 250.0,        # déjà au-delà du seuil
+        (2, "disk_usage"): lambda h: 50.0,                # stable
+    }
+    for (database_id, metric_name), value in series.items():
+        for h in range(48):
+            db.add(MetricRollup(
+                database_id=database_id, metric_name=metric_name,
+                bucket_start=end - timedelta(hours=48 - h),
+                sample_count=60, avg_value=value(h), min_value=value(h), max_value=value(h), sum_sq_dev=0.0
+            ))
+    db.commit()
+    return db
+
+def test_forecasts_time_until_threshold(db):
+    """Le délai avant saturation est calculé en un passage pour toute la flotte."""
+    assert compute_forecasts(db, [1, 2], now=NOW) == 3
+    forecasts = {(f.database_id, f.metric_name): f for f in db.query(CapacityForecast).all()}
+
+    disk = forecasts[(1, "disk_usage")]
+    assert disk.slope_per_hour == pytest.approx(0.5)
+    assert disk.hours_to_threshold == pytest.approx((90 - 83.5) / 0.5)
+    assert disk.exhaustion_at == NOW + timedelta(hours=disk.hours_to_threshold)
+    assert forecasts[(1, "connections_count")].hours_to_threshold == 0
+    assert forecasts[(2, "disk_usage")].hours_to_threshold is None
+
+    # Un nouveau calcul remplace les prévisions précédentes
+    assert compute_forecasts(db, [1, 2], now=NOW) == 3
+    assert db.query(CapacityForecast).count() == 3
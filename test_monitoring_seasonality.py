@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.modules.monitoring import seasonality
+from app.modules.monitoring.models import Alert, DatabaseConnection, Metric, MetricRollup, SeasonalBaseline
+
+# Lundi 1er janvier 2024, 00:00 UTC
+START = datetime(2024, 1, 1)
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        DatabaseConnection(id=i, name=f"db{i}", host="h", port=3306, db_type="MySQL", username="u", password="p")
+        for i in (1, 2)
+    ])
+    rng = np.random.default_rng(0)
+    # Quatre semaines de mesures: pic d'activité chaque jour de 14h à 15h
+    samples = []
+    for step in range(4 * 7 * 24 * 6):
+        timestamp = START + timedelta(minutes=10 * step)
+        level = 80.0 if timestamp.hour == 14 else 20.0
+        for database_id in (1, 2):
+            samples.append(Metric(database_id=database_id, timestamp=timestamp,
+                                  cpu_usage=level + rng.normal(0, 2)))
+    db.add_all(samples)
+    db.commit()
+    return db
+
+def rollup_weekly(db):
+    # Le rattrapage est borné à une semaine par passage
+    for week in range(1, 5):
+        seasonality.rollup_metrics(db, [1, 2], now=START + timedelta(weeks=week))
+
+def test_rollups_feed_hour_of_week_baselines(db):
+    """Les agrégats horaires alimentent les références par heure de la semaine, incrémentalement."""
+    rollup_weekly(db)
+    # Rien de nouveau à agréger
+    assert seasonality.rollup_metrics(db, [1, 2], now=START + timedelta(weeks=4)) == 0
+
+    assert db.query(MetricRollup).count() == 2 * 4 * 168
+    monday_14h = db.query(SeasonalBaseline).filter_by(database_id=1, metric_name="cpu_usage", hour_of_week=14).one()
+    assert monday_14h.buckets == 4 and monday_14h.sample_count == 24
+    assert monday_14h.avg_value == pytest.approx(80, abs=1.5)
+
+def test_seasonal_scoring_flags_only_unusual_hours(db):
+    """Un pic à l'heure habituelle est normal; le même niveau à 3h du matin est une anomalie."""
+    rollup_weekly(db)
+    week5 = START + timedelta(weeks=4)
+    db.add_all([
+        Metric(database_id=1, timestamp=week5 + timedelta(hours=14, minutes=30), cpu_usage=80.0),
+        Metric(database_id=2, timestamp=week5 + timedelta(hours=3, minutes=30), cpu_usage=80.0),
+    ])
+    db.commit()
+
+    stored = seasonality.run_seasonal_analysis(db, [1, 2], since=week5, rollup=False)
+
+    assert stored == 1
+    alert = db.query(Alert).one()
+    assert alert.database_id == 2 and alert.alert_type == "seasonal_anomaly"
+    assert "cpu_usage" in alert.message
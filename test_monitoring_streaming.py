@@ -0,0 +1,87 @@
+import statistics
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.modules.monitoring.analyzer import MetricAnalyzer
+from app.modules.monitoring.streaming import EWMA, P2Quantile, Welford, WindowQuantile
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(3)
+    return list(rng.gamma(2.0, 10.0, 20000))
+
+def test_welford_matches_statistics(samples):
+    """Moyenne et variance en continu égales au calcul sur l'ensemble des valeurs."""
+    welford = Welford()
+    for value in samples:
+        welford.update(value)
+    assert welford.mean == pytest.approx(statistics.mean(samples), rel=1e-12)
+    assert welford.stdev == pytest.approx(statistics.stdev(samples), rel=1e-9)
+
+def test_ewma_follows_level_shift():
+    """La moyenne exponentielle rejoint un nouveau niveau."""
+    ewma = EWMA(alpha=0.2)
+    for value in [10.0] * 50 + [50.0] * 50:
+        ewma.update(value)
+    assert ewma.mean == pytest.approx(50.0, abs=0.01)
+    assert ewma.stdev < 1.0
+
+@pytest.mark.parametrize("quantile", [0.5, 0.95, 0.99])
+def test_p2_quantile_close_to_exact(samples, quantile):
+    """L'estimation P² reste proche du percentile exact sur une distribution asymétrique."""
+    estimator = P2Quantile(quantile)
+    for value in samples:
+        estimator.update(value)
+    exact = np.percentile(samples, quantile * 100)
+    assert estimator.value == pytest.approx(exact, rel=0.02)
+
+def test_p2_quantile_exact_on_few_samples():
+    estimator = P2Quantile(0.95)
+    for value in [3.0, 1.0, 2.0]:
+        estimator.update(value)
+    assert estimator.value == pytest.approx(np.percentile([1.0, 2.0, 3.0], 95))
+
+def test_welford_removal_matches_window(samples):
+    """Retirer les plus anciennes valeurs donne les statistiques de la fenêtre restante."""
+    welford = Welford()
+    for index, value in enumerate(samples[:5000]):
+        welford.update(value)
+        if index >= 100:
+            welford.remove(samples[index - 100])
+    window = samples[4900:5000]
+    assert welford.count == 100
+    assert welford.mean == pytest.approx(statistics.mean(window), rel=1e-9)
+    assert welford.stdev == pytest.approx(statistics.stdev(window), rel=1e-6)
+
+def test_window_quantile_is_exact(samples):
+    estimator = WindowQuantile(0.95)
+    for index, value in enumerate(samples[:1000]):
+        estimator.update(value)
+        if index >= 100:
+            estimator.remove(samples[index - 100])
+    assert estimator.value == pytest.approx(np.percentile(samples[900:1000], 95), rel=1e-12)
+
+def test_analyzer_baseline_follows_bounded_history():
+    """Au-delà de max_history_size, la référence des anomalies est celle de l'historique conservé."""
+    analyzer = MetricAnalyzer(connection_id=1, db_type="mysql")
+    start = datetime(2024, 1, 1)
+    # Niveau bas puis niveau haut avec un pic: une référence sur tout le flux
+    # signalerait aussi tout le niveau haut, la fenêtre seulement le pic
+    for step in range(240):
+        level = 10.0 if step < 200 else 80.0
+        analyzer.add_metrics_to_history({
+            "cpu_usage": None if step % 7 == 0 else (150.0 if step == 230 else level + step % 5),
+            "timestamp": start + timedelta(minutes=step),
+        })
+
+    samples = [m for m in analyzer.metrics_history if m["cpu_usage"] is not None]
+    values = [m["cpu_usage"] for m in samples]
+    threshold = statistics.mean(values) + 2 * statistics.stdev(values)
+    anomalies = analyzer.detect_anomalies("cpu_usage")
+
+    assert [a["value"] for a in anomalies] == [value for value in values if value > threshold] == [150.0]
+    # Horodatage de l'échantillon signalé, malgré les valeurs manquantes
+    assert anomalies[0]["timestamp"] == start + timedelta(minutes=230)
+    assert analyzer.metric_stats["cpu_usage"].count == len(values)
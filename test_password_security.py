@@ -0,0 +1,41 @@
+import asyncio
+
+from app.utils import security
+
+def test_hash_and_verify():
+    """Un hachage bcrypt vérifie le bon mot de passe et refuse les autres"""
+    hashed = security.hash_password("s3cret", rounds=4)
+    assert hashed.startswith("$2b$04$")
+    assert security.verify_password("s3cret", hashed)
+    assert not security.verify_password("other", hashed)
+    assert not security.verify_password("s3cret", "not-a-hash")
+    assert not security.verify_password("s3cret", None)
+
+def test_long_passwords_are_truncated_like_passlib():
+    """Seuls les 72 premiers octets comptent, comme avec passlib"""
+    hashed = security.hash_password("x" * 100, rounds=4)
+    assert security.verify_password("x" * 72, hashed)
+
+def test_low_cost_hash_is_upgraded(monkeypatch):
+    """Un mot de passe correct haché à un coût inférieur est rehaché au coût courant"""
+    old = security.hash_password("s3cret", rounds=4)
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 5)
+    valid, new_hash = security.verify_and_update("s3cret", old)
+    assert valid and new_hash.startswith("$2b$05$")
+    assert security.verify_and_update("s3cret", new_hash) == (True, None)
+    assert security.verify_and_update("wrong", old) == (False, None)
+
+def test_async_wrappers_use_the_pool():
+    """Les versions awaitables s'exécutent dans le pool dédié"""
+    async def scenario():
+        hashed = await security.hash_password_async("s3cret")
+        return await asyncio.gather(*[security.verify_password_async("s3cret", hashed) for _ in range(4)])
+
+    original = security.BCRYPT_ROUNDS
+    security.BCRYPT_ROUNDS = 4
+    try:
+        assert asyncio.run(scenario()) == [True] * 4
+        assert security.get_executor()._max_workers == security.PASSWORD_HASH_WORKERS
+    finally:
+        security.BCRYPT_ROUNDS = original
+        security.shutdown_executor()
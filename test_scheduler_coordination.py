@@ -0,0 +1,114 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.modules.backups import scheduler
+from app.modules.backups.models import Backup, BackupSchedule, BackupStatus
+from app.modules.coordination import service
+from app.modules.coordination.models import SchedulerLease
+from app.modules.coordination.service import HashRing, acquire_lease, heartbeat_member, live_members, release_lease
+from app.modules.monitoring.models import DatabaseConnection
+
+def test_single_owner_and_failover(db):
+    """Une seule instance détient le bail; une autre le reprend à son expiration."""
+    now = datetime(2024, 1, 1, 12, 0)
+    assert acquire_lease(db, "backup-scheduler", "api-1", ttl_seconds=30, now=now)
+    assert acquire_lease(db, "backup-scheduler", "api-2", ttl_seconds=30, now=now) is False
+    # Renouvellement par le détenteur
+    assert acquire_lease(db, "backup-scheduler", "api-1", ttl_seconds=30, now=now + timedelta(seconds=20))
+
+    # api-1 ne renouvelle plus: le bail expire et passe à api-2
+    assert acquire_lease(db, "backup-scheduler", "api-2", ttl_seconds=30, now=now + timedelta(seconds=45)) is False
+    assert acquire_lease(db, "backup-scheduler", "api-2", ttl_seconds=30, now=now + timedelta(seconds=51))
+    assert acquire_lease(db, "backup-scheduler", "api-1", ttl_seconds=30, now=now + timedelta(seconds=52)) is False
+
+def test_released_lease_is_taken_immediately(db):
+    """Un bail libéré à l'arrêt est repris sans attendre son expiration."""
+    now = datetime(2024, 1, 1, 12, 0)
+    acquire_lease(db, "metrics-collector", "api-1", now=now)
+    release_lease(db, "metrics-collector", "api-1")
+    assert acquire_lease(db, "metrics-collector", "api-2", now=now)
+
+def test_lease_expiry_uses_the_database_clock(db, monkeypatch):
+    """Une instance dont l'horloge avance ne prend pas un bail encore valide."""
+    class SkewedDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime.utcnow() + timedelta(hours=1)
+
+    assert acquire_lease(db, "backup-scheduler", "api-1", ttl_seconds=30)
+    monkeypatch.setattr(service, "datetime", SkewedDatetime, raising=False)
+    assert acquire_lease(db, "backup-scheduler", "api-2", ttl_seconds=30) is False
+
+    # Bail expiré selon l'horloge de la base: repris
+    db.query(SchedulerLease).update({SchedulerLease.expires_at: service.db_utcnow(-1)})
+    db.commit()
+    assert acquire_lease(db, "backup-scheduler", "api-2", ttl_seconds=30)
+    lease = db.get(SchedulerLease, "backup-scheduler")
+    assert lease.owner == "api-2" and lease.expires_at > datetime.utcnow() + timedelta(seconds=25)
+
+def test_members_are_seen_with_the_database_clock(db):
+    heartbeat_member(db, "api-1", role="collector")
+    heartbeat_member(db, "api-2", now=datetime.utcnow() - timedelta(minutes=10), role="collector")
+    assert live_members(db) == ["api-1"]
+
+def test_only_collectors_share_targets(db, db_engine, monkeypatch):
+    """Une API sans collecte ne reçoit aucune cible de l'anneau."""
+    monkeypatch.setattr(service, "SessionLocal", sessionmaker(bind=db_engine))
+    api = service.LeaderElector("api-1")
+    collectors = [service.LeaderElector(f"collector-{i}") for i in (1, 2)]
+    for collector in collectors:
+        collector.join_collection()
+    for instance in [api, *collectors]:
+        instance.heartbeat()
+    collectors[0].heartbeat()
+
+    assert live_members(db) == ["collector-1", "collector-2"]
+    assert collectors[0]._ring.members == ["collector-1", "collector-2"]
+    assert all(sum(collector.owns(target) for collector in collectors) == 1 for target in range(100))
+
+@pytest.fixture
+def schedules(db, db_engine, monkeypatch):
+    db.add(DatabaseConnection(id=1, name="db1", host="h", port=3306, db_type="MySQL", username="u", password="p"))
+    db.add(BackupSchedule(id=1, database_id=1, name="nightly", frequency="0 2 * * *"))
+    db.commit()
+    executed = []
+    monkeypatch.setattr(scheduler, "SessionLocal", sessionmaker(bind=db_engine))
+    monkeypatch.setattr(scheduler, "execute_backup", executed.append)
+    monkeypatch.setitem(service.elector._expires, scheduler.BACKUP_SCHEDULER_LEASE, time.monotonic() + 300)
+    return executed
+
+def test_scheduled_backup_skipped_once_lease_is_lost(db, schedules, monkeypatch):
+    """Un déclenchement survenu avant la destitution n'écrit rien."""
+    monkeypatch.delitem(service.elector._expires, scheduler.BACKUP_SCHEDULER_LEASE)
+    scheduler.run_scheduled_backup(1)
+    assert schedules == [] and db.query(Backup).count() == 0
+
+def test_scheduled_backup_skipped_while_previous_run_is_in_progress(db, schedules):
+    """Le nouveau responsable ne relance pas un planning encore en cours sur l'ancien."""
+    db.add(Backup(id=1, schedule_id=1, database_id=1, status=BackupStatus.RUNNING, started_at=datetime.now()))
+    db.commit()
+    scheduler.run_scheduled_backup(1)
+    assert schedules == []
+
+    # Sauvegarde abandonnée depuis longtemps: le planning reprend
+    db.query(Backup).update({Backup.started_at: datetime.now() - timedelta(hours=scheduler.BACKUP_RUNNING_STALE_HOURS + 1)})
+    db.commit()
+    scheduler.run_scheduled_backup(1)
+    assert len(schedules) == 1
+
+def test_ring_spreads_targets_and_moves_few_on_join():
+    """Les cibles sont réparties et l'arrivée d'une instance en déplace peu."""
+    targets = range(1000)
+    ring = HashRing(["api-1", "api-2", "api-3"])
+    owners = {target: ring.owner(target) for target in targets}
+    counts = [list(owners.values()).count(member) for member in ring.members]
+    assert min(counts) > 200
+
+    grown = HashRing(["api-1", "api-2", "api-3", "api-4"])
+    moved = [target for target in targets if grown.owner(target) != owners[target]]
+    # Seules les cibles reprises par la nouvelle instance changent de propriétaire
+    assert all(grown.owner(target) == "api-4" for target in moved)
+    assert len(moved) < 400
@@ -0,0 +1,129 @@
+import json
+import os
+import subprocess
+import sys
+
+from sqlalchemy import (Boolean, Column, DateTime, Enum, ForeignKey, Integer, MetaData, String, Table, Text,
+                        create_engine, inspect, text)
+from sqlalchemy.orm import sessionmaker
+
+from app import migrate
+
+# Budget de démarrage d'un worker: import de l'application et hooks de démarrage
+STARTUP_BUDGET_SECONDS = 5.0
+
+STARTUP_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter() - started
+
+async def boot():
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        elapsed = time.perf_counter() - started
+        scheduler_started = hasattr(app.state, "scheduler")
+    return elapsed, scheduler_started
+
+startup, scheduler_started = asyncio.run(boot())
+print(json.dumps({"import": imported, "startup": startup, "scheduler_started": scheduler_started}))
+"""
+
+def test_startup_within_budget_without_database():
+    """L'application démarre dans le budget sans joindre la base centrale ni démarrer les planificateurs"""
+    env = dict(os.environ, DB_HOST="127.0.0.1", DB_PORT="1", STARTUP_WARMUP_DELAY_SECONDS="60")
+    result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, text=True,
+                            env=env, cwd=os.path.dirname(os.path.abspath(__file__)), timeout=60)
+    assert result.returncode == 0, result.stderr
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    assert timings["import"] + timings["startup"] < STARTUP_BUDGET_SECONDS
+    assert timings["startup"] < 0.5
+    assert not timings["scheduler_started"]
+
+def test_upgrade_creates_schema_once(tmp_path):
+    """Les migrations créent le schéma et ne sont appliquées qu'une fois"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'central.db'}")
+    assert migrate.current(engine) is None
+    assert migrate.upgrade(engine) == ["0001", "0002", "0003", "0004"]
+    tables = set(inspect(engine).get_table_names())
+    assert {"users", "database_connections", "backups", "user_inventory_snapshots", "schema_migrations"} <= tables
+    assert migrate.upgrade(engine) == []
+    assert migrate.current(engine) == "0004"
+
+def baseline_metadata():
+    """Schéma d'une base créée avant les évolutions des sauvegardes"""
+    from app.database import Base
+    from app.modules.backups.models import BackupStatus, BackupType
+    migrate._load_models()
+    metadata = MetaData()
+    for name in ["users", "roles", "user_roles", "database_connections"]:
+        Base.metadata.tables[name].to_metadata(metadata)
+    Table("backup_schedules", metadata,
+          Column("id", Integer, primary_key=True, index=True),
+          Column("database_id", Integer, ForeignKey("database_connections.id"), nullable=False),
+          Column("name", String(100), nullable=False),
+          Column("backup_type", Enum(BackupType)),
+          Column("frequency", String(50), nullable=False),
+          Column("retention_days", Integer),
+          Column("is_active", Boolean),
+          Column("created_at", DateTime),
+          Column("updated_at", DateTime))
+    Table("backups", metadata,
+          Column("id", Integer, primary_key=True, index=True),
+          Column("schedule_id", Integer, ForeignKey("backup_schedules.id"), nullable=True),
+          Column("database_id", Integer, ForeignKey("database_connections.id"), nullable=False),
+          Column("backup_type", Enum(BackupType)),
+          Column("file_path", String(255)),
+          Column("file_size", Integer),
+          Column("status", Enum(BackupStatus)),
+          Column("started_at", DateTime),
+          Column("completed_at", DateTime),
+          Column("error_message", Text),
+          Column("retention_days", Integer))
+    return metadata
+
+def test_upgrade_adds_backup_columns_to_baseline_schema(tmp_path):
+    """Une base antérieure aux migrations reçoit les colonnes et index des sauvegardes"""
+    from app.modules.backups.models import Backup, BackupSchedule, BackupStatus
+    engine = create_engine(f"sqlite:///{tmp_path / 'central.db'}")
+    baseline_metadata().create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO backup_schedules (id, database_id, name, frequency) VALUES (1, 1, 'nightly', '0 2 * * *')"))
+        connection.execute(text("INSERT INTO backups (id, schedule_id, database_id, status) VALUES (1, 1, 1, 'COMPLETED')"))
+
+    assert migrate.upgrade(engine) == ["0001", "0002", "0003", "0004"]
+
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("backups")}
+    assert {"checksum", "checksum_algorithm", "verified_at", "sharded", "storage_backend"} <= columns
+    columns = {column["name"] for column in inspector.get_columns("backup_schedules")}
+    assert {"max_bandwidth_bytes", "max_iops", "adaptive_throttling", "sharded",
+            "gfs_daily", "gfs_weekly", "gfs_monthly", "last_run"} <= columns
+    assert {"ix_backups_database_id", "ix_backups_completed_at"} <= {index["name"] for index in inspector.get_indexes("backups")}
+
+    # Les lignes existantes sont lisibles par les modèles, avec les valeurs par défaut
+    db = sessionmaker(bind=engine)()
+    try:
+        backup = db.get(Backup, 1)
+        assert backup.sharded is False and db.get(BackupSchedule, 1).adaptive_throttling is False
+        backup.status = BackupStatus.CORRUPTED
+        backup.file_size = 5 * 2 ** 30
+        db.commit()
+        db.expire_all()
+        assert db.get(Backup, 1).file_size == 5 * 2 ** 30
+    finally:
+        db.close()
+    assert migrate.upgrade(engine) == []
+
+def test_upgrade_adds_member_role(tmp_path):
+    """Une base migrée avant l'ajout du rôle des membres reçoit la colonne"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'central.db'}")
+    migrate.upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE scheduler_members"))
+        connection.execute(text("CREATE TABLE scheduler_members (instance_id VARCHAR(255) PRIMARY KEY, "
+                                "hostname VARCHAR(255), started_at DATETIME, last_seen DATETIME NOT NULL)"))
+        connection.execute(migrate.schema_migrations.delete().where(migrate.schema_migrations.c.version == "0004"))
+
+    assert migrate.upgrade(engine) == ["0004"]
+    assert "role" in {column["name"] for column in inspect(engine).get_columns("scheduler_members")}
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+from app.modules.users import inventory, models, provisioning
+
+NOW = datetime(2024, 3, 1, 12, 0)
+
+# Utilisateurs renvoyés par chaque base (None: base injoignable)
+SERVERS = {}
+
+class FakeAdapter:
+    def __init__(self, database):
+        self.name = database.name
+
+    def connect(self):
+        return SERVERS[self.name] is not None
+
+    def disconnect(self):
+        pass
+
+    def get_inventory(self):
+        return [dict(user) for user in SERVERS[self.name]]
+
+@pytest.fixture
+def db(db, monkeypatch):
+    db.add(models.User(id=1, email="alice@example.com", hashed_password="x"))
+    db.add_all([
+        models.ManagedDatabase(id=i, name=f"db{i}", db_type="mysql", host="h", port=3306,
+                               username="admin", password="p", database_name="app")
+        for i in (1, 2)
+    ])
+    db.add_all([
+        models.UserDatabaseMapping(platform_user_id=1, database_id=1, database_username="alice"),
+        models.UserDatabaseMapping(platform_user_id=1, database_id=1, database_username="bob"),
+    ])
+    db.commit()
+    SERVERS.clear()
+    SERVERS.update({
+        "db1": [{"username": "alice", "host": "%", "grants": ["SELECT"]},
+                {"username": "mallory", "host": "%", "grants": ["ALL PRIVILEGES"]},
+                {"username": "root", "host": "localhost", "grants": ["ALL PRIVILEGES"]},
+                {"username": "admin", "host": "%", "grants": ["ALL PRIVILEGES"]}],
+        "db2": [],
+    })
+    monkeypatch.setattr(provisioning, "create_adapter", FakeAdapter)
+    monkeypatch.setattr(inventory, "pool", provisioning.AdapterPool())
+    return db
+
+def test_snapshot_is_stored_compactly_and_only_rewritten_on_change(db):
+    """L'inventaire est stocké compressé et n'est réécrit que s'il change"""
+    assert inventory.snapshot_inventory(db, now=NOW) == {"databases": 2, "failed": 0, "changed": 2}
+    snapshot = inventory.get_snapshot(db, 1)
+    assert snapshot["user_count"] == 4 and snapshot["status"] == "ok"
+    assert snapshot["users"][0] == {"username": "admin", "host": "%", "grants": ["ALL PRIVILEGES"]}
+
+    SERVERS["db1"].reverse()  # Même contenu, autre ordre
+    assert inventory.snapshot_inventory(db, now=NOW)["changed"] == 0
+
+def test_failed_inventory_keeps_last_snapshot(db):
+    """Une base injoignable garde son dernier inventaire réussi"""
+    inventory.snapshot_inventory(db, now=NOW)
+    SERVERS["db1"] = None
+    result = inventory.snapshot_inventory(db, now=datetime(2024, 3, 1, 13, 0))
+    assert result["failed"] == 1
+    snapshot = inventory.get_snapshot(db, 1)
+    assert snapshot["status"] == "error" and snapshot["taken_at"] == NOW
+    assert snapshot["user_count"] == 4
+
+def test_drift_against_mappings(db):
+    """Écart entre mappings et inventaire, hors comptes du système et compte d'administration"""
+    assert inventory.compute_drift(db) == []
+    inventory.snapshot_inventory(db, now=NOW)
+    drift = {item["database_id"]: item for item in inventory.compute_drift(db)}
+    assert drift[1]["missing"] == ["bob"]
+    assert drift[1]["unmanaged"] == ["mallory"]
+    assert drift[1]["stale"]
+    assert drift[2]["missing"] == [] and drift[2]["unmanaged"] == []
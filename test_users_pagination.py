@@ -0,0 +1,68 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.modules.users import models, schemas
+from app.modules.users.pagination import keyset_page, page_headers, parse_fields, project
+
+USERS = 500
+
+@pytest.fixture
+def db(db):
+    roles = [models.Role(name=f"role{i}") for i in range(3)]
+    db.add_all(
+        models.User(email=f"user{i}@example.com", hashed_password="x", roles=roles[:i % 3 + 1])
+        for i in range(USERS)
+    )
+    db.commit()
+    db.expunge_all()
+    return db
+
+def count_queries(session):
+    queries = []
+    event.listen(session.get_bind(), "before_cursor_execute", lambda *args: queries.append(args[2]))
+    return queries
+
+def test_full_listing_uses_constant_queries(db):
+    """Parcourir toutes les pages coûte deux requêtes par page, rôles compris"""
+    queries = count_queries(db)
+    seen, after_id, pages = [], None, 0
+    while True:
+        users, total = keyset_page(db, models.User, limit=200, after_id=after_id, relationships=("roles",))
+        if not users:
+            break
+        pages += 1
+        assert total == USERS
+        seen.extend(schemas.User.model_validate(user) for user in users)
+        after_id = int(page_headers(users, total, 200).get("X-Next-After-Id", 0)) or None
+        if after_id is None:
+            break
+    assert [user.id for user in seen] == list(range(1, USERS + 1))
+    assert [len(user.roles) for user in seen[:3]] == [1, 2, 3]
+    assert len(queries) == 2 * pages
+
+def test_offset_and_total(db):
+    """`skip` reste accepté et le total porte sur toute la table"""
+    users, total = keyset_page(db, models.User, limit=10, skip=495)
+    assert [user.id for user in users] == [496, 497, 498, 499, 500]
+    assert total == USERS
+    assert page_headers(users, total, 10) == {"X-Total-Count": "500"}
+
+    users, total = keyset_page(db, models.User, limit=10, after_id=USERS)
+    assert users == [] and total == USERS
+
+def test_projection_loads_only_requested_fields(db):
+    """Avec `fields`, seules les colonnes demandées sont lues, sans chargement différé"""
+    fields = parse_fields("email,roles", schemas.User.model_fields)
+    queries = count_queries(db)
+    users, _ = keyset_page(db, models.User, limit=2, fields=fields, relationships=("roles",))
+    items = [project(user, fields, nested={"roles": schemas.Role}) for user in users]
+    assert len(queries) == 2
+    assert "hashed_password" not in queries[0] and "full_name" not in queries[0]
+    items[1]["roles"].sort(key=lambda role: role["id"])
+    assert items[1] == {"id": 2, "email": "user1@example.com",
+                        "roles": [{"id": 1, "name": "role0", "description": None},
+                                  {"id": 2, "name": "role1", "description": None}]}
+
+    with pytest.raises(HTTPException):
+        parse_fields("email,hashed_password", schemas.User.model_fields)
@@ -0,0 +1,62 @@
+from dataclasses import replace
+
+import pytest
+from sqlalchemy import event
+
+from app.modules.users import models
+from app.modules.users.principal import Principal, PrincipalCache
+
+@pytest.fixture
+def db(db):
+    admin, reader = models.Role(name="admin"), models.Role(name="reader")
+    db.add(models.User(id=1, email="alice@example.com", hashed_password="x",
+                       is_superuser=True, roles=[reader, admin]))
+    db.commit()
+    return db
+
+def test_principal_snapshot(db):
+    """Le principal fige les drapeaux et les noms de rôles de l'utilisateur"""
+    principal = Principal.from_user(db.get(models.User, 1))
+    assert principal.email == "alice@example.com"
+    assert principal.is_active and principal.is_superuser
+    assert principal.roles == ("admin", "reader")
+    assert principal.has_role("admin")
+    assert principal.user.email == principal.email
+    with pytest.raises(AttributeError):
+        principal.is_superuser = False
+
+def test_cache_hit_costs_no_query(db):
+    """Une entrée en cache ne déclenche aucune requête"""
+    cache = PrincipalCache(ttl=60)
+    cache.put("alice@example.com", Principal.from_user(db.get(models.User, 1)))
+    queries = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: queries.append(args[2]))
+    assert cache.get("alice@example.com").id == 1
+    assert queries == []
+
+def test_cache_expiry_and_invalidation(db):
+    """Les entrées expirent après le TTL et sont oubliées à la modification de l'utilisateur"""
+    principal = Principal.from_user(db.get(models.User, 1))
+    cache = PrincipalCache(ttl=0)
+    cache.put("alice@example.com", principal)
+    assert cache.get("alice@example.com") is None
+
+    cache = PrincipalCache(ttl=60)
+    cache.put("alice@example.com", principal)
+    cache.invalidate_user(1)
+    assert cache.get("alice@example.com") is None
+
+    # Changement d'email: l'ancien sujet ne résout plus l'utilisateur
+    cache.put("alice@example.com", principal)
+    cache.put("alice@example.org", principal)
+    assert cache.get("alice@example.com") is None
+    assert cache.get("alice@example.org") is principal
+
+def test_cache_is_bounded(db):
+    """Le plus ancien sujet est évincé au-delà de la taille maximale"""
+    principal = Principal.from_user(db.get(models.User, 1))
+    cache = PrincipalCache(ttl=60, max_entries=2)
+    for i in range(3):
+        cache.put(f"user{i}", replace(principal, id=i + 10))
+    assert cache.get("user0") is None
+    assert cache.get("user2").id == 12
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.adapters.base import DatabaseAdapter
+from app.modules.users import models, provisioning, schemas, service
+
+class FakeAdapter(DatabaseAdapter):
+    """Adaptateur en mémoire: compte les sessions et la concurrence par base"""
+    connections = []
+    passwords = {}
+    active = {}
+    peak = {}
+    lock = threading.Lock()
+
+    def __init__(self, database):
+        self.name = database.name
+        self.created = []
+
+    def connect(self):
+        if self.name == "down":
+            return False
+        FakeAdapter.connections.append(self.name)
+        return True
+
+    def disconnect(self):
+        pass
+
+    def create_users(self, users):
+        with FakeAdapter.lock:
+            FakeAdapter.active[self.name] = FakeAdapter.active.get(self.name, 0) + 1
+            FakeAdapter.peak[self.name] = max(FakeAdapter.peak.get(self.name, 0), FakeAdapter.active[self.name])
+        time.sleep(0.01)
+        try:
+            return super().create_users(users)
+        finally:
+            with FakeAdapter.lock:
+                FakeAdapter.active[self.name] -= 1
+
+    def create_user(self, username, password, roles=None):
+        if username == "taken":
+            return {'status': 'error', 'message': "user exists"}
+        self.created.append((username, tuple(roles or ())))
+        FakeAdapter.passwords[username] = password
+        return True
+
+@pytest.fixture
+def db(db, monkeypatch):
+    db.add_all([models.User(id=i, email=f"u{i}@example.com", hashed_password="x") for i in (1, 2, 3)])
+    db.add_all([
+        models.ManagedDatabase(id=i, name=name, db_type="mysql", host="h", port=3306,
+                               username="root", password="p", database_name="app")
+        for i, name in enumerate(["db1", "db2", "db3", "down"], start=1)
+    ])
+    db.commit()
+    FakeAdapter.connections.clear()
+    FakeAdapter.peak.clear()
+    monkeypatch.setattr(provisioning, "create_adapter", FakeAdapter)
+    monkeypatch.setattr(provisioning, "pool", provisioning.AdapterPool(per_database=1))
+    return db
+
+USERS = [
+    {"platform_user_id": 1, "database_username": "alice"},
+    {"platform_user_id": 2, "database_username": "taken"},
+    {"platform_user_id": 3, "database_username": "carol"},
+]
+
+def test_bulk_provisioning_reports_each_pair(db):
+    """Chaque paire utilisateur/base a son résultat, les bases en échec sont à rejouer"""
+    response = provisioning.provision_users(db, USERS, [1, 2, 3, 4, 99], ["read_only"])
+    by_pair = {(item["platform_user_id"], item["database_id"]): item for item in response["results"]}
+
+    assert response["created"] == 6 and response["failed"] == 9
+    assert by_pair[(1, 1)]["status"] == "created" and by_pair[(1, 1)]["temporary_password"]
+    assert by_pair[(2, 1)]["status"] == "failed" and by_pair[(2, 1)]["error"] == "user exists"
+    assert by_pair[(1, 4)]["error"] == "Failed to connect to database down"
+    assert by_pair[(1, 99)]["error"] == "Database not found"
+    assert by_pair[(2, 1)]["temporary_password"] is None
+
+    # Une session par base joignable, tous les utilisateurs de la base dans le même lot
+    assert sorted(FakeAdapter.connections) == ["db1", "db2", "db3"]
+    assert set(FakeAdapter.peak.values()) == {1}
+
+    assert db.query(models.UserDatabaseMapping).count() == 6
+    assert response["retry"]["database_ids"] == [1, 2, 3, 4]
+    assert {user["platform_user_id"] for user in response["retry"]["users"]} == {1, 2, 3}
+
+def test_retry_skips_provisioned_pairs(db):
+    """Rejouer la requête ne recrée pas les paires déjà provisionnées et réutilise les adaptateurs"""
+    provisioning.provision_users(db, USERS[:1], [1, 2], [])
+    response = provisioning.provision_users(db, USERS[:1] + USERS[2:], [1, 2], [])
+    statuses = {(item["platform_user_id"], item["database_id"]): item["status"] for item in response["results"]}
+    assert statuses == {(1, 1): "exists", (1, 2): "exists", (3, 1): "created", (3, 2): "created"}
+    assert response["retry"] is None
+    assert sorted(FakeAdapter.connections) == ["db1", "db2"]
+
+def test_repeated_users_are_provisioned_once(db):
+    """Un utilisateur répété dans la requête ne donne qu'un résultat par base"""
+    response = provisioning.provision_users(db, USERS[:1] + USERS[:1] + [dict(USERS[0], database_username="bob")],
+                                            [1, 1, 2], [])
+    pairs = [(item["platform_user_id"], item["database_id"], item["database_username"])
+             for item in response["results"]]
+    assert sorted(pairs) == [(1, 1, "alice"), (1, 2, "alice")]
+    assert response["created"] == 2 and response["failed"] == 0
+    assert db.query(models.UserDatabaseMapping).count() == 2
+
+def test_per_database_limit_across_requests(db):
+    """Deux requêtes simultanées sur la même base ne dépassent pas la limite par base"""
+    sessions = [sessionmaker(bind=db.get_bind())() for _ in range(2)]
+    threads = [
+        threading.Thread(target=provisioning.provision_users,
+                         args=(session, [{"platform_user_id": i + 1, "database_username": f"user{i}"}], [1], []))
+        for i, session in enumerate(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert FakeAdapter.peak["db1"] == 1
+    assert db.query(models.UserDatabaseMapping).count() == 2
+
+def test_sync_returns_the_temporary_password_once(db):
+    """Le mot de passe temporaire du compte créé est renvoyé à l'appelant, sans être conservé"""
+    mapping = schemas.UserDatabaseMappingCreate(platform_user_id=1, database_id=1, database_username="alice",
+                                                database_roles=["read"])
+    created = service.sync_user_with_database(db, mapping)
+
+    assert created.temporary_password and created.temporary_password == FakeAdapter.passwords["alice"]
+    assert created.database_roles == ["read"]
+    stored = db.get(models.UserDatabaseMapping, created.id)
+    assert created.temporary_password not in {str(value) for value in vars(stored).values()}